@@ -1,14 +1,19 @@
-import tkinter as tk
-from tkinter import ttk, filedialog  # Đã thêm filedialog ở đây
-from tkinter import messagebox
-import datetime
+import argparse
+import csv
+import hashlib
 import json
-import base64
-from cryptography.fernet import Fernet
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from license_codec import PERMANENT_LABEL, LicenseCodec, format_epoch
+from license_store import LicenseStore
 
-# Khóa bí mật dùng chung giữa admin và client
-KEY = Fernet.generate_key()  # Chỉ sinh một lần duy nhất trong thực tế
-cipher = Fernet(KEY)
+# Khóa ký license (Ed25519) của server: đọc từ LICENSE_SIGNING_KEY (biến môi trường hoặc file .env của server).
+# Client chỉ giữ khóa công khai nên không tự tạo được license.
+KEY_ENV = "LICENSE_SIGNING_KEY"
 
 # Các gói đăng ký
 PACKAGES = {
@@ -18,62 +23,243 @@ PACKAGES = {
     "PERM": {"duration_days": None}  # Vĩnh viễn
 }
 
-# Hàm tạo license
-def generate_license(machine_id, package):
-    start_date = datetime.datetime.now()
-    if package == "PERM":
-        expiry_date = "Vĩnh viễn"
-    else:
-        expiry_date = (start_date + datetime.timedelta(days=PACKAGES[package]["duration_days"])).strftime("%d/%m/%Y %H:%M:%S")
-    
-    license_data = {
-        "username": "hoanq",
-        "voice_id": "Free",
-        "registration_date": start_date.strftime("%d/%m/%Y %H:%M:%S"),
-        "status": "Đã đăng ký",
-        "expiration_date": expiry_date,
-        "package": package,
-        "machine_id": machine_id
-    }
-    return license_data
-
-# Hàm mã hóa license
-def encrypt_license(license_data):
-    try:
-        encrypted_data = cipher.encrypt(json.dumps(license_data).encode())
-        return base64.b64encode(encrypted_data).decode()
-    except Exception as e:
-        messagebox.showerror("Lỗi", f"Lỗi mã hóa license: {e}")
-        return None
-
-# Hàm lưu license vào file json
-def save_license_to_file(encrypted_license):
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".json",
-        filetypes=[("JSON files", "*.json")],
-        title="Lưu License"
-    )
-    if file_path:
+# Cấu hình chế độ hàng loạt
+BATCH_SIZE = 5000          # Số license mỗi tác vụ gửi sang tiến trình con
+DEFAULT_WORKERS = os.cpu_count() or 4
+LICENSE_EXTENSION = ".lic"
+
+codec = None
+
+def load_key(key_file=None):
+    """Đọc khóa ký từ key_file (file .env hoặc chỉ chứa khóa), hoặc từ LICENSE_SIGNING_KEY / .env."""
+    if key_file:
+        with open(key_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith(f"{KEY_ENV}="):
+                    return line.split("=", 1)[1].strip().strip('"\'')
+                if line and not line.startswith("#") and "=" not in line.rstrip("="):
+                    return line
+        raise ValueError(f"Không tìm thấy khóa trong {key_file}")
+    from dotenv import load_dotenv
+    load_dotenv()
+    key = os.getenv(KEY_ENV)
+    if not key:
+        raise ValueError(f"Chưa cấu hình khóa: đặt {KEY_ENV} (giống server) hoặc dùng --key-file")
+    return key
+
+def license_expiry(package, issued_at):
+    duration_days = PACKAGES[package]["duration_days"]
+    return None if duration_days is None else issued_at + duration_days * 86400
+
+# Hàm tạo license (token gọn, có chữ ký, dùng chung định dạng với server/client)
+def generate_license(machine_id, package, issued_at=None, username="hoanq", voice_id="Free"):
+    issued_at = int(issued_at or time.time())
+    return codec.encode(machine_id, package, issued_at, license_expiry(package, issued_at), username, voice_id)
+
+def store_record(machine_id, package, token, issued_at):
+    """Bản ghi cho LicenseStore.record_many, cùng định dạng ngày hết hạn với server."""
+    expires_at = license_expiry(package, issued_at)
+    return machine_id, package, token, format_epoch(expires_at) if expires_at else PERMANENT_LABEL, issued_at
+
+def license_file_name(machine_id):
+    """Tên file license cho một mã máy: phần an toàn của mã kèm 8 ký tự băm, nên hai mã khác nhau không bao giờ trùng file."""
+    safe = re.sub(r'[^\w.-]', '_', machine_id)[:64]
+    digest = hashlib.sha256(machine_id.encode("utf-8")).hexdigest()[:8]
+    return f"{safe}-{digest}{LICENSE_EXTENSION}"
+
+# --- Chế độ hàng loạt (không giao diện) ---
+def _init_worker(key):
+    """Mỗi tiến trình con tự tạo codec một lần."""
+    global codec
+    codec = LicenseCodec(signing_key=key)
+
+def read_rows(path):
+    """Đọc lần lượt (số dòng, bản ghi) từ CSV có tiêu đề hoặc JSONL, không nạp cả file vào bộ nhớ."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError:
+                        yield line_no, None
+        else:
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+
+def read_batches(path, batch_size):
+    batch = []
+    for item in read_rows(path):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def row_machine_id(row):
+    return str(row.get("machine_id") or "").strip() if isinstance(row, dict) else ""
+
+def screen_batch(batch, store, errors):
+    """Bỏ các máy đã bị thu hồi trong store (một truy vấn cho cả lô, ở tiến trình chính)."""
+    machine_ids = [row_machine_id(row) for _, row in batch]
+    revoked = store.revoked_among({machine_id for machine_id in machine_ids if machine_id}) if store else set()
+    kept = []
+    for (line_no, row), machine_id in zip(batch, machine_ids):
+        if machine_id in revoked:
+            errors.append({"line": line_no, "error": "License revoked"})
+            continue
+        kept.append((line_no, row))
+    return kept
+
+def issue_batch(batch, issued_at, out_dir):
+    """Tạo license cho một lô; trả về (dòng kết quả JSONL, lỗi, bản ghi cho LicenseStore). Ghi file riêng từng máy nếu có out_dir.
+
+    File .lic được tạo độc quyền (mode "x"): mã máy đã có file, từ dòng trước hay lần chạy trước,
+    bị báo trùng thay vì ghi đè. Việc chống trùng nằm ở hệ thống file nên không tốn bộ nhớ theo số dòng;
+    hai dòng trùng ở hai lô khác nhau thì lô xong trước được cấp.
+    """
+    lines = []
+    errors = []
+    records = []
+    for line_no, row in batch:
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump({"license": encrypted_license}, f, indent=4)
-            messagebox.showinfo("Thông báo", "Lưu file thành công!")
+            if not isinstance(row, dict):
+                raise ValueError("Dòng không hợp lệ")
+            machine_id = row_machine_id(row)
+            package = str(row.get("package") or "").strip()
+            if not machine_id:
+                raise ValueError("Thiếu machine_id")
+            if package not in PACKAGES:
+                raise ValueError(f"Gói không hợp lệ: {package}")
+            token = generate_license(machine_id, package, issued_at,
+                                     row.get("username") or "hoanq", row.get("voice_id") or "Free")
+            record = {"machine_id": machine_id, "package": package, "license": token}
+            if out_dir:
+                file_name = license_file_name(machine_id)
+                try:
+                    with open(os.path.join(out_dir, file_name), "x", encoding="ascii") as f:
+                        f.write(token)
+                except FileExistsError:
+                    raise ValueError(f"Trùng machine_id: {file_name} đã tồn tại")
+                record["file"] = file_name
+            lines.append(json.dumps(record, ensure_ascii=False))
+            records.append(store_record(machine_id, package, token, issued_at))
         except Exception as e:
-            messagebox.showerror("Lỗi", f"Lỗi khi lưu file: {e}")
+            errors.append({"line": line_no, "error": str(e)})
+    return lines, errors, records
+
+def run_bulk(input_path, output_path, out_dir, key, workers=DEFAULT_WORKERS, batch_size=BATCH_SIZE, store=None):
+    """Tạo license hàng loạt song song, ghi kết quả theo đúng thứ tự đầu vào ngay khi từng lô xong.
 
-# Khi nhấn nút Generate
-def on_generate():
-    machine_id = entry_machine_id.get().strip()
-    package = combo_package.get()
+    Có store (LicenseStore của server) thì license được ghi vào đó như khi kích hoạt qua server,
+    nên /status và --revoke áp dụng được, và máy đã bị thu hồi không được cấp.
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    issued_at = int(time.time())
+    started = time.perf_counter()
+    issued = 0
+    errors = []
+    output = open(output_path, "w", encoding="utf-8") if output_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key,)) as pool:
+            # Chỉ giữ vài lô đang xử lý để bộ nhớ không tăng theo kích thước đầu vào
+            pending = deque()
+            for batch in read_batches(input_path, batch_size):
+                batch = screen_batch(batch, store, errors)
+                pending.append(pool.submit(issue_batch, batch, issued_at, out_dir))
+                if len(pending) >= workers * 2:
+                    issued += _write_results(pending.popleft(), output, errors, store)
+            while pending:
+                issued += _write_results(pending.popleft(), output, errors, store)
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    return {"issued": issued, "errors": len(errors), "error_details": errors[:20],
+            "elapsed_s": round(elapsed, 3), "per_s": round(issued / elapsed, 1) if elapsed else None}
 
-    if not machine_id or package not in PACKAGES:
-        messagebox.showwarning("Cảnh báo", "Vui lòng nhập đầy đủ thông tin.")
-        return
+def _write_results(future, output, errors, store):
+    lines, batch_errors, records = future.result()
+    if output and lines:
+        output.write("\n".join(lines) + "\n")
+    if store and records:
+        store.record_many(records)
+    errors.extend(batch_errors)
+    return len(lines)
 
-    license_data = generate_license(machine_id, package)
-    encrypted_license = encrypt_license(license_data)
+def main_bulk(args):
+    try:
+        key = load_key(args.key_file)
+        LicenseCodec(signing_key=key)
+    except Exception as e:
+        print(f"Lỗi khóa: {e}", file=sys.stderr)
+        sys.exit(2)
+    if not args.output and not args.out_dir:
+        print("Cần --output (một file JSONL) và/hoặc --out-dir (mỗi máy một file)", file=sys.stderr)
+        sys.exit(2)
+    store = LicenseStore(args.db) if args.db else None
+    summary = run_bulk(args.bulk, args.output, args.out_dir, key, args.workers, args.batch_size, store)
+    print(json.dumps(summary, ensure_ascii=False))
+    sys.exit(1 if summary["errors"] else 0)
+
+# --- Giao diện GUI (một license) ---
+def run_gui(key_file=None, db=None):
+    global codec
+    import tkinter as tk
+    from tkinter import ttk, filedialog
+    from tkinter import messagebox
+
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        key = load_key(key_file)
+        codec = LicenseCodec(signing_key=key)
+    except Exception as e:
+        messagebox.showerror("Lỗi khóa", f"{e}\nCopy LICENSE_SIGNING_KEY từ file .env của server.")
+        sys.exit(2)
+    store = LicenseStore(db) if db else None
+    root.deiconify()
+
+    # Hàm lưu license vào file (client đọc trực tiếp token trong license.json)
+    def save_license_to_file(encrypted_license):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            initialfile="license.json",
+            filetypes=[("JSON files", "*.json")],
+            title="Lưu License"
+        )
+        if file_path:
+            try:
+                with open(file_path, "w", encoding="ascii") as f:
+                    f.write(encrypted_license)
+                messagebox.showinfo("Thông báo", "Lưu file thành công!")
+            except Exception as e:
+                messagebox.showerror("Lỗi", f"Lỗi khi lưu file: {e}")
+
+    # Khi nhấn nút Generate
+    def on_generate():
+        machine_id = entry_machine_id.get().strip()
+        package = combo_package.get()
+
+        if not machine_id or package not in PACKAGES:
+            messagebox.showwarning("Cảnh báo", "Vui lòng nhập đầy đủ thông tin.")
+            return
+
+        try:
+            if store and store.revoked_among([machine_id]):
+                messagebox.showwarning("Cảnh báo", "Máy này đã bị thu hồi license (bỏ thu hồi bằng license_store.py --unrevoke).")
+                return
+            issued_at = int(time.time())
+            encrypted_license = generate_license(machine_id, package, issued_at)
+            if store:
+                store.record_many([store_record(machine_id, package, encrypted_license, issued_at)])
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Lỗi tạo license: {e}")
+            return
 
-    if encrypted_license:
         result_text.delete("1.0", tk.END)
         result_text.insert(tk.END, encrypted_license)
         messagebox.showinfo("Thành công", "License đã được tạo thành công!")
@@ -81,46 +267,56 @@ def on_generate():
         # Gợi ý lưu file
         save_license_to_file(encrypted_license)
 
-# Sao chép vào clipboard
-def copy_to_clipboard():
-    result = result_text.get("1.0", tk.END).strip()
-    if result:
-        root.clipboard_clear()
-        root.clipboard_append(result)
-        messagebox.showinfo("Thông báo", "Đã sao chép vào clipboard.")
-
-# Giao diện GUI
-root = tk.Tk()
-root.title("Admin - Tạo License")
-root.geometry("500x400")
-root.configure(bg="#2E2E2E")
-
-# Nhập mã máy
-tk.Label(root, text="Mã máy:", bg="#2E2E2E", fg="white").pack(pady=5)
-entry_machine_id = tk.Entry(root, width=50, font=("Arial", 12))
-entry_machine_id.pack(pady=5)
-
-# Chọn gói
-tk.Label(root, text="Chọn gói:", bg="#2E2E2E", fg="white").pack(pady=5)
-combo_package = ttk.Combobox(root, values=list(PACKAGES.keys()), state="readonly", font=("Arial", 12))
-combo_package.set("1M")
-combo_package.pack(pady=5)
-
-# Nút tạo license
-generate_button = tk.Button(root, text="Tạo License", command=on_generate, bg="#4CAF50", fg="white", width=20)
-generate_button.pack(pady=10)
-
-# Hiển thị kết quả
-result_text = tk.Text(root, height=10, width=50, wrap=tk.WORD, bg="#333333", fg="white", font=("Courier", 10))
-result_text.pack(pady=10)
-
-# Nút sao chép
-copy_button = tk.Button(root, text="Sao chép", command=copy_to_clipboard, bg="#2196F3", fg="white", width=20)
-copy_button.pack(pady=5)
-
-# Label hiển thị key (chỉ phục vụ debug)
-key_label = tk.Label(root, text=f"Key (giữ an toàn): {KEY.decode()}", bg="#2E2E2E", fg="#FFA726", font=("Courier", 8))
-key_label.pack(pady=5, side=tk.BOTTOM)
-
-# Chạy giao diện
-root.mainloop()
\ No newline at end of file
+    # Sao chép vào clipboard
+    def copy_to_clipboard():
+        result = result_text.get("1.0", tk.END).strip()
+        if result:
+            root.clipboard_clear()
+            root.clipboard_append(result)
+            messagebox.showinfo("Thông báo", "Đã sao chép vào clipboard.")
+
+    root.title("Admin - Tạo License")
+    root.geometry("500x400")
+    root.configure(bg="#2E2E2E")
+
+    # Nhập mã máy
+    tk.Label(root, text="Mã máy:", bg="#2E2E2E", fg="white").pack(pady=5)
+    entry_machine_id = tk.Entry(root, width=50, font=("Arial", 12))
+    entry_machine_id.pack(pady=5)
+
+    # Chọn gói
+    tk.Label(root, text="Chọn gói:", bg="#2E2E2E", fg="white").pack(pady=5)
+    combo_package = ttk.Combobox(root, values=list(PACKAGES.keys()), state="readonly", font=("Arial", 12))
+    combo_package.set("1M")
+    combo_package.pack(pady=5)
+
+    # Nút tạo license
+    generate_button = tk.Button(root, text="Tạo License", command=on_generate, bg="#4CAF50", fg="white", width=20)
+    generate_button.pack(pady=10)
+
+    # Hiển thị kết quả
+    result_text = tk.Text(root, height=10, width=50, wrap=tk.WORD, bg="#333333", fg="white", font=("Courier", 10))
+    result_text.pack(pady=10)
+
+    # Nút sao chép
+    copy_button = tk.Button(root, text="Sao chép", command=copy_to_clipboard, bg="#2196F3", fg="white", width=20)
+    copy_button.pack(pady=5)
+
+    # Chạy giao diện
+    root.mainloop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tạo license: giao diện (mặc định) hoặc hàng loạt từ CSV/JSONL.")
+    parser.add_argument("--bulk", metavar="INPUT", help="CSV (cột machine_id,package[,username,voice_id]) hoặc JSONL")
+    parser.add_argument("--output", help="Ghi tất cả license vào một file JSONL")
+    parser.add_argument("--out-dir", help="Ghi mỗi máy một file <machine_id>-<băm>.lic (đổi tên thành license.json khi giao)")
+    parser.add_argument("--db", help="LicenseStore của server (LICENSE_DB, mặc định licenses.db) để ghi lại license đã cấp; "
+                                     "không có thì license nằm ngoài /status và thu hồi")
+    parser.add_argument("--key-file", help="File .env của server hoặc file chỉ chứa khóa (mặc định: LICENSE_SIGNING_KEY)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    if args.bulk:
+        main_bulk(args)
+    else:
+        run_gui(args.key_file, args.db)
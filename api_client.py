@@ -0,0 +1,136 @@
+# api_client.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- Connection Configuration ---
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 5
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.2   # Retries wait 0.2 s, 0.4 s, 0.8 s ...
+BACKOFF_JITTER = 0.2   # ... plus up to this many random seconds, so clients don't retry in lockstep
+BACKOFF_MAX = 2
+POOL_SIZE = 2
+
+class ServerClient:
+    """All calls from the app to the license server, run off the UI thread.
+
+    Requests go through one requests.Session, so the keep-alive connection
+    to the server is reused between calls. Connection failures and 5xx
+    replies are retried with jittered exponential backoff (the server's
+    endpoints are idempotent). Every call records its latency per endpoint.
+    """
+
+    def __init__(self, base_url, max_workers=1):
+        self.base_url = base_url.rstrip("/")
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="server-api")
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _get_session(self):
+        # requests/urllib3 load on the first call, not at startup
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retries = Retry(
+                    total=MAX_RETRIES,
+                    backoff_factor=BACKOFF_FACTOR,
+                    backoff_jitter=BACKOFF_JITTER,
+                    backoff_max=BACKOFF_MAX,
+                    status_forcelist=[500, 502, 503, 504],
+                    allowed_methods=None  # POST too: activation is idempotent
+                )
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retries)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def request(self, method, path, **kwargs):
+        """Performs a request on the calling thread and returns the decoded JSON body.
+
+        Raises requests.exceptions.RequestException for network and HTTP errors.
+        """
+        kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self._get_session().request(method, f"{self.base_url}{path}", **kwargs)
+            response.raise_for_status()
+            result = response.json()
+            ok = True
+            return result
+        finally:
+            self._record(f"{method} {path}", time.perf_counter() - started, ok)
+
+    def get_conditional(self, path, etag=None):
+        """GETs path with If-None-Match; returns (data, etag), with data None when unchanged (304).
+
+        Raises requests.exceptions.RequestException for network and HTTP errors.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self._get_session().get(f"{self.base_url}{path}", headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            if response.status_code == 304:
+                ok = True
+                return None, etag
+            response.raise_for_status()
+            result = response.json()
+            ok = True
+            return result, response.headers.get("ETag")
+        finally:
+            self._record(f"GET {path.rsplit('/', 1)[0]}", time.perf_counter() - started, ok)
+
+    def get_conditional_async(self, path, etag=None):
+        """Runs get_conditional() on the worker thread and returns a Future."""
+        return self._executor.submit(self.get_conditional, path, etag)
+
+    def submit(self, method, path, **kwargs):
+        """Runs request() on the worker thread and returns a Future."""
+        return self._executor.submit(self.request, method, path, **kwargs)
+
+    def post_async(self, path, payload):
+        """Posts JSON on the worker thread and returns a Future of the reply."""
+        return self.submit("POST", path, json=payload)
+
+    def _record(self, endpoint, latency, ok):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["total"] += latency
+            stats["max"] = max(stats["max"], latency)
+            stats["last"] = latency
+        logger.info(f"{endpoint} {'ok' if ok else 'failed'} in {latency * 1000:.1f} ms")
+
+    def stats(self):
+        """Returns per-endpoint call counters and latency figures in milliseconds."""
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "avg_latency_ms": round(stats["total"] / stats["calls"] * 1000, 1),
+                    "max_latency_ms": round(stats["max"] * 1000, 1),
+                    "last_latency_ms": round(stats["last"] * 1000, 1)
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+    def close(self):
+        """Stops the worker thread and closes pooled connections."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -0,0 +1,176 @@
+# audio_effects.py
+import io
+import logging
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Processing Defaults ---
+STRETCH_FRAME_MS = 40     # Overlap-add window; long enough to hold a pitch period of any voice
+STRETCH_OVERLAP = 4       # Frames overlapping each output sample
+STRETCH_SEARCH_HZ = 8000  # Frame alignment is searched at about this rate; speech energy sits well below 4 kHz
+TARGET_DBFS = -20.0       # Loudness (RMS of active speech) after normalization
+PEAK_CEILING_DBFS = -1.0  # Normalization never pushes peaks above this
+ACTIVE_THRESHOLD = 0.01   # Samples quieter than this don't count toward loudness
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+FORMATS = ("wav", "ogg")
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+def decode_wav(audio_data):
+    """Returns (float32 samples shaped (frames, channels) in [-1, 1], sample rate) for PCM WAV bytes."""
+    with wave.open(io.BytesIO(audio_data), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+def pcm16_to_float(raw, channels):
+    """Converts interleaved native-endian signed 16-bit PCM into float32 (frames, channels)."""
+    return (np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768).reshape(-1, channels)
+
+def align_frames(samples, count, frame, hop, speed, step=1):
+    """Returns WSOLA frame starts (in samples padded by hop at the front) for time_stretch.
+
+    Frame k starts within one hop of k * hop * speed, where it best matches
+    the natural continuation of frame k - 1. The search is sequential, but
+    each step is a single correlation over every step-th sample of the mono mix.
+    """
+    mono = np.pad(samples.mean(axis=1), (hop, 2 * hop))
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = hop
+    for index in range(1, count):
+        continuation = mono[starts[index - 1] + hop:starts[index - 1] + hop + frame:step]
+        nominal = int(index * hop * speed)  # The search window starts one hop before hop + nominal
+        candidates = mono[nominal:nominal + 2 * hop + frame:step]
+        starts[index] = nominal + step * int(np.argmax(np.correlate(candidates, continuation, "valid")))
+    return starts
+
+def time_stretch(samples, speed, sample_rate):
+    """Changes duration by 1/speed without changing pitch (WSOLA overlap-add).
+
+    Analysis frames are taken about every hop * speed samples and laid down
+    every hop samples. Each frame start is moved by up to one hop so the frame
+    lines up with the one before it (WSOLA); without that, voiced sounds whose
+    period doesn't divide the hop partly cancel and the level warbles. Frames
+    in the same overlap phase never touch, so each phase is added in one
+    slice and the overlap-add is STRETCH_OVERLAP vector ops.
+    """
+    if speed == 1.0 or len(samples) == 0:
+        return samples
+    frame = max(STRETCH_OVERLAP, int(sample_rate * STRETCH_FRAME_MS / 1000) // STRETCH_OVERLAP * STRETCH_OVERLAP)
+    hop = frame // STRETCH_OVERLAP
+    if len(samples) < frame:
+        samples = np.pad(samples, ((0, frame - len(samples)), (0, 0)))
+    count = int((len(samples) - frame) / (hop * speed)) + 1
+    starts = align_frames(samples, count, frame, hop, speed, max(1, sample_rate // STRETCH_SEARCH_HZ))
+    samples = np.pad(samples, ((hop, 2 * hop), (0, 0)))
+    window = np.hanning(frame).astype(np.float32)
+    frames = samples[starts[:, None] + np.arange(frame)] * window[None, :, None]
+    output = np.zeros(((count - 1) * hop + frame, samples.shape[1]), dtype=np.float32)
+    weight = np.zeros(len(output), dtype=np.float32)
+    for phase in range(min(STRETCH_OVERLAP, count)):
+        group = frames[phase::STRETCH_OVERLAP]
+        start = phase * hop
+        end = start + len(group) * frame
+        output[start:end] += group.reshape(-1, samples.shape[1])
+        weight[start:end] += np.tile(window, len(group))
+    # Undo the window sum; the ramps at both ends have near-zero weight and stay quiet
+    return output / np.maximum(weight, 0.1)[:, None]
+
+def apply_gain(samples, gain_db):
+    if gain_db == 0:
+        return samples
+    return samples * db_to_gain(gain_db)
+
+def normalize_loudness(samples, target_dbfs=TARGET_DBFS, peak_ceiling_dbfs=PEAK_CEILING_DBFS):
+    """Scales samples so active speech has target_dbfs RMS, without lifting peaks past the ceiling."""
+    magnitude = np.abs(samples)
+    active = samples[magnitude.max(axis=1) > ACTIVE_THRESHOLD]
+    if active.size == 0:
+        return samples
+    rms = float(np.sqrt(np.mean(np.square(active))))
+    peak = float(magnitude.max())
+    gain = min(db_to_gain(target_dbfs) / rms, db_to_gain(peak_ceiling_dbfs) / peak)
+    return samples * gain
+
+def resample(samples, source_rate, target_rate):
+    """Linearly interpolates samples to target_rate (speech band only; no anti-alias filter)."""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    length = max(1, round(len(samples) * target_rate / source_rate))
+    positions = np.arange(length) * (source_rate / target_rate)
+    source = np.arange(len(samples))
+    return np.stack([np.interp(positions, source, samples[:, c]) for c in range(samples.shape[1])], axis=1).astype(np.float32)
+
+def encode_wav(samples, sample_rate):
+    """Encodes float samples as 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def encode_ogg(samples, sample_rate):
+    """Encodes float samples as Ogg Vorbis (requires the soundfile package)."""
+    try:
+        import soundfile
+    except ImportError:
+        raise RuntimeError("OGG output needs the soundfile package (pip install soundfile)")
+    buffer = io.BytesIO()
+    soundfile.write(buffer, np.clip(samples, -1.0, 1.0), sample_rate, format="OGG", subtype="VORBIS")
+    return buffer.getvalue()
+
+class AudioProcessor:
+    """Post-processes synthesized audio: speed, gain, loudness, sample rate and format.
+
+    Audio is decoded to float PCM once and every step is a NumPy operation
+    over the whole buffer. WAV is parsed directly; other formats (gTTS MP3)
+    go through decode(audio), which must return (interleaved signed 16-bit
+    PCM, sample rate, channels).
+    """
+
+    def __init__(self, decode=None):
+        self.decode = decode
+
+    def to_pcm(self, audio_data):
+        if audio_data[:4] == b"RIFF":
+            return decode_wav(audio_data)
+        if self.decode is None:
+            raise RuntimeError("No decoder available for compressed audio")
+        raw, sample_rate, channels = self.decode(audio_data)
+        return pcm16_to_float(raw, channels), sample_rate
+
+    def process(self, audio_data, speed=1.0, gain_db=0.0, normalize=False, sample_rate=None, fmt="wav"):
+        """Returns audio_data re-encoded as fmt with the given speed, gain and loudness applied."""
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"speed must be between {MIN_SPEED} and {MAX_SPEED}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt} (choose from {', '.join(FORMATS)})")
+        if speed == 1.0 and not gain_db and not normalize and not sample_rate and fmt == "wav" and audio_data[:4] == b"RIFF":
+            return audio_data  # Nothing would change; skip the decode/encode round trip
+        samples, rate = self.to_pcm(audio_data)
+        samples = time_stretch(samples, speed, rate)
+        if normalize:
+            samples = normalize_loudness(samples)
+        samples = apply_gain(samples, gain_db)
+        if sample_rate:
+            samples = resample(samples, rate, sample_rate)
+            rate = sample_rate
+        return encode_ogg(samples, rate) if fmt == "ogg" else encode_wav(samples, rate)
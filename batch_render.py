@@ -0,0 +1,164 @@
+# batch_render.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tts_backends import BACKENDS, get_backend
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Batch Configuration ---
+DEFAULT_WORKERS = os.cpu_count() or 4
+MANIFEST_NAME = "manifest.jsonl"
+
+# Backend instance owned by each worker process
+_backend = None
+
+def _init_worker(backend_name):
+    """Creates one TTS backend per worker process."""
+    global _backend
+    _backend = get_backend(backend_name)
+
+def content_id(text, lang):
+    """Id for lines of a plain text file; stays the same when other lines are added, removed or moved."""
+    return hashlib.sha256(f"{lang}\n{text}".encode("utf-8")).hexdigest()[:16]
+
+def load_items(path, default_lang):
+    """Reads utterances from a JSONL file ({"id", "text", "lang", "slow"}) or a plain text file."""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                # Also accept request-style records ({"request_id", "body"})
+                items.append({
+                    "id": str(record.get("id") or record.get("request_id") or f"{line_no:05d}"),
+                    "text": record.get("text") or record.get("body", ""),
+                    "lang": record.get("lang", default_lang),
+                    "slow": bool(record.get("slow", False))
+                })
+        else:
+            for line in f:
+                if line.strip():
+                    items.append({"id": content_id(line.strip(), default_lang), "text": line.strip(), "lang": default_lang, "slow": False})
+    return items
+
+def output_name(item_id, extension):
+    """Turns an item id into a safe file name."""
+    return re.sub(r'[^\w.-]', '_', item_id) + extension
+
+def _base_record(item, output_path):
+    """Returns the manifest fields shared by every outcome."""
+    return {"id": item["id"], "file": os.path.basename(output_path), "lang": item["lang"], "chars": len(item["text"])}
+
+def render_item(item, output_path):
+    """Synthesizes one utterance into output_path and returns its manifest record."""
+    record = _base_record(item, output_path)
+    tmp_path = None
+    started = time.perf_counter()
+    try:
+        if not item["text"].strip():
+            raise ValueError("Empty text")
+        data = _backend.synthesize(item["text"], item["lang"], item["slow"])
+        # Write atomically so an interrupted run never leaves a file that looks finished
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, output_path)
+        record.update(status="rendered", bytes=len(data), error=None)
+    except Exception as e:
+        record.update(status="error", bytes=0, error=str(e))
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+def check_license():
+    """Applies the same license check as the GUI client."""
+    from client_core import read_license, license_is_active
+    try:
+        license_data = read_license()
+    except Exception as e:
+        logger.error(f"Error loading license: {e}")
+        return False
+    return license_is_active(license_data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render utterances to audio files without the GUI.")
+    parser.add_argument("input", help="JSONL or text file with one utterance per line")
+    parser.add_argument("-o", "--output-dir", default="rendered")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--backend", default=None, choices=list(BACKENDS), help="TTS backend (defaults to TTS_BACKEND or gtts)")
+    parser.add_argument("--lang", default="vi", help="Language for items that don't set one")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if not check_license():
+        logger.error("License is missing or expired. Renew it in the app before batch rendering.")
+        sys.exit(1)
+
+    backend_name = args.backend or os.getenv("TTS_BACKEND", "gtts")
+    extension = get_backend(backend_name).extension
+    items = load_items(args.input, args.lang)
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+
+    started = time.perf_counter()
+    counts = {"rendered": 0, "skipped": 0, "error": 0}
+    # Appended, so records of earlier (interrupted) runs are kept alongside this one
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        pending = []
+        claimed = {}  # output path -> (text, lang, slow) of the item rendering it
+        for item in items:
+            output_path = os.path.join(args.output_dir, output_name(item["id"], extension))
+            content = (item["text"], item["lang"], item["slow"])
+            if output_path in claimed:
+                # Never let two items write the same file; repeats of the same utterance just share it
+                record = _base_record(item, output_path)
+                if claimed[output_path] == content:
+                    record.update(status="skipped", bytes=0, error=None, latency_ms=0.0)
+                    counts["skipped"] += 1
+                else:
+                    record.update(status="error", bytes=0, error=f"Duplicate id {item['id']!r} with different text", latency_ms=0.0)
+                    counts["error"] += 1
+                    logger.warning(f"Item {item['id']} failed: {record['error']}")
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                continue
+            claimed[output_path] = content
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                # Resume support: keep outputs from earlier runs
+                record = _base_record(item, output_path)
+                record.update(status="skipped", bytes=os.path.getsize(output_path), error=None, latency_ms=0.0)
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                counts["skipped"] += 1
+                continue
+            pending.append((item, output_path))
+
+        logger.info(f"Rendering {len(pending)} of {len(items)} items with {args.workers} workers ({backend_name})")
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(backend_name,)) as pool:
+            futures = [pool.submit(render_item, item, output_path) for item, output_path in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                counts[record["status"]] += 1
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest.flush()
+                if record["error"]:
+                    logger.warning(f"Item {record['id']} failed: {record['error']}")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Done in {elapsed:.1f} s: {counts['rendered']} rendered, {counts['skipped']} skipped, {counts['error']} failed. Manifest: {manifest_path}")
+    sys.exit(1 if counts["error"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_license_token.py
+import argparse
+import datetime
+import hashlib
+import json
+import time
+import timeit
+
+from cryptography.fernet import Fernet
+
+from license_codec import DATE_FORMAT, LicenseCodec, format_epoch, generate_signing_key
+
+def legacy_decode_and_check(codec, token):
+    """Client-side work for a legacy token: unwrap, decrypt, parse JSON, strptime."""
+    license_data = codec.decode_legacy(token)
+    expiry = datetime.datetime.strptime(license_data["expiration_date"], DATE_FORMAT)
+    return datetime.datetime.now() < expiry
+
+def compact_decode_and_check(codec, token):
+    """Client-side work for a compact token: verify signature, unpack, compare epochs."""
+    return time.time() < codec.decode(token)["expires_at"]
+
+def run(number):
+    codec = LicenseCodec(signing_key=generate_signing_key(), legacy_key=Fernet.generate_key())
+    machine_id = hashlib.sha256(b"benchmark-machine").hexdigest()
+    issued_at = int(time.time())
+    expires_at = issued_at + 30 * 86400
+    license_data = {
+        "username": "hoanq",
+        "voice_id": "Free",
+        "registration_date": format_epoch(issued_at),
+        "status": "Đã đăng ký",
+        "expiration_date": format_epoch(expires_at),
+        "package": "1M",
+        "machine_id": machine_id
+    }
+    legacy_token = codec.encode_legacy(license_data)
+    compact_token = codec.encode(machine_id, "1M", issued_at, expires_at)
+
+    def per_call_us(fn):
+        return round(min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6, 2)
+
+    return {
+        "legacy": {
+            "bytes": len(legacy_token),
+            "encode_us": per_call_us(lambda: codec.encode_legacy(license_data)),
+            "decode_us": per_call_us(lambda: legacy_decode_and_check(codec, legacy_token))
+        },
+        "compact": {
+            "bytes": len(compact_token),
+            "encode_us": per_call_us(lambda: codec.encode(machine_id, "1M", issued_at, expires_at)),
+            "decode_us": per_call_us(lambda: compact_decode_and_check(codec, compact_token))
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy Fernet license tokens with compact tokens.")
+    parser.add_argument("-n", "--number", type=int, default=2000, help="Iterations per measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    results = run(args.number)
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{'format':<10}{'bytes':>8}{'encode µs':>12}{'decode µs':>12}")
+    for name, row in results.items():
+        print(f"{name:<10}{row['bytes']:>8}{row['encode_us']:>12}{row['decode_us']:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# bench_suite.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import uuid
+
+# --- Benchmark Defaults ---
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.30  # Relative slowdown reported as a regression
+# Changes smaller than this are timer noise, whatever their relative size
+NOISE_FLOOR = {"_us": 2.0, "_ms": 0.5}
+STUB_LATENCY_MS = 50      # Simulated network round trip of one synthesis call
+SAMPLE_TEXT = ("Chào mừng bạn về nhà. Đèn phòng khách đã bật, nhiệt độ hiện tại là 26 độ. "
+               "Cửa garage vẫn đang mở, bạn có muốn đóng lại không? Máy giặt sẽ xong sau 15 phút nữa.")
+
+def per_call_us(fn, number):
+    return round(min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6, 2)
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def setup_environment(workdir):
+    """Runs everything inside a scratch directory so logs, DBs and license files never touch the repo."""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    os.environ["TTS_BACKEND"] = "offline"
+    os.environ["RATELIMIT_ENABLED"] = "false"
+    os.environ["RATELIMIT_STORAGE_URI"] = "memory://"
+    os.environ["LICENSE_DB"] = os.path.join(workdir, "licenses.db")
+    os.environ["LOG_FILE"] = os.path.join(workdir, "server.log")
+    import logging
+    # Per-request log lines would only measure the console
+    logging.disable(logging.CRITICAL)
+    from cryptography.fernet import Fernet
+    from license_codec import generate_signing_key, public_key_for
+    # A throwaway key pair: the server signs, the client verifies with the public half
+    signing_key = generate_signing_key()
+    os.environ["FERNET_KEY"] = Fernet.generate_key().decode()
+    os.environ["LICENSE_SIGNING_KEY"] = signing_key
+    os.environ["LICENSE_PUBLIC_KEY"] = public_key_for(signing_key)
+    import client_core  # noqa: F401
+    import server
+    # Same logging pipeline as serve.py (records are still dropped by logging.disable above)
+    server.init_logging()
+
+def bench_activate(requests_count):
+    """POST /activate through Flask's test client (new licenses, idempotent repeats) and status polls."""
+    import server
+    test_client = server.app.test_client()
+    results = {}
+    for name, machine_ids in (("issue", [uuid.uuid4().hex for _ in range(requests_count)]),
+                              ("reuse", [uuid.uuid4().hex] * requests_count)):
+        latencies = []
+        started = time.perf_counter()
+        for machine_id in machine_ids:
+            request_started = time.perf_counter()
+            response = test_client.post("/activate", json={"machine_id": machine_id, "package": "1M", "token_format": "v2"})
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise RuntimeError(f"/activate returned {response.status_code}: {response.get_data(as_text=True)}")
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        results[f"{name}_per_s"] = round(requests_count / elapsed, 1)
+        results[f"{name}_p50_ms"] = round(percentile(latencies, 0.5) * 1000, 3)
+        results[f"{name}_p99_ms"] = round(percentile(latencies, 0.99) * 1000, 3)
+    # Conditional status poll of an unchanged license (empty 304)
+    etag = test_client.get(f"/status/{machine_ids[0]}").headers["ETag"]
+    latencies = []
+    for _ in range(requests_count):
+        request_started = time.perf_counter()
+        response = test_client.get(f"/status/{machine_ids[0]}", headers={"If-None-Match": etag})
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code != 304:
+            raise RuntimeError(f"/status returned {response.status_code}")
+    latencies.sort()
+    results["status_304_p50_ms"] = round(percentile(latencies, 0.5) * 1000, 3)
+    return results
+
+def bench_license(number):
+    """Client license file round trip, legacy Fernet encrypt/decrypt and machine id."""
+    import client_core as client
+    import server
+    machine_id = client.generate_machine_id()
+    issued_at = int(time.time())
+    # Tokens are signed by the server; the client only verifies them
+    token = server.codec.encode(machine_id, "1M", issued_at, issued_at + 30 * 86400)
+    license_data = client.get_codec().decode(token)
+    path = os.path.abspath("bench_license.json")
+
+    def save():
+        # Same work as SmartHomeApp.save_license
+        with open(path, "w", encoding="ascii") as f:
+            f.write(token)
+
+    save()
+    state = client.LicenseState(path)
+    state.load()
+
+    def load_cold():
+        state._signature = None
+        state.load()
+
+    legacy_token = server.codec.encode_legacy(license_data)
+    return {
+        "save_license_us": per_call_us(save, number),
+        "load_license_cold_us": per_call_us(load_cold, number),
+        "load_license_cached_us": per_call_us(state.load, number),
+        "fernet_encrypt_us": per_call_us(lambda: server.codec.encode_legacy(license_data), number),
+        "fernet_decrypt_us": per_call_us(lambda: server.codec.decode_legacy(legacy_token), number),
+        "machine_id_uncached_us": per_call_us(client.generate_machine_id.__wrapped__, max(1, number // 10)),
+        "machine_id_cached_us": per_call_us(client.generate_machine_id, number)
+    }
+
+def bench_pipeline(runs, stub_latency_ms):
+    """Text to first audio through chunking, a stubbed backend, pygame decoding and the playback engine."""
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        return {"skipped": "pygame not installed"}
+    import client_core as client
+    from playback import PlaybackEngine
+    from speech_pipeline import split_sentences, synthesize_chunks
+    from tts_backends import OfflineBackend
+
+    class StubBackend(OfflineBackend):
+        """Offline audio returned after a fixed delay, standing in for a network TTS call."""
+        name = "stub"
+
+        def _synthesize(self, text, lang, slow):
+            time.sleep(stub_latency_ms / 1000)
+            return super()._synthesize(text, lang, slow)
+
+    backend = StubBackend()
+    client.mixer_manager.init()
+    if not client.mixer_manager.initialized:
+        return {"skipped": "no audio device"}
+    first_audio = []
+    totals = []
+    for _ in range(runs):
+        started_event = threading.Event()
+        engine = PlaybackEngine(client.mixer_manager, on_event=lambda name, tag: name == "track_start" and started_event.set())
+        engine.start()
+        started = time.perf_counter()
+        chunks = split_sentences(SAMPLE_TEXT)
+        for index, audio_data in enumerate(synthesize_chunks(chunks, lambda chunk: backend.synthesize(chunk, "vi"))):
+            engine.enqueue(audio_data, tag=index)
+            if index == 0:
+                started_event.wait(5)
+                first_audio.append(time.perf_counter() - started)
+        totals.append(time.perf_counter() - started)
+        engine.close()
+    return {
+        "first_audio_ms": round(statistics.median(first_audio) * 1000, 2),
+        "all_chunks_queued_ms": round(statistics.median(totals) * 1000, 2)
+    }
+
+def compare(results, baseline, threshold):
+    """Returns (rows, regressions) comparing results with baseline metrics."""
+    rows = []
+    regressions = []
+    for group, metrics in results.items():
+        for name, value in metrics.items():
+            old = baseline.get(group, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            # Throughput should go up; everything else is a time and should go down
+            worse = -change if name.endswith("_per_s") else change
+            rows.append((f"{group}.{name}", old, value, change))
+            floor = next((value for suffix, value in NOISE_FLOOR.items() if name.endswith(suffix)), 0)
+            # Tail latencies are too noisy on a shared machine to fail a run
+            if worse > threshold and abs(value - old) >= floor and "_p99_" not in name:
+                regressions.append(f"{group}.{name}")
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the server, license handling and speech pipeline.")
+    parser.add_argument("--only", choices=["activate", "license", "pipeline"], action="append",
+                        help="Run only these groups (repeatable)")
+    parser.add_argument("-n", "--requests", type=int, default=500, help="Activation requests per case")
+    parser.add_argument("--number", type=int, default=500, help="Iterations per micro-benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Pipeline runs")
+    parser.add_argument("--stub-latency-ms", type=float, default=STUB_LATENCY_MS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative change counted as a regression")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    groups = args.only or ["activate", "license", "pipeline"]
+    baseline_path = os.path.abspath(args.baseline)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as workdir:
+        setup_environment(workdir)
+        results = {}
+        if "activate" in groups:
+            results["activate"] = bench_activate(args.requests)
+        if "license" in groups:
+            results["license"] = bench_license(args.number)
+        if "pipeline" in groups:
+            results["pipeline"] = bench_pipeline(args.runs, args.stub_latency_ms)
+        os.chdir(REPO_DIR)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {"requests": args.requests, "number": args.number, "runs": args.runs, "stub_latency_ms": args.stub_latency_ms},
+        "results": results
+    }
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    baseline = {}
+    if not args.save_baseline and os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    rows, regressions = compare(results, baseline, args.threshold)
+
+    if args.json:
+        report["regressions"] = regressions
+        print(json.dumps(report))
+    else:
+        for group, metrics in results.items():
+            print(f"[{group}]")
+            for name, value in metrics.items():
+                print(f"  {name:<26}{value:>12}")
+        if rows:
+            print(f"\nvs baseline {os.path.basename(baseline_path)}:")
+            for name, old, new, change in rows:
+                flag = "  REGRESSION" if name in regressions else ""
+                print(f"  {name:<36}{old:>12}{new:>12}{change:>+9.1%}{flag}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
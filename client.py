@@ -1,24 +1,18 @@
 # client.py
+import time
+_STARTUP_STARTED = time.perf_counter()
 import tkinter as tk
 from tkinter import messagebox, ttk
-import time
 import datetime
-import json
-import os
-import hashlib
-import platform
-from gtts import gTTS
-import pygame
 import sys
 import logging
-from cryptography.fernet import Fernet
-import base64
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import queue
 import threading
-import uuid
+import random
 from functools import wraps
+from api_client import ServerClient
+from speculation import Speculator, completed_chunks
+from job_queue import PRIORITY_ALERT, PRIORITY_NORMAL
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -31,47 +25,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# --- License Key Configuration ---
-# Replace this with the key from server.py (printed in server console or in .env file)
-KEY = b'V0429G-GlyXHD2a6NfRCiRcAcFFbn7JvP9oe35kz6Sc='  # Example: b'gXjB4Z3X9y7zK2mPqWvL8tR5nF0hJ6uYxC1dE2aB3cI='
+# --- Shared License and Synthesis Helpers ---
+# GUI-free, so the headless service and batch renderer reuse them (see client_core.py)
 try:
-    cipher = Fernet(KEY)
+    from client_core import (LICENSE_FILE, TTS_JOB_QUEUE_SIZE, TTS_JOB_WORKERS, JobScheduler, LicenseState,
+                             PlaybackEngine, audio_cache_stats, generate_machine_id, get_audio_cache, get_codec,
+                             close_phrase_renderer, license_is_active, load_license_status, make_cache_key, mixer_manager, parse_expiry,
+                             save_license_status, speak_job, split_sentences, synthesize_chunk, telemetry, trial_license, tts_backend)
 except Exception as e:
-    logger.error(f"Failed to initialize Fernet cipher: {e}")
-    messagebox.showerror("Cấu hình lỗi", "Không thể khởi tạo mã hóa.\n1. Chạy server.py để lấy KEY.\n2. Copy KEY từ console server hoặc file .env.\n3. Thay thế KEY trong client.py.")
+    logger.error(f"Failed to initialize client: {e}")
+    messagebox.showerror("Cấu hình lỗi", f"Không thể khởi tạo ứng dụng: {e}")
     sys.exit(1)
 
-# --- Pygame Mixer Management ---
-class MixerManager:
-    def __init__(self):
-        self.initialized = False
-
-    def init(self):
-        if not self.initialized:
-            try:
-                import os
-                import sys
-                # Suppress Pygame welcome message
-                with open(os.devnull, 'w') as f:
-                    sys.stdout = f
-                    pygame.mixer.init()
-                    sys.stdout = sys.__stdout__
-                self.initialized = True
-                logger.info("Pygame mixer initialized")
-            except Exception as e:
-                logger.warning(f"Failed to initialize pygame mixer: {e}")
-
-    def cleanup(self):
-        if self.initialized:
-            try:
-                pygame.mixer.quit()
-                self.initialized = False
-                logger.info("Pygame mixer cleaned up")
-            except Exception as e:
-                logger.error(f"Error cleaning up pygame mixer: {e}")
-
-mixer_manager = MixerManager()
-
 # --- Subscription Packages ---
 PACKAGES = {
     "1M": {"price": 10.0, "duration_days": 30},
@@ -82,29 +47,33 @@ PACKAGES = {
 
 # --- Server Configuration ---
 SERVER_URL = "http://127.0.0.1:5000"
-REQUEST_TIMEOUT = 5
-MAX_RETRIES = 3
 
-# --- HTTP Session with Retry ---
-session = requests.Session()
-retries = Retry(total=MAX_RETRIES, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-session.mount('http://', HTTPAdapter(max_retries=retries))
+# --- License File ---
+TRIAL_SECONDS = 3 * 60
+# Tk timers are re-armed in slices so very long licenses never overflow after()
+MAX_EXPIRY_TIMER_MS = 6 * 60 * 60 * 1000
 
-# --- Utility Functions ---
-def generate_machine_id():
-    """Generates a stable machine ID."""
-    try:
-        components = [
-            platform.node(),
-            platform.system(),
-            platform.processor(),
-            str(uuid.getnode())
-        ]
-        unique_string = ':'.join(filter(None, components))
-        return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
-    except Exception as e:
-        logger.error(f"Error generating machine ID: {e}")
-        return hashlib.sha256(platform.node().encode('utf-8')).hexdigest()
+# --- License Status Polling ---
+# Conditional GET /status/<machine_id>; an unchanged license costs the server one
+# indexed lookup and an empty 304. Intervals are jittered so clients never poll in lockstep.
+LICENSE_POLL_SECONDS = 6 * 60 * 60
+LICENSE_POLL_FIRST_SECONDS = 60
+LICENSE_POLL_JITTER = 0.2
+
+# --- License Server Client ---
+# Calls run on a background worker over a reused keep-alive connection
+server_api = ServerClient(SERVER_URL)
+
+# --- Audio Post-Processing ---
+SPEED_CHOICES = ("0.75", "1.0", "1.25", "1.5")
+
+# --- Worker to Tk Thread Hand-off ---
+# Tk is not thread-safe: worker threads queue callbacks and the Tk thread runs them on this timer
+UI_POLL_MS = 50
+
+# --- Speculative Synthesis ---
+# Opt-in: finished sentences are synthesized while the user is still typing
+SPECULATION_DEBOUNCE_MS = 700
 
 def require_active_license(func):
     """Decorator to ensure an active license."""
@@ -123,57 +92,105 @@ class SmartHomeApp(tk.Tk):
         self.configure(bg="#2E2E2E")
         self.geometry("600x400")
         self._lock = threading.Lock()
+        self.license_state = LicenseState()
+        # Callbacks posted by worker threads, run on the Tk thread (see call_in_ui)
+        self._ui_calls = queue.Queue()
         # --- State Variables ---
         self.total_seconds = 0
         self.current_start_time = None
         self.license_data = None
+        # In-memory trial used while the license file holds no active license
+        self.trial_data = None
         self.selected_package = "1M"
-        self.is_generating = False
-        # --- Initialize License ---
-        self.initialize_license()
+        # Monotonic instant the current license expires at, the license it was computed for and its pending after() id
+        self.expiry_deadline = None
+        self.expiry_license = None
+        self.expiry_timer = None
+        # Revocation reported by the server's status endpoint (saved across restarts), its last ETag and the pending poll
+        saved_status = load_license_status(generate_machine_id())
+        self.license_revoked = saved_status.get("status") == "revoked"
+        self.license_status_etag = saved_status.get("etag")
+        self.status_poll_timer = None
+        # Playback start time per track, for the playback duration histogram
+        self.track_started = {}
+        # Tracks cut off by an alert, which replay from their start
+        self.interrupted_tracks = set()
+        # Pending debounce after() id for speculative synthesis
+        self.speculation_timer = None
+        self.speculator = Speculator(lambda text, lang: synthesize_chunk(text, lang),
+                                     needed=lambda text, lang: make_cache_key(text, lang) not in get_audio_cache(),
+                                     record=telemetry.incr)
+        self.job_scheduler = JobScheduler(self.run_job, max_workers=TTS_JOB_WORKERS, max_pending=TTS_JOB_QUEUE_SIZE)
+        # Events arrive on the playback thread and are handed to the Tk thread
+        self.playback = PlaybackEngine(mixer_manager, on_event=lambda name, tag: self.call_in_ui(self.on_playback_event, name, tag))
         # --- Setup GUI ---
         self.setup_gui()
-        # --- Update Status ---
-        self.update_status()
-        self.update_license_tab()
         # --- Bind Events ---
         self.bind('<q>', self.exit_on_q)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # --- Deferred Initialization ---
+        # License work runs once the window is on screen
+        self.after_idle(self.finish_startup)
+        self.after(UI_POLL_MS, self.drain_ui_calls)
+
+    def call_in_ui(self, func, *args):
+        """Runs func(*args) on the Tk thread; safe to call from any thread."""
+        self._ui_calls.put((func, args))
+
+    def drain_ui_calls(self):
+        """Runs callbacks queued by worker threads, then re-arms itself."""
+        while True:
+            try:
+                func, args = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"UI callback {getattr(func, '__name__', func)} failed: {e}")
+        self.after(UI_POLL_MS, self.drain_ui_calls)
+
+    def finish_startup(self):
+        """Initializes the license and status labels after the window appears."""
+        logger.info(f"Window ready in {(time.perf_counter() - _STARTUP_STARTED) * 1000:.0f} ms")
+        # Opens the mixer in the background so the first utterance starts without delay
+        self.playback.start()
+        telemetry.start()
+        self.initialize_license()
+        self.schedule_expiry()
+        self.update_status()
+        self.update_license_tab()
+        self.schedule_status_poll(LICENSE_POLL_FIRST_SECONDS)
 
     def load_license(self):
-        """Loads and decrypts license data."""
+        """Loads and verifies license data, falling back to the running trial."""
+        telemetry.incr("license_checks")
+        try:
+            get_codec()
+        except Exception as e:
+            logger.error(f"Failed to initialize license verification: {e}")
+            messagebox.showerror("Cấu hình lỗi", "Không thể khởi tạo khóa kiểm tra license.\n1. Chạy server.py để lấy khóa công khai (LICENSE_PUBLIC_KEY) trong log.\n2. Đặt biến môi trường LICENSE_PUBLIC_KEY hoặc sửa LICENSE_PUBLIC_KEY trong client_core.py.")
+            return self.trial_data
         with self._lock:
             try:
-                if not os.path.exists("license.json"):
-                    logger.info("License file not found")
-                    return None
-                with open("license.json", "rb") as f:
-                    encrypted_data = f.read()
-                if not encrypted_data:
-                    logger.warning("License file is empty")
-                    return None
-                decrypted_data = cipher.decrypt(encrypted_data)
-                license_data = json.loads(decrypted_data.decode('utf-8'))
-                required_fields = ['username', 'voice_id', 'registration_date', 'status', 'expiration_date', 'package', 'machine_id']
-                if not all(field in license_data for field in required_fields):
-                    logger.error("Invalid license data structure")
-                    return None
-                if license_data['machine_id'] != generate_machine_id():
-                    logger.warning("Machine ID mismatch in license")
-                    return None
-                return license_data
+                # Timed inside the lock so waiting for another caller doesn't count as load time
+                with telemetry.timer("license_load_ms"):
+                    license_data = self.license_state.load()
             except Exception as e:
                 logger.error(f"Error loading license: {e}")
-                messagebox.showwarning("Lỗi License", "Không thể đọc hoặc giải mã file license.")
-                return None
+                messagebox.showwarning("Lỗi License", "Không thể đọc hoặc xác minh file license. Vui lòng gia hạn để nhận license mới.")
+                license_data = None
+        if self.trial_data is not None and not (license_data and self.license_state.is_active()):
+            return self.trial_data
+        return license_data
 
-    def save_license(self, license_data):
-        """Encrypts and saves license data."""
+    def save_license(self, token, license_data):
+        """Saves a signed license token exactly as the server issued it."""
         with self._lock:
             try:
-                encrypted_data = cipher.encrypt(json.dumps(license_data).encode('utf-8'))
-                with open("license.json", "wb") as f:
-                    f.write(encrypted_data)
+                with open(LICENSE_FILE, "w", encoding="ascii") as f:
+                    f.write(token)
+                self.license_state.update(license_data)
                 logger.info("License saved successfully")
             except Exception as e:
                 logger.error(f"Error saving license: {e}")
@@ -181,18 +198,14 @@ class SmartHomeApp(tk.Tk):
 
     def is_license_active(self):
         """Checks if the license is active."""
-        if not self.license_data or not self.license_data.get("expiration_date"):
-            return False
-        expiry_date_str = self.license_data["expiration_date"]
-        if expiry_date_str == "Vĩnh viễn":
-            return True
-        try:
-            current_date = datetime.datetime.now()
-            expiry_date = datetime.datetime.strptime(expiry_date_str, "%d/%m/%Y %H:%M:%S")
-            return current_date < expiry_date
-        except Exception as e:
-            logger.error(f"Error checking license: {e}")
+        if self.license_revoked:
             return False
+        if self.expiry_deadline is not None and self.expiry_license is self.license_data:
+            # Only the monotonic deadline counts, so setting the system clock back can't extend the license
+            return time.monotonic() < self.expiry_deadline
+        if self.license_data is self.license_state.data:
+            return self.license_state.is_active()
+        return license_is_active(self.license_data)
 
     def initialize_license(self):
         """Initializes license or sets up trial."""
@@ -202,21 +215,13 @@ class SmartHomeApp(tk.Tk):
             self.selected_package = self.license_data.get("package", "1M")
             if hasattr(self, 'package_var'):
                 self.package_var.set(self.selected_package)
+        elif self.license_data and self.license_revoked:
+            logger.info("License revoked (saved status); waiting for the server to lift it")
         else:
             logger.info("Initializing trial license")
-            machine_id = generate_machine_id()
-            start_date = datetime.datetime.now()
-            trial_end = start_date + datetime.timedelta(minutes=3)
-            self.license_data = {
-                "username": "trial_user",
-                "voice_id": "Free",
-                "registration_date": start_date.strftime("%d/%m/%Y %H:%M:%S"),
-                "status": "Dùng thử",
-                "expiration_date": trial_end.strftime("%d/%m/%Y %H:%M:%S"),
-                "package": "TRIAL",
-                "machine_id": machine_id
-            }
-            self.save_license(self.license_data)
+            # Only the server can sign licenses, so the trial is never written to the license file
+            self.license_data = self.trial_data = trial_license(TRIAL_SECONDS)
+            machine_id = self.license_data["machine_id"]
             self.selected_package = "TRIAL"
             messagebox.showinfo("Thông báo", f"Bạn đang ở chế độ dùng thử 3 phút.\nMã máy: {machine_id}")
 
@@ -236,17 +241,34 @@ class SmartHomeApp(tk.Tk):
         package_label.pack(side="left", padx=5)
         self.package_menu = ttk.OptionMenu(package_frame, self.package_var, self.selected_package, *PACKAGES.keys())
         self.package_menu.pack(side="left")
-        tk.Button(main_tab, text="Đăng ký/Gia hạn", command=lambda: self.renew_license(self.package_var.get()),
-                  bg="#4CAF50", fg="white", font=("Arial", 10)).pack(pady=10)
+        self.renew_button = tk.Button(main_tab, text="Đăng ký/Gia hạn", command=lambda: self.renew_license(self.package_var.get()),
+                                      bg="#4CAF50", fg="white", font=("Arial", 10))
+        self.renew_button.pack(pady=10)
         language_frame = tk.Frame(main_tab, bg="#2E2E2E")
         language_frame.pack(pady=10)
         self.language_var = tk.StringVar(value="vi")
         tk.Label(language_frame, text="Ngôn ngữ:", bg="#2E2E2E", fg="white", font=("Arial", 10)).pack(side="left", padx=5)
         self.language_menu = ttk.OptionMenu(language_frame, self.language_var, "vi", "en", "vi")
         self.language_menu.pack(side="left")
+        self.alert_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(language_frame, text="Cảnh báo (ưu tiên)", variable=self.alert_var, bg="#2E2E2E", fg="white",
+                       selectcolor="#333333", activebackground="#2E2E2E", font=("Arial", 10)).pack(side="left", padx=10)
+        voice_frame = tk.Frame(main_tab, bg="#2E2E2E")
+        voice_frame.pack()
+        self.speed_var = tk.StringVar(value="1.0")
+        tk.Label(voice_frame, text="Tốc độ:", bg="#2E2E2E", fg="white", font=("Arial", 10)).pack(side="left", padx=5)
+        ttk.OptionMenu(voice_frame, self.speed_var, "1.0", *SPEED_CHOICES).pack(side="left")
+        self.normalize_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(voice_frame, text="Chuẩn hóa âm lượng", variable=self.normalize_var, bg="#2E2E2E", fg="white",
+                       selectcolor="#333333", activebackground="#2E2E2E", font=("Arial", 10)).pack(side="left", padx=10)
+        self.speculate_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(voice_frame, text="Tổng hợp trước khi gõ xong", variable=self.speculate_var, bg="#2E2E2E", fg="white",
+                       selectcolor="#333333", activebackground="#2E2E2E", font=("Arial", 10)).pack(side="left")
+        self.speculate_var.trace_add("write", lambda *args: self.speculate_var.get() or self.speculator.reset())
         self.text_area = tk.Text(main_tab, height=5, bg="#333333", fg="white", insertbackground="white", font=("Arial", 12))
         self.text_area.pack(expand=True, fill='both', padx=20, pady=10)
         self.text_area.config(state=tk.DISABLED)
+        self.text_area.bind("<<Modified>>", self.on_text_modified)
         button_frame = tk.Frame(main_tab, bg="#2E2E2E")
         button_frame.pack(pady=10)
         self.generate_button = tk.Button(button_frame, text="Tạo giọng nói", command=self.start_generate_voice,
@@ -255,6 +277,10 @@ class SmartHomeApp(tk.Tk):
         self.service_button = tk.Button(button_frame, text="Bắt đầu dịch vụ", command=self.toggle_service,
                                        bg="#008000", fg="white", font=("Arial", 10))
         self.service_button.pack(side="left")
+        tk.Button(button_frame, text="Dừng phát", command=self.stop_playback,
+                  bg="#757575", fg="white", font=("Arial", 10)).pack(side="left", padx=10)
+        tk.Button(button_frame, text="Bỏ qua", command=self.playback.skip,
+                  bg="#757575", fg="white", font=("Arial", 10)).pack(side="left")
         self.status_label = tk.Label(main_tab, text="Trạng thái: Đang kiểm tra", bg="#2E2E2E", fg="yellow", font=("Arial", 12, "bold"))
         self.status_label.pack(pady=15)
 
@@ -302,28 +328,114 @@ class SmartHomeApp(tk.Tk):
                 else:
                     self.status_label.config(text="Trạng thái: Dùng thử đã hết hạn", fg="red")
                     self.service_button.config(state=tk.DISABLED)
+            elif self.license_revoked:
+                self.status_label.config(text="Trạng thái: License đã bị thu hồi", fg="red")
+                self.service_button.config(state=tk.DISABLED)
             else:
                 self.status_label.config(text="Trạng thái: License đã hết hạn", fg="red")
                 self.service_button.config(state=tk.DISABLED)
             self.text_area.config(state=tk.DISABLED)
             self.generate_button.config(state=tk.DISABLED)
             if self.current_start_time is not None:
-                self.toggle_service()
+                self.stop_service()
+
+    def schedule_expiry(self):
+        """Arms a single timer for the instant the current license expires.
+
+        The deadline is converted to the monotonic clock once, so changing the
+        system clock neither fires the timer early nor lets the license run
+        over. Permanent licenses get no timer.
+        """
+        if self.expiry_timer is not None:
+            self.after_cancel(self.expiry_timer)
+            self.expiry_timer = None
+        self.expiry_deadline = None
+        self.expiry_license = None
+        if not self.license_data:
+            return
+        try:
+            expiry = parse_expiry(self.license_data)
+        except Exception as e:
+            logger.error(f"Error checking license: {e}")
+            return
+        if expiry is None:
+            logger.info("Permanent license, no expiry timer")
+            return
+        remaining = expiry - time.time()
+        self.expiry_deadline = time.monotonic() + max(0.0, remaining)
+        self.expiry_license = self.license_data
+        logger.info(f"License expires in {remaining:.0f} seconds")
+        self.arm_expiry_timer()
+
+    def arm_expiry_timer(self):
+        """Waits for the expiry deadline, one timer slice at a time."""
+        remaining_ms = (self.expiry_deadline - time.monotonic()) * 1000
+        if remaining_ms <= 0:
+            self.expiry_timer = None
+            self.on_license_expired()
+            return
+        # Round up so the timer never fires before the deadline
+        self.expiry_timer = self.after(min(int(remaining_ms) + 1, MAX_EXPIRY_TIMER_MS), self.arm_expiry_timer)
+
+    def on_license_expired(self):
+        """Stops the service and refreshes both tabs when the license runs out."""
+        logger.info("License expired")
+        self.update_status()
+        self.update_license_tab()
+
+    def schedule_status_poll(self, delay_seconds=LICENSE_POLL_SECONDS):
+        """Arms the next license status check after a jittered delay."""
+        if self.status_poll_timer is not None:
+            self.after_cancel(self.status_poll_timer)
+        delay = delay_seconds * random.uniform(1 - LICENSE_POLL_JITTER, 1 + LICENSE_POLL_JITTER)
+        self.status_poll_timer = self.after(int(delay * 1000), self.poll_license_status)
+
+    def poll_license_status(self):
+        """Asks the server whether the license was revoked; the reply is handled on the Tk thread."""
+        self.status_poll_timer = None
+        if not self.license_data or self.license_data.get("package") == "TRIAL":
+            # Trial licenses are local only
+            self.schedule_status_poll()
+            return
+        machine_id = self.license_data.get("machine_id", generate_machine_id())
+        future = server_api.get_conditional_async(f"/status/{machine_id}", self.license_status_etag)
+        future.add_done_callback(lambda f: self.call_in_ui(self.finish_status_poll, f))
+
+    def finish_status_poll(self, future):
+        """Applies a status reply: locks the app on revocation, unlocks it if the license is active again."""
+        self.schedule_status_poll()
+        try:
+            result, self.license_status_etag = future.result()
+        except Exception as e:
+            # Offline or unknown to the server (e.g. issued by the admin tool): keep the local verdict
+            logger.info(f"License status check skipped: {e}")
+            return
+        if result is None:
+            logger.info("License status unchanged")
+            return
+        revoked = result.get("status") == "revoked"
+        logger.info(f"License status: {result.get('status')}")
+        save_license_status(generate_machine_id(), result.get("status"), self.license_status_etag)
+        if revoked != self.license_revoked:
+            self.license_revoked = revoked
+            self.update_status()
+            self.update_license_tab()
+            if revoked:
+                messagebox.showwarning("License", "License của máy này đã bị thu hồi. Vui lòng liên hệ Admin.")
 
     def update_license_tab(self):
         """Updates License tab labels."""
         self.license_data = self.load_license()
         if self.license_data:
-            status_text = "Đã đăng ký" if self.is_license_active() else "Hết hạn"
+            status_text = "Đã đăng ký" if self.is_license_active() else ("Đã thu hồi" if self.license_revoked else "Hết hạn")
             status_color = "green" if self.is_license_active() else "red"
             if self.license_data.get("package") == "TRIAL":
-                try:
-                    expiry_date = datetime.datetime.strptime(self.license_data["expiration_date"], "%d/%m/%Y %H:%M:%S")
-                    status_text = "Dùng thử" if datetime.datetime.now() < expiry_date else "Hết hạn dùng thử"
-                    status_color = "yellow" if datetime.datetime.now() < expiry_date else "red"
-                except ValueError:
+                if self.license_data is self.license_state.data and not self.license_state.valid:
                     status_text = "Hết hạn (Lỗi ngày)"
                     status_color = "red"
+                else:
+                    status_text = "Dùng thử" if self.is_license_active() else "Hết hạn dùng thử"
+                    status_color = "yellow" if self.is_license_active() else "red"
             self.license_status_label.config(text=f"Trạng thái: {status_text}", fg=status_color)
             self.user_label.config(text=f"Người dùng: {self.license_data.get('username', 'N/A')}")
             self.voice_id_label.config(text=f"ID giọng: {self.license_data.get('voice_id', 'N/A')}")
@@ -339,7 +451,7 @@ class SmartHomeApp(tk.Tk):
             self.machine_id_label.config(text=f"Mã máy: {generate_machine_id()}")
 
     def renew_license(self, package):
-        """Renews license via server."""
+        """Starts a license renewal on the server worker; the window stays responsive."""
         if package not in PACKAGES:
             messagebox.showerror("Lỗi", "Gói không hợp lệ.")
             return
@@ -351,30 +463,49 @@ class SmartHomeApp(tk.Tk):
         machine_id = self.license_data.get("machine_id", generate_machine_id())  # Đảm bảo luôn gán giá trị
         logger.info(f"Renewing license for machine ID: {machine_id}, package: {package}")
 
+        self.renew_button.config(state=tk.DISABLED, text="Đang gia hạn...")
+        future = server_api.post_async("/activate", {"machine_id": machine_id, "package": package, "token_format": "v2"})
+        # The reply is handled on the Tk thread
+        future.add_done_callback(lambda f: self.call_in_ui(self.finish_renew_license, package, machine_id, f))
+
+    def finish_renew_license(self, package, machine_id, future):
+        """Applies the server's renewal reply."""
+        self.renew_button.config(state=tk.NORMAL, text="Đăng ký/Gia hạn")
+        import requests
         try:
-            response = session.post(
-                f"{SERVER_URL}/activate",
-                json={"machine_id": machine_id, "package": package},
-                timeout=REQUEST_TIMEOUT
-            )
-            response.raise_for_status()
-            result = response.json()
+            result = future.result()
             if "license" not in result:
                 messagebox.showerror("Lỗi Gia hạn", "Phản hồi server không hợp lệ.")
                 return
-            encrypted_license = base64.b64decode(result["license"])
-            decrypted_license_data = cipher.decrypt(encrypted_license).decode('utf-8')
-            new_license_data = json.loads(decrypted_license_data)
+            new_license_data = get_codec().decode(result["license"])
             if new_license_data.get("machine_id") != machine_id:
                 messagebox.showerror("Lỗi", "Mã máy không khớp.")
                 return
             self.license_data = new_license_data
-            self.save_license(self.license_data)
+            self.trial_data = None
+            # The server refuses revoked machines, so a new license means the revocation was lifted
+            self.license_revoked = False
+            self.license_status_etag = None
+            save_license_status(machine_id, "active")
+            self.save_license(result["license"], self.license_data)
             self.selected_package = self.license_data.get("package", "1M")
             self.package_var.set(self.selected_package)
+            # Re-arm first so the old deadline doesn't mark the new license as expired
+            self.schedule_expiry()
             self.update_status()
             self.update_license_tab()
             messagebox.showinfo("Thông báo", f"Đã gia hạn gói {package.replace('M', ' tháng')} thành công!")
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 403:
+                logger.warning("Renewal refused: license revoked")
+                self.license_revoked = True
+                save_license_status(machine_id, "revoked", self.license_status_etag)
+                self.update_status()
+                self.update_license_tab()
+                messagebox.showwarning("License", "License của máy này đã bị thu hồi. Vui lòng liên hệ Admin.")
+            else:
+                logger.error(f"Server error during license renewal: {e}")
+                messagebox.showerror("Lỗi Gia hạn", f"Server từ chối yêu cầu: {e}")
         except requests.exceptions.RequestException as e:
             logger.error(f"Network error during license renewal: {e}")
             messagebox.showerror("Lỗi Kết nối", f"Không thể kết nối đến server: {e}")
@@ -384,45 +515,97 @@ class SmartHomeApp(tk.Tk):
 
     @require_active_license
     def start_generate_voice(self):
-        """Starts voice generation in a thread."""
-        if self.is_generating:
-            return
+        """Queues the text for synthesis; audio plays behind anything already queued."""
         text = self.text_area.get("1.0", tk.END).strip()
         if not text:
             messagebox.showwarning("Cảnh báo", "Vui lòng nhập văn bản.")
             return
-        self.is_generating = True
-        self.generate_button.config(state=tk.DISABLED, text="Đang tạo...")
-        threading.Thread(target=self.generate_voice, args=(text,), daemon=True).start()
-
-    def generate_voice(self, text):
-        """Generates and plays voice."""
-        lang = self.language_var.get()
-        audio_file = f"output_{int(time.time())}.mp3"
+        priority = PRIORITY_ALERT if self.alert_var.get() else PRIORITY_NORMAL
+        job = self.job_scheduler.submit(text, self.language_var.get(), priority, self.voice_effects())
+        if job is None:
+            messagebox.showwarning("Cảnh báo", "Hàng đợi đang đầy, vui lòng thử lại sau.")
+            return
+        logger.info(f"Queued {job}, queue depth {self.job_scheduler.stats()['depth']}")
+        self.speculator.claim(split_sentences(text), job.lang)
+        self.update_queue_status()
+
+    def on_text_modified(self, event):
+        """Restarts the speculation debounce timer on every edit."""
+        self.text_area.edit_modified(False)
+        if not self.speculate_var.get():
+            return
+        if self.speculation_timer is not None:
+            self.after_cancel(self.speculation_timer)
+        self.speculation_timer = self.after(SPECULATION_DEBOUNCE_MS, self.speculate)
+
+    def speculate(self):
+        """Pre-synthesizes the finished sentences of the text being typed."""
+        self.speculation_timer = None
+        if self.current_start_time is None or not self.speculate_var.get():
+            return
+        text = self.text_area.get("1.0", "end-1c")
+        self.speculator.update(completed_chunks(text), self.language_var.get())
+
+    def voice_effects(self):
+        """Returns the post-processing options selected in the window."""
+        effects = {}
+        speed = float(self.speed_var.get())
+        if speed != 1.0:
+            effects["speed"] = speed
+        if self.normalize_var.get():
+            effects["normalize"] = True
+        return effects
+
+    def run_job(self, job):
+        """Synthesizes and plays a queued job, reporting problems in the window."""
         try:
             mixer_manager.init()
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(audio_file)
-            if mixer_manager.initialized:
-                pygame.mixer.music.load(audio_file)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    self.update_idletasks()
-                    time.sleep(0.1)
-            else:
-                messagebox.showwarning("Cảnh báo", "Không thể phát âm thanh.")
+            if not mixer_manager.initialized:
+                self.call_in_ui(messagebox.showwarning, "Cảnh báo", "Không thể phát âm thanh.")
+                return
+            speak_job(job, self.job_scheduler, self.playback)
         except Exception as e:
             logger.error(f"Error generating voice: {e}")
-            messagebox.showerror("Lỗi", f"Không thể tạo giọng nói: {e}")
+            self.call_in_ui(messagebox.showerror, "Lỗi", f"Không thể tạo giọng nói: {e}")
+            raise
         finally:
-            self.is_generating = False
-            self.generate_button.config(state=tk.NORMAL, text="Tạo giọng nói")
-            if os.path.exists(audio_file):
-                try:
-                    pygame.mixer.music.unload()
-                    os.remove(audio_file)
-                except Exception as e:
-                    logger.error(f"Error cleaning up audio file: {e}")
+            self.call_in_ui(self.update_queue_status)
+
+    def update_queue_status(self):
+        """Shows how many texts are waiting on the generate button."""
+        stats = self.job_scheduler.stats()
+        waiting = stats["depth"] + stats["running"]
+        self.generate_button.config(text=f"Tạo giọng nói ({waiting} đang chờ)" if waiting else "Tạo giọng nói")
+
+    def on_playback_event(self, name, tag):
+        """Handles playback engine events on the Tk thread."""
+        if name == "track_start":
+            self.track_started[tag] = time.monotonic()
+            if tag in self.interrupted_tracks:
+                # Replay after an alert; its first start was already measured
+                self.interrupted_tracks.discard(tag)
+            elif tag[1] == 0:
+                job = tag[0]
+                first_audio_ms = (time.monotonic() - job.submitted_at) * 1000
+                queue_wait_ms = (job.started_at - job.submitted_at) * 1000
+                telemetry.observe("time_to_first_audio_ms", first_audio_ms)
+                telemetry.observe("queue_wait_ms", queue_wait_ms)
+                logger.info(f"Time to first audio: {first_audio_ms:.1f} ms (queued {queue_wait_ms:.1f} ms, {job})")
+        elif name == "interrupted":
+            self.track_started.pop(tag, None)
+            self.interrupted_tracks.add(tag)
+        elif name in ("track_end", "stopped") and tag in self.track_started:
+            telemetry.observe("playback_ms", (time.monotonic() - self.track_started.pop(tag)) * 1000)
+        elif name == "idle":
+            self.interrupted_tracks.clear()
+            logger.info("Playback finished")
+
+    def stop_playback(self):
+        """Stops playback and cancels every queued and running job."""
+        cancelled = self.job_scheduler.cancel_all()
+        self.playback.stop()
+        logger.info(f"Playback stopped, {cancelled} jobs cancelled")
+        self.update_queue_status()
 
     @require_active_license
     def toggle_service(self):
@@ -434,14 +617,20 @@ class SmartHomeApp(tk.Tk):
             self.generate_button.config(state=tk.NORMAL)
             logger.info("Service started")
         else:
-            end_time = time.time()
-            session_seconds = end_time - self.current_start_time
-            self.total_seconds += session_seconds
-            self.current_start_time = None
-            self.service_button.config(text="Bắt đầu dịch vụ", bg="#008000")
-            self.text_area.config(state=tk.DISABLED)
-            self.generate_button.config(state=tk.DISABLED)
-            logger.info(f"Service stopped, session duration: {session_seconds:.2f} seconds")
+            self.stop_service()
+
+    def stop_service(self):
+        """Stops the service and adds the session to the usage total (no license check)."""
+        if self.current_start_time is None:
+            return
+        end_time = time.time()
+        session_seconds = end_time - self.current_start_time
+        self.total_seconds += session_seconds
+        self.current_start_time = None
+        self.service_button.config(text="Bắt đầu dịch vụ", bg="#008000")
+        self.text_area.config(state=tk.DISABLED)
+        self.generate_button.config(state=tk.DISABLED)
+        logger.info(f"Service stopped, session duration: {session_seconds:.2f} seconds")
 
     def on_closing(self):
         """Handles application shutdown."""
@@ -458,12 +647,27 @@ class SmartHomeApp(tk.Tk):
             price = PACKAGES.get(package, {}).get('price', 'N/A')
             message += f"\nGói: {package_display} ({price}$)"
         logger.info(message)
+        cache_stats = audio_cache_stats()
+        if cache_stats is not None:
+            logger.info(f"TTS cache stats: {cache_stats}")
+        logger.info(f"TTS backend stats: {tts_backend.stats()}")
+        logger.info(f"TTS job queue stats: {self.job_scheduler.stats()}")
+        logger.info(f"Speculative synthesis stats: {self.speculator.stats()}")
+        logger.info(f"Server API stats: {server_api.stats()}")
         try:
             messagebox.showinfo("Tóm tắt sử dụng", message)
             with open("usage_log.txt", "a", encoding="utf-8") as f:
                 f.write(f"{datetime.datetime.now()}: {message}\n")
         except Exception as e:
             logger.error(f"Error logging usage: {e}")
+        if self.status_poll_timer is not None:
+            self.after_cancel(self.status_poll_timer)
+        self.job_scheduler.close()
+        self.speculator.close()
+        self.playback.close()
+        close_phrase_renderer()
+        server_api.close()
+        telemetry.close()
         mixer_manager.cleanup()
         self.destroy()
 
@@ -472,9 +676,6 @@ class SmartHomeApp(tk.Tk):
         self.on_closing()
 
 if __name__ == "__main__":
-    if KEY == b'PUT_YOUR_SERVER_KEY_HERE':
-        logger.error("Fernet KEY not set. Run server.py, copy the KEY from console or .env, and update client.py.")
-        sys.exit(1)
     app = SmartHomeApp()
     try:
         app.mainloop()
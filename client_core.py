@@ -0,0 +1,406 @@
+# client_core.py
+# License, synthesis and playback helpers shared by client.py and the headless
+# tools (tts_service.py, batch_render.py). Nothing here imports tkinter or
+# configures logging.
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from functools import lru_cache
+from tts_cache import AudioCache, default_cache_dir, default_state_dir, make_cache_key
+from speech_pipeline import SingleFlight, split_sentences, synthesize_chunks
+from tts_backends import get_backend
+from playback import PlaybackEngine
+from telemetry import TELEMETRY_FILE, Telemetry
+from job_queue import JobScheduler
+from license_codec import LicenseCodec, make_license_data, parse_date
+
+logger = logging.getLogger(__name__)
+
+# --- License Key Configuration ---
+# Public half of the server's LICENSE_SIGNING_KEY (printed in the server log on startup).
+# The client can only verify licenses; override with the LICENSE_PUBLIC_KEY environment variable.
+LICENSE_PUBLIC_KEY = os.getenv("LICENSE_PUBLIC_KEY", "FbCd7clpKbRmcKwoqYOIhj3hsYWDprvfhqbR1cbVMuM=")
+
+@lru_cache(maxsize=None)
+def get_codec():
+    """Returns the verify-only license codec; cryptography loads on the first license check, not at startup."""
+    return LicenseCodec(public_key=LICENSE_PUBLIC_KEY)
+
+# --- Pygame Mixer Management ---
+# pygame is imported by the playback thread after startup; the mixer then
+# stays open until the app exits so utterances never pay for re-initialization
+class MixerManager:
+    def __init__(self):
+        self.initialized = False
+        self.voice_channel = None
+        self._lock = threading.Lock()
+
+    def init(self):
+        with self._lock:
+            if self.initialized:
+                return
+            try:
+                # Suppress Pygame welcome message
+                with open(os.devnull, 'w') as f:
+                    sys.stdout = f
+                    try:
+                        import pygame
+                        pygame.mixer.init()
+                    finally:
+                        sys.stdout = sys.__stdout__
+                # Keep one channel for voice so other sounds never steal it
+                pygame.mixer.set_reserved(1)
+                self.voice_channel = pygame.mixer.Channel(0)
+                self.initialized = True
+                logger.info("Pygame mixer initialized")
+            except Exception as e:
+                logger.warning(f"Failed to initialize pygame mixer: {e}")
+
+    def load_sound(self, audio_data):
+        """Decodes encoded audio bytes into a Sound without touching the filesystem."""
+        import pygame
+        return pygame.mixer.Sound(file=io.BytesIO(audio_data))
+
+    def cleanup(self):
+        with self._lock:
+            if not self.initialized:
+                return
+            try:
+                import pygame
+                pygame.mixer.quit()
+                self.initialized = False
+                logger.info("Pygame mixer cleaned up")
+            except Exception as e:
+                logger.error(f"Error cleaning up pygame mixer: {e}")
+
+mixer_manager = MixerManager()
+
+# --- License File ---
+LICENSE_FILE = "license.json"
+REQUIRED_LICENSE_FIELDS = ['username', 'voice_id', 'registration_date', 'status', 'expiration_date', 'package', 'machine_id']
+
+# --- License Status ---
+# Last answer of the server's status endpoint, kept across restarts so a revoked
+# license stays locked before the first poll of a new session
+LICENSE_STATUS_FILE = os.path.join(default_state_dir(), "license_status.json")
+
+def load_license_status(machine_id, path=LICENSE_STATUS_FILE):
+    """Returns the saved {"status", "etag"} for machine_id, or {} if none was saved."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return saved if isinstance(saved, dict) and saved.get("machine_id") == machine_id else {}
+
+def save_license_status(machine_id, status, etag=None, path=LICENSE_STATUS_FILE):
+    """Atomically records the server's latest status answer for machine_id."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"machine_id": machine_id, "status": status, "etag": etag, "checked_at": int(time.time())}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not save license status: {e}")
+
+# --- TTS Backend ---
+# "gtts" (default), "offline" or "mock"; override with the TTS_BACKEND environment variable
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+tts_backend = get_backend(TTS_BACKEND)
+
+# --- TTS Job Queue ---
+# Texts waiting for synthesis; alerts jump ahead of normal announcements
+TTS_JOB_WORKERS = int(os.getenv("TTS_JOB_WORKERS", "2"))
+TTS_JOB_QUEUE_SIZE = 50
+
+# --- Phrase Templates ---
+# Recurring announcements are spliced from fragments (see phrase_templates.py). Fragments
+# are rendered lazily, per template, the first time a licensed request matches it.
+_phrase_renderer = None
+_phrase_renderer_unavailable = False
+_phrase_renderer_lock = threading.Lock()
+
+def get_phrase_renderer():
+    """Returns the phrase renderer once the mixer is up, or None if it can't be used."""
+    global _phrase_renderer, _phrase_renderer_unavailable
+    with _phrase_renderer_lock:
+        if _phrase_renderer is None and not _phrase_renderer_unavailable and mixer_manager.initialized:
+            import pygame
+            frequency, size, channels = pygame.mixer.get_init()
+            try:
+                if size != -16:
+                    raise RuntimeError(f"Phrase templates need 16-bit audio, mixer uses {size}")
+                from phrase_templates import PhraseRenderer
+            except (ImportError, RuntimeError) as e:
+                logger.warning(f"Phrase templates disabled: {e}")
+                _phrase_renderer_unavailable = True
+                return None
+            _phrase_renderer = PhraseRenderer(synthesize_chunk, lambda data: mixer_manager.load_sound(data).get_raw(), frequency, channels)
+        return _phrase_renderer
+
+def close_phrase_renderer():
+    """Cancels fragment rendering that hasn't started yet."""
+    with _phrase_renderer_lock:
+        if _phrase_renderer is not None:
+            _phrase_renderer.close()
+
+# --- Audio Post-Processing ---
+# Speed, loudness and format changes are applied locally to synthesized audio
+# (see audio_effects.py), so slow speech never costs a second gTTS request
+SLOW_SPEED = 0.75
+_audio_processor = None
+
+def decode_with_mixer(audio_data):
+    """Decodes compressed audio to 16-bit PCM through pygame; returns (raw, sample rate, channels)."""
+    mixer_manager.init()
+    if not mixer_manager.initialized:
+        raise RuntimeError("Audio mixer unavailable, cannot decode compressed audio")
+    import pygame
+    frequency, size, channels = pygame.mixer.get_init()
+    if size != -16:
+        raise RuntimeError(f"Post-processing needs 16-bit audio, mixer uses {size}")
+    return mixer_manager.load_sound(audio_data).get_raw(), frequency, channels
+
+def get_audio_processor():
+    """Returns the audio post-processor, importing NumPy on first use."""
+    global _audio_processor
+    if _audio_processor is None:
+        from audio_effects import AudioProcessor
+        _audio_processor = AudioProcessor(decode_with_mixer)
+    return _audio_processor
+
+# --- Telemetry ---
+# Per-stage counters and latency histograms; summarize with: python telemetry.py
+telemetry = Telemetry(TELEMETRY_FILE)
+
+# --- TTS Audio Cache ---
+# Lives in the per-user cache dir so the app can run from a read-only install directory
+TTS_CACHE_DIR = default_cache_dir()
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+def get_audio_cache():
+    """Returns the audio cache, scanning its directory on first use."""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            # One cache directory per backend so offline audio never replays as gTTS output
+            _audio_cache = AudioCache(os.path.join(TTS_CACHE_DIR, tts_backend.name), TTS_CACHE_MAX_BYTES, extension=tts_backend.extension)
+        return _audio_cache
+
+def audio_cache_stats():
+    """Returns cache figures, or None if nothing has used the cache yet."""
+    with _audio_cache_lock:
+        return _audio_cache.stats() if _audio_cache is not None else None
+
+# --- Speech Synthesis ---
+# Concurrent requests for the same uncached chunk share one backend call
+_inflight = SingleFlight()
+
+def synthesize_chunk(text, lang, slow=False, effects=None, for_playback=False):
+    """Returns audio bytes for one chunk, post-processed with effects (see AudioProcessor.process).
+
+    Phrase templates are spliced as WAV in the mixer's format, not the
+    backend's, so they are only used when for_playback says the audio goes
+    to the local mixer; everyone else gets the backend's format throughout.
+    """
+    if slow:
+        effects = {"speed": SLOW_SPEED, **(effects or {})}
+    audio_data = _base_chunk(text, lang, templates=for_playback)
+    if effects:
+        with telemetry.timer("post_process_ms"):
+            audio_data = get_audio_processor().process(audio_data, **effects)
+    return audio_data
+
+def _base_chunk(text, lang, templates=False):
+    """Returns unprocessed audio for one chunk, from phrase templates (if allowed), the cache or the backend."""
+    started = time.perf_counter()
+    renderer = get_phrase_renderer() if templates else None
+    if renderer is not None:
+        audio_data = renderer.render(text, lang)
+        if audio_data is not None:
+            telemetry.incr("template_hits")
+            telemetry.observe("chunk_ready_ms", (time.perf_counter() - started) * 1000)
+            logger.info(f"Chunk ready in {(time.perf_counter() - started) * 1000:.1f} ms (phrase template, {len(text)} chars)")
+            return audio_data
+    cache_key = make_cache_key(text, lang)
+    audio_cache = get_audio_cache()
+    audio_data = audio_cache.get(cache_key)
+    cache_hit = audio_data is not None
+    if cache_hit:
+        telemetry.incr("cache_hits")
+    else:
+        audio_data = _inflight.do(cache_key, lambda: _synthesize_and_store(cache_key, text, lang))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    telemetry.observe("chunk_ready_ms", elapsed_ms)
+    logger.info(f"Chunk ready in {elapsed_ms:.1f} ms ({'cache hit' if cache_hit else 'synthesized'}, {len(text)} chars)")
+    return audio_data
+
+def _synthesize_and_store(cache_key, text, lang):
+    with telemetry.timer("synthesis_ms"):
+        audio_data = tts_backend.synthesize(text, lang)
+    get_audio_cache().put(cache_key, audio_data)
+    telemetry.incr("cache_misses")
+    telemetry.incr("chars_synthesized", len(text))
+    if tts_backend.remote:
+        telemetry.incr("bytes_downloaded", len(audio_data))
+    return audio_data
+
+def speak_job(job, scheduler, playback):
+    """Synthesizes a job chunk by chunk and hands each chunk to the player as soon as it is ready."""
+    chunks = split_sentences(job.text)
+    audio_chunks = synthesize_chunks(chunks, lambda chunk: synthesize_chunk(chunk, job.lang, effects=job.effects, for_playback=True))
+    try:
+        for index, audio_data in enumerate(audio_chunks):
+            if index == 0:
+                # Jobs of the same lane started earlier finish queueing first so utterances never interleave
+                scheduler.wait_turn(job)
+            if job.cancelled:
+                logger.info(f"{job} cancelled, dropping remaining chunks")
+                break
+            playback.enqueue(audio_data, tag=(job, index), urgent=job.urgent)
+    finally:
+        audio_chunks.close()
+    logger.info(f"TTS cache: {get_audio_cache().stats()}")
+
+# --- Utility Functions ---
+@lru_cache(maxsize=None)
+def generate_machine_id():
+    """Generates a stable machine ID (computed once per process)."""
+    try:
+        components = [
+            platform.node(),
+            platform.system(),
+            platform.processor(),
+            str(uuid.getnode())
+        ]
+        unique_string = ':'.join(filter(None, components))
+        return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
+    except Exception as e:
+        logger.error(f"Error generating machine ID: {e}")
+        return hashlib.sha256(platform.node().encode('utf-8')).hexdigest()
+
+def read_license(path=LICENSE_FILE):
+    """Reads, verifies and validates a license file; raises on invalid tokens."""
+    if not os.path.exists(path):
+        logger.info("License file not found")
+        return None
+    with open(path, "rb") as f:
+        token = f.read()
+    if not token:
+        logger.warning("License file is empty")
+        return None
+    # Accepts compact tokens and license files written by older versions
+    license_data = get_codec().decode(token)
+    if not all(field in license_data for field in REQUIRED_LICENSE_FIELDS):
+        logger.error("Invalid license data structure")
+        return None
+    if license_data['machine_id'] != generate_machine_id():
+        logger.warning("Machine ID mismatch in license")
+        return None
+    return license_data
+
+def parse_expiry(license_data):
+    """Returns the expiry epoch of license data, or None for permanent licenses.
+
+    Compact tokens already carry the epoch; legacy data falls back to parsing
+    the date string. Raises ValueError for missing or malformed dates.
+    """
+    license_data = license_data or {}
+    if "expires_at" in license_data:
+        return license_data["expires_at"]
+    expiry_date_str = license_data.get("expiration_date")
+    if not expiry_date_str:
+        raise ValueError("License has no expiration date")
+    if expiry_date_str == "Vĩnh viễn":
+        return None
+    return parse_date(expiry_date_str)
+
+def trial_license(seconds):
+    """Returns unsigned license data for a local trial; it lives in memory only and is never saved."""
+    started = int(time.time())
+    return make_license_data(generate_machine_id(), "TRIAL", started, started + seconds, username="trial_user")
+
+def license_is_active(license_data):
+    """Checks whether license data is present and not expired."""
+    if not license_data or not license_data.get("expiration_date"):
+        return False
+    try:
+        expiry = parse_expiry(license_data)
+        return expiry is None or time.time() < expiry
+    except Exception as e:
+        logger.error(f"Error checking license: {e}")
+        return False
+
+class LicenseState:
+    """In-memory license that is re-read only when the license file changes.
+
+    The file is decrypted and parsed once; later loads cost a single stat()
+    call while its mtime and size stay the same, and activity checks only
+    compare against the pre-parsed expiry timestamp.
+    """
+
+    def __init__(self, path=LICENSE_FILE):
+        self.path = path
+        self.data = None
+        self.expiry = None
+        self.valid = False
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _set(self, license_data, signature):
+        self.data = license_data
+        self._signature = signature
+        self.expiry = None
+        self.valid = False
+        if license_data:
+            try:
+                self.expiry = parse_expiry(license_data)
+                self.valid = True
+            except Exception as e:
+                logger.error(f"Error checking license: {e}")
+
+    def load(self):
+        """Returns the current license data, re-reading the file only if it changed."""
+        signature = self._file_signature()
+        with self._lock:
+            if self._signature is not None and signature == self._signature:
+                return self.data
+            try:
+                license_data = read_license(self.path) if signature else None
+            except Exception:
+                # Remember the broken file so it isn't decrypted again until it changes
+                self._set(None, signature)
+                raise
+            if signature is None:
+                logger.info("License file not found")
+            self._set(license_data, signature)
+            return self.data
+
+    def update(self, license_data):
+        """Records license data that was just written to the license file."""
+        with self._lock:
+            self._set(license_data, self._file_signature())
+
+    def is_active(self):
+        """Checks the cached license without touching the file."""
+        if not self.valid:
+            return False
+        return self.expiry is None or time.time() < self.expiry
@@ -0,0 +1,241 @@
+# job_queue.py
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Job Priorities ---
+# Lower values run first
+PRIORITY_ALERT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# --- Scheduler Configuration ---
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 50
+WAIT_SAMPLES = 500  # Recent wait times kept for the percentile metrics
+
+def job_key(text, lang, effects=None):
+    """Identifies jobs that would produce the same audio."""
+    return (text, lang, tuple(sorted((effects or {}).items())))
+
+class Job:
+    """One piece of text waiting to be synthesized and played."""
+
+    def __init__(self, job_id, text, lang, priority, effects=None):
+        self.id = job_id
+        self.text = text
+        self.lang = lang
+        self.effects = effects or {}  # Post-processing options, see audio_effects.AudioProcessor.process
+        self.priority = priority
+        self.state = "pending"  # pending, running, done, failed, cancelled, dropped
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.ordinal = None
+        self.urgent = False  # Set when the job starts: alerts play in their own lane
+        self.coalesced = 0
+
+    @property
+    def key(self):
+        return job_key(self.text, self.lang, self.effects)
+
+    @property
+    def cancelled(self):
+        return self.state in ("cancelled", "dropped")
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.state}, priority={self.priority}, {len(self.text)} chars)"
+
+class JobScheduler:
+    """Bounded priority queue of synthesis jobs served by a fixed pool of worker threads.
+
+    Identical pending texts are coalesced into one job. When the queue is
+    full, a new job evicts the newest pending job of a strictly lower
+    priority, so alerts are never lost to chatter; otherwise it is
+    rejected. Jobs are handed to handler(job) in priority order, and
+    wait_turn(job) lets a handler keep its output in start order while
+    several jobs synthesize at once. Alerts keep a separate start order,
+    so they only ever wait for earlier alerts, never for normal speech;
+    handlers should also play them ahead of normal audio (job.urgent).
+    """
+
+    def __init__(self, handler, max_workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._heap = []
+        self._pending = {}  # job.key -> job
+        self._running = set()
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+        # Start order per lane (True = alerts)
+        self._ordinals = {True: itertools.count(), False: itertools.count()}
+        self._next_turn = {True: 0, False: 0}
+        self._finished_ordinals = {True: set(), False: set()}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = []
+        self._counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "dropped": 0,
+                          "cancelled": 0, "done": 0, "failed": 0}
+        self._max_depth = 0
+        self._waits = []
+        self._total_wait = 0.0
+        self._started = 0
+
+    def start(self):
+        """Starts the worker threads."""
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._worker, name=f"tts-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, text, lang, priority=PRIORITY_NORMAL, effects=None):
+        """Queues text for synthesis; returns the job, or None if the queue is full."""
+        key = job_key(text, lang, effects)
+        with self._cond:
+            if self._closed:
+                return None
+            job = self._pending.get(key)
+            if job is not None:
+                # Same text already waiting: keep one job at the more urgent priority
+                job.coalesced += 1
+                self._counters["coalesced"] += 1
+                if priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._sequence), job))
+                return job
+            if len(self._pending) >= self.max_pending and not self._evict_for(priority):
+                self._counters["rejected"] += 1
+                logger.warning(f"Job queue full, rejected {len(text)} chars at priority {priority}")
+                return None
+            job = Job(next(self._ids), text, lang, priority, effects)
+            self._pending[key] = job
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+            self._counters["submitted"] += 1
+            self._max_depth = max(self._max_depth, len(self._pending))
+            self._cond.notify()
+        self.start()
+        return job
+
+    def _evict_for(self, priority):
+        victims = [job for job in self._pending.values() if job.priority > priority]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda job: (job.priority, job.submitted_at))
+        self._discard(victim, "dropped")
+        logger.warning(f"Job queue full, dropped {victim}")
+        return True
+
+    def _discard(self, job, state):
+        del self._pending[job.key]
+        job.state = state
+        job.finished_at = time.monotonic()
+        self._counters[state] += 1
+
+    def cancel(self, job):
+        """Cancels a pending or running job; returns False if it already finished."""
+        with self._cond:
+            if job.state == "pending":
+                self._discard(job, "cancelled")
+                return True
+            if job.state == "running":
+                # The handler sees job.cancelled and stops early
+                job.state = "cancelled"
+                self._counters["cancelled"] += 1
+                self._cond.notify_all()
+                return True
+            return False
+
+    def cancel_all(self):
+        """Cancels every pending and running job; returns how many were cancelled."""
+        with self._cond:
+            jobs = list(self._pending.values()) + list(self._running)
+        return sum(self.cancel(job) for job in jobs)
+
+    def wait_turn(self, job):
+        """Blocks until every job of its lane started before this one has finished or been cancelled."""
+        with self._cond:
+            while self._next_turn[job.urgent] != job.ordinal and not job.cancelled and not self._closed:
+                self._cond.wait()
+
+    def _next_job(self):
+        while self._heap:
+            priority, _, job = heapq.heappop(self._heap)
+            # Skip entries left behind by cancellation or a priority upgrade
+            if job.state == "pending" and job.priority == priority:
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._closed:
+                    self._cond.wait()
+                    job = self._next_job()
+                if self._closed:
+                    return
+                del self._pending[job.key]
+                job.state = "running"
+                job.started_at = time.monotonic()
+                job.urgent = job.priority == PRIORITY_ALERT
+                job.ordinal = next(self._ordinals[job.urgent])
+                self._running.add(job)
+                self._record_wait(job.started_at - job.submitted_at)
+            try:
+                self.handler(job)
+                state = "done"
+            except Exception as e:
+                logger.error(f"{job} failed: {e}")
+                state = "failed"
+            with self._cond:
+                self._running.discard(job)
+                job.finished_at = time.monotonic()
+                if job.state == "running":
+                    job.state = state
+                    self._counters[state] += 1
+                finished = self._finished_ordinals[job.urgent]
+                finished.add(job.ordinal)
+                while self._next_turn[job.urgent] in finished:
+                    finished.remove(self._next_turn[job.urgent])
+                    self._next_turn[job.urgent] += 1
+                self._cond.notify_all()
+
+    def _record_wait(self, wait):
+        self._started += 1
+        self._total_wait += wait
+        self._waits.append(wait)
+        if len(self._waits) > WAIT_SAMPLES:
+            del self._waits[0]
+
+    def stats(self):
+        """Returns queue depth, job counters and wait times in milliseconds."""
+        with self._cond:
+            waits = sorted(self._waits)
+            stats = dict(self._counters)
+            stats.update({
+                "depth": len(self._pending),
+                "max_depth": self._max_depth,
+                "running": len(self._running),
+                "avg_wait_ms": round(self._total_wait / self._started * 1000, 1) if self._started else None,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else None,
+                "max_wait_ms": round(waits[-1] * 1000, 1) if waits else None
+            })
+            return stats
+
+    def close(self, timeout=2):
+        """Cancels all jobs and stops the workers."""
+        self.cancel_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
@@ -0,0 +1,231 @@
+# license_codec.py
+import base64
+import binascii
+import datetime
+import hashlib
+import hmac
+import json
+import struct
+
+# --- Token Format ---
+TOKEN_PREFIX = "L2."
+TOKEN_VERSION = 2
+SIGNATURE_SIZE = 64
+# HMAC-tagged tokens from before signing; only read where the legacy key is present (server, admin)
+MAC_TOKEN_PREFIX = "L1."
+MAC_TOKEN_VERSION = 1
+MAC_SIZE = 16
+DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+PERMANENT_LABEL = "Vĩnh viễn"
+PACKAGE_CODES = {"1M": 1, "3M": 2, "6M": 3, "PERM": 4, "TRIAL": 5}
+PACKAGE_NAMES = {code: name for name, code in PACKAGE_CODES.items()}
+STATUS_LABELS = {"TRIAL": "Dùng thử"}
+DEFAULT_STATUS = "Đã đăng ký"
+LEGACY_FIELDS = ['username', 'voice_id', 'registration_date', 'status', 'expiration_date', 'package', 'machine_id']
+
+# version, package, flags, issued_at, expires_at (0 = permanent)
+HEADER = struct.Struct(">BBBII")
+FLAG_HEX_MACHINE_ID = 0x01
+
+class LicenseTokenError(ValueError):
+    """Raised when a license token is malformed or fails verification."""
+
+def format_epoch(epoch):
+    """Formats an epoch timestamp the way license dates are displayed."""
+    return datetime.datetime.fromtimestamp(epoch).strftime(DATE_FORMAT)
+
+def parse_date(value):
+    """Parses a displayed license date back into an epoch timestamp."""
+    return int(datetime.datetime.strptime(value, DATE_FORMAT).timestamp())
+
+def generate_signing_key():
+    """Returns a new Ed25519 private key as url-safe base64 (keep it on the server only)."""
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+    raw = Ed25519PrivateKey.generate().private_bytes(Encoding.Raw, PrivateFormat.Raw, NoEncryption())
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def public_key_for(signing_key):
+    """Returns the url-safe base64 public key that verifies tokens signed with signing_key."""
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    raw = _load_signing_key(signing_key).public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _raw_key(key, kind):
+    raw = base64.urlsafe_b64decode(key if isinstance(key, bytes) else key.encode())
+    if len(raw) != 32:
+        raise ValueError(f"{kind} must be 32 url-safe base64-encoded bytes.")
+    return raw
+
+def _load_signing_key(signing_key):
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    return Ed25519PrivateKey.from_private_bytes(_raw_key(signing_key, "Signing key"))
+
+def make_license_data(machine_id, package, issued_at, expires_at=None, username="hoanq", voice_id="Free"):
+    """Returns the license dict decode() produces, for licenses that never become a token (trials)."""
+    return {
+        "username": username,
+        "voice_id": voice_id,
+        "registration_date": format_epoch(issued_at),
+        "status": STATUS_LABELS.get(package, DEFAULT_STATUS),
+        "expiration_date": format_epoch(expires_at) if expires_at else PERMANENT_LABEL,
+        "package": package,
+        "machine_id": machine_id,
+        "issued_at": issued_at,
+        "expires_at": expires_at or None
+    }
+
+def _pack_text(value):
+    data = value.encode("utf-8")
+    if len(data) > 255:
+        raise LicenseTokenError("Field too long for license token")
+    return bytes([len(data)]) + data
+
+class LicenseCodec:
+    """Encodes and verifies compact license tokens shared by server, client and admin tool.
+
+    A token is TOKEN_PREFIX followed by unpadded base64url of: a fixed header
+    (version, package enum, flags, issued/expiry epochs as u32), the
+    length-prefixed machine_id, username and voice_id, and an Ed25519
+    signature. Tokens are signed, not encrypted; none of these fields are
+    secret. Only the server and admin tool hold signing_key; clients get
+    public_key and can verify but never mint licenses.
+
+    legacy_key is the old shared Fernet key. It is needed only to read and
+    write legacy (Fernet/JSON) licenses and HMAC-tagged "L1." tokens, and
+    must not ship with the client: anyone holding it can forge those formats.
+    """
+
+    def __init__(self, public_key=None, signing_key=None, legacy_key=None):
+        self._signing_key = _load_signing_key(signing_key) if signing_key else None
+        if public_key is None and signing_key:
+            public_key = public_key_for(signing_key)
+        if public_key is None:
+            raise ValueError("A public or signing key is required to verify licenses.")
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+        self._public_key = Ed25519PublicKey.from_public_bytes(_raw_key(public_key, "Public key"))
+        self._legacy_key = None
+        self._mac_key = None
+        if legacy_key:
+            self._legacy_key = legacy_key if isinstance(legacy_key, bytes) else legacy_key.encode()
+            self._mac_key = hmac.new(_raw_key(self._legacy_key, "Fernet key"), b"license-token-v1", hashlib.sha256).digest()
+        self._cipher = None
+
+    def _mac(self, payload):
+        return hmac.new(self._mac_key, payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, machine_id, package, issued_at, expires_at=None, username="hoanq", voice_id="Free"):
+        """Returns a signed token; expires_at=None means a permanent license."""
+        if self._signing_key is None:
+            raise LicenseTokenError("This codec can only verify licenses (no signing key)")
+        if package not in PACKAGE_CODES:
+            raise LicenseTokenError(f"Unknown package: {package}")
+        flags = 0
+        machine_bytes = machine_id.encode("utf-8")
+        # Only lowercase hex round-trips through bytes.hex(); anything else is stored as text
+        if len(machine_id) == 64 and machine_id == machine_id.lower():
+            try:
+                machine_bytes = bytes.fromhex(machine_id)
+                flags |= FLAG_HEX_MACHINE_ID
+            except ValueError:
+                pass
+        if len(machine_bytes) > 255:
+            raise LicenseTokenError("machine_id too long for license token")
+        payload = b"".join((
+            HEADER.pack(TOKEN_VERSION, PACKAGE_CODES[package], flags, int(issued_at), int(expires_at or 0)),
+            bytes([len(machine_bytes)]), machine_bytes,
+            _pack_text(username),
+            _pack_text(voice_id)
+        ))
+        token = base64.urlsafe_b64encode(payload + self._signing_key.sign(payload)).rstrip(b"=").decode("ascii")
+        return TOKEN_PREFIX + token
+
+    def encode_data(self, license_data):
+        """Encodes a decoded license dict, falling back to its date strings for legacy data."""
+        issued_at = license_data.get("issued_at") or parse_date(license_data["registration_date"])
+        expires_at = license_data.get("expires_at")
+        if expires_at is None and license_data["expiration_date"] != PERMANENT_LABEL:
+            expires_at = parse_date(license_data["expiration_date"])
+        return self.encode(license_data["machine_id"], license_data["package"], issued_at, expires_at,
+                           license_data.get("username", "hoanq"), license_data.get("voice_id", "Free"))
+
+    def decode(self, token):
+        """Verifies a token and returns license data.
+
+        The dict has the legacy fields plus integer "issued_at" and
+        "expires_at" (None when permanent) epochs. "L1." and Fernet tokens
+        are accepted only by codecs holding the legacy key.
+        """
+        if isinstance(token, bytes):
+            token = token.decode("ascii", errors="replace")
+        token = token.strip()
+        if token.startswith(TOKEN_PREFIX):
+            payload = self._verified_payload(token, TOKEN_PREFIX, SIGNATURE_SIZE, self._verify_signature)
+            expected_version = TOKEN_VERSION
+        elif self._legacy_key is None:
+            raise LicenseTokenError("Unsigned license format; activate again to get a signed license")
+        elif token.startswith(MAC_TOKEN_PREFIX):
+            payload = self._verified_payload(token, MAC_TOKEN_PREFIX, MAC_SIZE, lambda payload, tag: hmac.compare_digest(tag, self._mac(payload)))
+            expected_version = MAC_TOKEN_VERSION
+        else:
+            return self.decode_legacy(token)
+        version, package_code, flags, issued_at, expires_at = HEADER.unpack_from(payload)
+        if version != expected_version or package_code not in PACKAGE_NAMES:
+            raise LicenseTokenError(f"Unsupported license token version {version}")
+        fields = []
+        offset = HEADER.size
+        try:
+            for _ in range(3):
+                length = payload[offset]
+                fields.append(payload[offset + 1:offset + 1 + length])
+                offset += 1 + length
+        except IndexError:
+            raise LicenseTokenError("Truncated license token")
+        machine_bytes, username, voice_id = fields
+        machine_id = machine_bytes.hex() if flags & FLAG_HEX_MACHINE_ID else machine_bytes.decode("utf-8")
+        return make_license_data(machine_id, PACKAGE_NAMES[package_code], issued_at, expires_at,
+                                 username.decode("utf-8"), voice_id.decode("utf-8"))
+
+    def _verify_signature(self, payload, signature):
+        from cryptography.exceptions import InvalidSignature
+        try:
+            self._public_key.verify(signature, payload)
+            return True
+        except InvalidSignature:
+            return False
+
+    @staticmethod
+    def _verified_payload(token, prefix, tag_size, verify):
+        body = token[len(prefix):]
+        try:
+            raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        except (binascii.Error, ValueError):
+            raise LicenseTokenError("Malformed license token")
+        payload, tag = raw[:-tag_size], raw[-tag_size:]
+        if len(payload) < HEADER.size or not verify(payload, tag):
+            raise LicenseTokenError("License token failed verification")
+        return payload
+
+    def _legacy_cipher(self):
+        if self._legacy_key is None:
+            raise LicenseTokenError("Legacy licenses need the legacy Fernet key")
+        if self._cipher is None:
+            from cryptography.fernet import Fernet
+            self._cipher = Fernet(self._legacy_key)
+        return self._cipher
+
+    def decode_legacy(self, token):
+        """Decrypts a legacy Fernet token (raw, or base64-wrapped as sent by old servers)."""
+        try:
+            data = token.encode("ascii") if isinstance(token, str) else token
+            if not data.startswith(b"gAAAA"):
+                data = base64.b64decode(data)
+            return json.loads(self._legacy_cipher().decrypt(data).decode("utf-8"))
+        except Exception as e:
+            raise LicenseTokenError(f"Invalid legacy license: {e}")
+
+    def encode_legacy(self, license_data):
+        """Encrypts license data as a base64-wrapped Fernet token for old clients."""
+        legacy_data = {field: license_data[field] for field in LEGACY_FIELDS}
+        encrypted_data = self._legacy_cipher().encrypt(json.dumps(legacy_data).encode())
+        return base64.b64encode(encrypted_data).decode()
@@ -0,0 +1,200 @@
+# license_store.py
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Store Configuration ---
+DB_PATH = os.getenv("LICENSE_DB", "licenses.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issued_licenses (
+    id INTEGER PRIMARY KEY,
+    machine_id TEXT NOT NULL,
+    package TEXT NOT NULL,
+    license TEXT NOT NULL,
+    expiration_date TEXT,
+    issued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_issued_machine_package
+    ON issued_licenses (machine_id, package, issued_at);
+CREATE TABLE IF NOT EXISTS revocations (
+    machine_id TEXT PRIMARY KEY,
+    revoked_at REAL NOT NULL
+);
+"""
+
+class LicenseStore:
+    """SQLite record of every issued license, indexed by machine_id and package.
+
+    Connections are opened per thread and per process, so the store is safe
+    to use from threaded servers and from forked gunicorn workers.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_or_issue_many(self, requests, window_seconds, issue):
+        """Returns (license, reused) for each (machine_id, package) request.
+
+        A license issued for the same machine and package within
+        window_seconds is returned as-is; otherwise issue(machine_id, package)
+        must return (license, expiration_date) and the result is recorded.
+        Revoked machines get (None, False) and nothing is issued until the
+        revocation is lifted. Lookups are plain reads and tokens are minted
+        before the write transaction, which only re-checks and inserts; a
+        license a concurrent request recorded first wins, so retries never
+        store duplicates.
+        """
+        since = time.time() - window_seconds
+        conn = self._connection()
+        results = [self._existing(conn, machine_id, package, since) for machine_id, package in requests]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        minted = {index: issue(*requests[index]) for index in missing}
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for index in missing:
+                machine_id, package = requests[index]
+                existing = self._existing(conn, machine_id, package, since)
+                if existing is not None:
+                    results[index] = existing
+                    continue
+                token, expiration_date = minted[index]
+                conn.execute(
+                    "INSERT INTO issued_licenses (machine_id, package, license, expiration_date, issued_at) VALUES (?, ?, ?, ?, ?)",
+                    (machine_id, package, token, expiration_date, now)
+                )
+                results[index] = (token, False)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def _existing(self, conn, machine_id, package, since):
+        """Returns (license, True) for a reusable license, (None, False) if the machine is revoked, else None."""
+        if conn.execute("SELECT 1 FROM revocations WHERE machine_id = ?", (machine_id,)).fetchone():
+            return None, False
+        row = conn.execute(
+            "SELECT license FROM issued_licenses WHERE machine_id = ? AND package = ? AND issued_at >= ? "
+            "ORDER BY issued_at DESC LIMIT 1",
+            (machine_id, package, since)
+        ).fetchone()
+        return (row["license"], True) if row else None
+
+    def get_or_issue(self, machine_id, package, window_seconds, issue):
+        """Single-request form of get_or_issue_many."""
+        return self.get_or_issue_many([(machine_id, package)], window_seconds, issue)[0]
+
+    def record_many(self, records):
+        """Records licenses issued elsewhere (e.g. admin bulk runs) so they show up in status and history.
+
+        records are (machine_id, package, license, expiration_date, issued_at) tuples.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO issued_licenses (machine_id, package, license, expiration_date, issued_at) VALUES (?, ?, ?, ?, ?)",
+                records
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def revoked_among(self, machine_ids):
+        """Returns the subset of machine_ids that are currently revoked."""
+        machine_ids = list(machine_ids)
+        revoked = set()
+        conn = self._connection()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(machine_ids), 500):
+            part = machine_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT machine_id FROM revocations WHERE machine_id IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            revoked.update(row["machine_id"] for row in rows)
+        return revoked
+
+    def status(self, machine_id):
+        """Returns the newest license issued to machine_id and when the machine was revoked, or None.
+
+        Only indexed reads: no token is decoded or re-encrypted.
+        """
+        row = self._connection().execute(
+            "SELECT l.id, l.package, l.expiration_date, l.issued_at, r.revoked_at FROM issued_licenses l "
+            "LEFT JOIN revocations r ON r.machine_id = l.machine_id "
+            "WHERE l.machine_id = ? ORDER BY l.issued_at DESC, l.id DESC LIMIT 1",
+            (machine_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def revoke(self, machine_id):
+        """Revokes machine_id: its licenses report as revoked and no new ones are issued until unrevoke()."""
+        self._connection().execute(
+            "INSERT INTO revocations (machine_id, revoked_at) VALUES (?, ?) "
+            "ON CONFLICT(machine_id) DO UPDATE SET revoked_at = excluded.revoked_at",
+            (machine_id, time.time())
+        )
+
+    def unrevoke(self, machine_id):
+        """Lifts a revocation; returns False if machine_id wasn't revoked."""
+        cursor = self._connection().execute("DELETE FROM revocations WHERE machine_id = ?", (machine_id,))
+        return cursor.rowcount > 0
+
+    def history(self, machine_id):
+        """Returns every license issued to machine_id, newest first."""
+        rows = self._connection().execute(
+            "SELECT package, expiration_date, issued_at, license FROM issued_licenses WHERE machine_id = ? ORDER BY issued_at DESC",
+            (machine_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up, revoke or reinstate licenses issued to a machine.")
+    parser.add_argument("machine_id")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--with-token", action="store_true", help="Include the license tokens")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--revoke", action="store_true", help="Revoke the machine and refuse new activations")
+    action.add_argument("--unrevoke", action="store_true", help="Lift a revocation so the machine can activate again")
+    args = parser.parse_args()
+    store = LicenseStore(args.db)
+    if args.revoke:
+        store.revoke(args.machine_id)
+        print(f"Revoked licenses of {args.machine_id}; activations are refused until --unrevoke")
+        return
+    if args.unrevoke:
+        lifted = store.unrevoke(args.machine_id)
+        print(f"Lifted revocation of {args.machine_id}" if lifted else f"{args.machine_id} was not revoked")
+        return
+    for record in store.history(args.machine_id):
+        record["issued_at"] = time.strftime("%d/%m/%Y %H:%M:%S", time.localtime(record["issued_at"]))
+        if not args.with_token:
+            record.pop("license")
+        print(json.dumps(record, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# loadtest.py
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Load Test Defaults ---
+DEFAULT_URL = "http://127.0.0.1:5000/activate"
+DEFAULT_REQUESTS = 2000
+DEFAULT_CONCURRENCY = 32
+
+_local = threading.local()
+
+def _session(concurrency):
+    """Returns a keep-alive session owned by the calling thread."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    return _local.session
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def activate_once(url, package, concurrency):
+    """Sends one activation request and returns (status, latency in seconds)."""
+    payload = {"machine_id": uuid.uuid4().hex, "package": package}
+    started = time.perf_counter()
+    try:
+        status = _session(concurrency).post(url, json=payload, timeout=10).status_code
+    except requests.exceptions.RequestException as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - started
+
+def run(url, total, concurrency, package):
+    """Fires total requests with the given concurrency and summarizes the results."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: activate_once(url, package, concurrency), range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for status, latency in results if status == 200)
+    return {
+        "url": url,
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "ok": len(latencies),
+        "status_counts": {str(k): v for k, v in Counter(status for status, _ in results).items()},
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /activate endpoint.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("-n", "--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--package", default="1M")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = run(args.url, args.requests, args.concurrency, args.package)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['requests']} requests, concurrency {summary['concurrency']}, {summary['elapsed_s']} s")
+    print(f"  throughput: {summary['rps']} req/s")
+    print(f"  latency p50: {summary['p50_ms']} ms, p99: {summary['p99_ms']} ms, mean: {summary['mean_ms']} ms")
+    print(f"  status codes: {summary['status_counts']}")
+    if summary["ok"] < summary["requests"]:
+        print("  note: non-200 responses excluded from latency; set RATELIMIT_ENABLED=false on the server for load tests")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# log_setup.py
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+
+# --- Logging Defaults ---
+CONSOLE_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 10
+REDACTED = "***"
+# Extra fields whose values are never written out
+SENSITIVE_FIELDS = {"key", "fernet_key", "secret", "password", "license", "token", "authorization"}
+# Signed, MAC'd and legacy (Fernet, optionally base64-wrapped) license tokens
+TOKEN_PATTERN = re.compile(r"\bL[12]\.[A-Za-z0-9_-]{20,}|\b(?:gAAAAA|Z0FBQUFB)[A-Za-z0-9_=+/-]{20,}")
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_listener_pid = None
+
+class RedactingFilter(logging.Filter):
+    """Masks secrets and license tokens in messages and sensitive extra fields.
+
+    Runs on the queue handler, before the record leaves the request thread,
+    so no handler ever sees the unredacted text.
+    """
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = [secret for secret in secrets if secret]
+
+    def redact(self, text):
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return TOKEN_PATTERN.sub(REDACTED, text)
+
+    def filter(self, record):
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = self.redact(record.exc_text)
+        for name, value in vars(record).items():
+            if name in _RECORD_FIELDS:
+                continue
+            if name.lower() in SENSITIVE_FIELDS:
+                setattr(record, name, REDACTED)
+            elif isinstance(value, str):
+                setattr(record, name, self.redact(value))
+        return True
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """Queues records with the traceback kept apart from the message (the stock handler folds it into msg)."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, traceback and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS and not name.startswith("_"):
+                entry[name] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging(path, secrets=(), filters=(), max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, when=None, level=logging.INFO):
+    """Routes all logging through a queue to a background listener thread.
+
+    Callers only enqueue records; the listener formats them and writes JSON
+    lines to path (rotated by size, or by time if when is given, e.g.
+    "midnight") and plain text to the console. The queue and listener belong
+    to the calling process: a forked worker (gunicorn post_fork) calls this
+    again, with its own path, to replace what it inherited.
+    """
+    global _listener, _listener_pid
+    if when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding="utf-8")
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JSONFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    for log_filter in filters:
+        queue_handler.addFilter(log_filter)
+    queue_handler.addFilter(RedactingFilter(secrets))
+
+    # An inherited listener thread didn't survive a fork; only the process that started it may stop it
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+    return queue_handler
+
+def stop_logging():
+    """Flushes queued records and stops the listener (only in the process that started it)."""
+    global _listener
+    if _listener is not None and os.getpid() == _listener_pid:
+        _listener.stop()
+        _listener = None
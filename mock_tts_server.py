@@ -0,0 +1,76 @@
+# mock_tts_server.py
+import argparse
+import json
+import logging
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tts_backends import OfflineBackend
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Latency Model ---
+# Defaults approximate a gTTS round trip: fixed connection/request overhead
+# plus time proportional to text length, with some jitter.
+BASE_LATENCY = 0.35
+PER_CHAR_LATENCY = 0.004
+JITTER = 0.1
+# 4 kHz 8-bit mono is ~4 kB per second of speech, close to gTTS's 32 kbps MP3
+SAMPLE_RATE = 4000
+
+class MockTTSHandler(BaseHTTPRequestHandler):
+    """Serves POST /synthesize with gTTS-like latency and payload size."""
+    server_version = "MockTTS/1.0"
+
+    def do_POST(self):
+        if self.path != "/synthesize":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+            text = data["text"]
+            lang = data.get("lang", "vi")
+            slow = bool(data.get("slow", False))
+        except (ValueError, KeyError):
+            self.send_error(400, "Invalid JSON")
+            return
+        config = self.server.config
+        delay = config.base_latency + config.per_char * len(text) + random.uniform(0, config.jitter)
+        time.sleep(delay)
+        audio = self.server.synthesizer.synthesize(text, lang, slow)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the gTTS service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--base-latency", type=float, default=BASE_LATENCY, help="Fixed delay per request in seconds")
+    parser.add_argument("--per-char", type=float, default=PER_CHAR_LATENCY, help="Extra delay per character in seconds")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="Maximum random extra delay in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible jitter")
+    config = parser.parse_args()
+    random.seed(config.seed)
+
+    server = ThreadingHTTPServer((config.host, config.port), MockTTSHandler)
+    server.config = config
+    server.synthesizer = OfflineBackend(sample_rate=SAMPLE_RATE)
+    logger.info(f"Mock TTS server listening on http://{config.host}:{config.port}/synthesize")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# phrase_templates.py
+import io
+import logging
+import re
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Template Configuration ---
+# {n} is a number from NUMBER_RANGE, other slots take the values in SLOT_VALUES
+TEMPLATES = {
+    "vi": [
+        "Nhiệt độ {room} là {n} độ",
+        "Độ ẩm {room} là {n} phần trăm",
+        "Đã bật đèn {room}",
+        "Đã tắt đèn {room}",
+        "Cửa {room} đang mở"
+    ],
+    "en": [
+        "The {room} temperature is {n} degrees",
+        "The {room} humidity is {n} percent",
+        "The {room} lights are on",
+        "The {room} lights are off",
+        "The {room} door is open"
+    ]
+}
+SLOT_VALUES = {
+    "vi": {"room": ["phòng khách", "phòng ngủ", "phòng bếp", "phòng tắm", "garage", "sân vườn"]},
+    "en": {"room": ["living room", "bedroom", "kitchen", "bathroom", "garage", "garden"]}
+}
+NUMBER_RANGE = range(0, 101)
+CROSSFADE_MS = 25
+SILENCE_THRESHOLD = 300   # int16 amplitude treated as silence when trimming fragment edges
+EDGE_PADDING_MS = 15      # Silence kept around each trimmed fragment
+PRERENDER_WORKERS = 4
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+TRAILING_PUNCTUATION = ".!?…;:, \n\t"
+
+def parse_template(template):
+    """Splits a template into ("text", fragment) and ("slot", name) parts."""
+    parts = []
+    position = 0
+    for match in SLOT_PATTERN.finditer(template):
+        fixed = template[position:match.start()].strip()
+        if fixed:
+            parts.append(("text", fixed))
+        parts.append(("slot", match.group(1)))
+        position = match.end()
+    fixed = template[position:].strip()
+    if fixed:
+        parts.append(("text", fixed))
+    return parts
+
+def normalize(text):
+    return " ".join(text.strip(TRAILING_PUNCTUATION).split()).lower()
+
+class PhraseRenderer:
+    """Builds announcements from pre-rendered fragments instead of synthesizing them whole.
+
+    Nothing is rendered up front. The first time a text matches a template,
+    render() returns None (the caller synthesizes the text as usual) and the
+    template's fixed fragments and slot values are synthesized in the
+    background, once, through the normal cached synthesizer. After that,
+    render() answers any text matching the template by splicing the
+    fragments' PCM with short crossfades, with no TTS call. Fragments that
+    fail are retried the next time the template matches. decode(audio) must
+    return interleaved signed 16-bit PCM at sample_rate/channels.
+    """
+
+    def __init__(self, synthesize, decode, sample_rate, channels, templates=TEMPLATES, slot_values=SLOT_VALUES):
+        self.synthesize = synthesize
+        self.decode = decode
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.templates = templates
+        self.slot_values = slot_values
+        self._fragments = {}  # (lang, normalized text) -> int16 array (frames, channels) of trimmed PCM
+        self._rendering = set()  # (lang, normalized text) being synthesized
+        self._patterns = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _values(self, lang, slot):
+        if slot == "n":
+            return [str(n) for n in NUMBER_RANGE]
+        return self.slot_values.get(lang, {}).get(slot, [])
+
+    def _compiled(self, lang):
+        with self._lock:
+            if lang not in self._patterns:
+                compiled = []
+                for template in self.templates.get(lang, []):
+                    parts = parse_template(template)
+                    regex = []
+                    for kind, value in parts:
+                        if kind == "text":
+                            regex.append(r"\s+".join(re.escape(word) for word in normalize(value).split()))
+                        else:
+                            values = sorted((normalize(v) for v in self._values(lang, value)), key=len, reverse=True)
+                            regex.append("(" + "|".join(re.escape(v) for v in values) + ")")
+                    compiled.append((re.compile(r"\s+".join(regex) + "$"), parts))
+                self._patterns[lang] = compiled
+            return self._patterns[lang]
+
+    def fragments_for(self, lang, parts=None):
+        """Returns every fragment text the language's templates (or one template's parts) need."""
+        texts = []
+        for template_parts in [parts] if parts else [parse_template(template) for template in self.templates.get(lang, [])]:
+            for kind, value in template_parts:
+                texts.extend([value] if kind == "text" else self._values(lang, value))
+        return list(dict.fromkeys(texts))
+
+    def _schedule(self, lang, parts):
+        """Starts background rendering of a template's missing fragments; repeated calls add nothing."""
+        with self._lock:
+            texts = [text for text in self.fragments_for(lang, parts)
+                     if (lang, normalize(text)) not in self._fragments and (lang, normalize(text)) not in self._rendering]
+            if not texts:
+                return
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=PRERENDER_WORKERS, thread_name_prefix="phrase")
+            for text in texts:
+                self._rendering.add((lang, normalize(text)))
+                self._pool.submit(self._render_fragment, text, lang)
+        logger.info(f"Pre-rendering {len(texts)} phrase fragments for '{lang}'")
+
+    def _render_fragment(self, text, lang):
+        key = (lang, normalize(text))
+        try:
+            pcm = np.frombuffer(self.decode(self.synthesize(text, lang)), dtype=np.int16).reshape(-1, self.channels)
+            pcm = self._trim(pcm)
+        except Exception as e:
+            logger.warning(f"Failed to pre-render fragment '{text}': {e}")
+            return
+        finally:
+            with self._lock:
+                self._rendering.discard(key)
+        with self._lock:
+            self._fragments[key] = pcm
+
+    def _trim(self, pcm):
+        """Cuts leading and trailing silence, keeping a little padding."""
+        loud = np.flatnonzero(np.abs(pcm.astype(np.int32)).max(axis=1) >= SILENCE_THRESHOLD)
+        if len(loud) == 0:
+            return pcm[:0]
+        padding = int(self.sample_rate * EDGE_PADDING_MS / 1000)
+        return pcm[max(0, loud[0] - padding):min(len(pcm), loud[-1] + 1 + padding)]
+
+    def _splice(self, pieces):
+        """Concatenates PCM pieces, overlapping each joint with a linear crossfade."""
+        fade_frames = int(self.sample_rate * CROSSFADE_MS / 1000)
+        segments = [pieces[0].astype(np.float32)]
+        for piece in pieces[1:]:
+            piece = piece.astype(np.float32)
+            previous = segments[-1]
+            overlap = min(fade_frames, len(previous), len(piece))
+            weight = (np.arange(overlap, dtype=np.float32) / max(1, overlap))[:, None]
+            joint = previous[len(previous) - overlap:] * (1 - weight) + piece[:overlap] * weight
+            segments[-1] = previous[:len(previous) - overlap]
+            segments.extend((joint, piece[overlap:]))
+        return np.clip(np.concatenate(segments), -32768, 32767).astype(np.int16)
+
+    def render(self, text, lang):
+        """Returns WAV bytes for text if it matches a template of lang whose fragments are ready, else None."""
+        normalized = normalize(text)
+        for pattern, parts in self._compiled(lang):
+            match = pattern.match(normalized)
+            if not match:
+                continue
+            values = iter(match.groups())
+            keys = [(lang, normalize(value) if kind == "text" else next(values)) for kind, value in parts]
+            with self._lock:
+                pieces = [self._fragments.get(key) for key in keys]
+            if any(pcm is None for pcm in pieces):
+                self._schedule(lang, parts)
+                return None
+            return self._to_wav(self._splice(pieces))
+        return None
+
+    def _to_wav(self, pcm):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm.astype("<i2").tobytes())
+        return buffer.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {"fragments": len(self._fragments), "rendering": len(self._rendering)}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,185 @@
+# playback.py
+import collections
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Playback Configuration ---
+# Re-check interval when a track outlives its reported length (mixer buffering);
+# the next track is already on Channel.queue, so this only delays the track_end event
+END_GRACE_SECONDS = 0.05
+
+class PlaybackEngine:
+    """Plays audio on the mixer's voice channel from a dedicated thread.
+
+    Callers only post commands (play, enqueue, stop, skip); the engine thread
+    owns the channel. Instead of polling get_busy(), it sleeps on its command
+    queue until the current track is due to end, then hands the next sound to
+    Channel.queue so consecutive tracks play without a gap. Urgent tracks
+    (alerts) have their own playlist: they interrupt a normal track, which
+    replays from its start once the alerts are done. on_event(name, tag) is
+    called from the engine thread with "track_start", "track_end",
+    "interrupted", "stopped" or "idle"; GUI callers must marshal it to the Tk
+    thread.
+    """
+
+    def __init__(self, mixer_manager, on_event=None):
+        self.mixer_manager = mixer_manager
+        self.on_event = on_event
+        self._commands = queue.Queue()
+        self._pending = collections.deque()  # [sound, tag, urgent]
+        self._urgent = collections.deque()   # Alerts, played before anything in _pending
+        self._current = None  # [sound, tag, ends_at, urgent]
+        self._queued = None   # [sound, tag, urgent] already handed to Channel.queue
+        self._thread = None
+
+    def start(self):
+        """Starts the engine thread, which also warms up the mixer."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+            self._thread.start()
+
+    def play(self, audio_data, tag=None):
+        """Stops whatever is playing and plays audio_data right away."""
+        self._commands.put(("stop", None, None))
+        self.enqueue(audio_data, tag)
+
+    def enqueue(self, audio_data, tag=None, urgent=False):
+        """Appends audio_data to the playlist; urgent audio interrupts normal tracks and plays first."""
+        self.start()
+        self._commands.put(("urgent" if urgent else "enqueue", audio_data, tag))
+
+    def stop(self):
+        """Stops playback and clears the playlist."""
+        self._commands.put(("stop", None, None))
+
+    def skip(self):
+        """Ends the current track and moves on to the next one."""
+        self._commands.put(("skip", None, None))
+
+    def close(self, timeout=2):
+        """Stops playback and waits for the engine thread to exit."""
+        if self._thread is not None:
+            self._commands.put(("close", None, None))
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_playing(self):
+        return self._current is not None or bool(self._pending) or bool(self._urgent)
+
+    def _emit(self, name, tag):
+        if self.on_event is not None:
+            try:
+                self.on_event(name, tag)
+            except Exception as e:
+                logger.error(f"Playback event handler failed: {e}")
+
+    def _run(self):
+        self.mixer_manager.init()
+        while True:
+            timeout = None
+            if self._current is not None:
+                timeout = max(0.0, self._current[2] - time.monotonic())
+            try:
+                command, audio_data, tag = self._commands.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+            try:
+                if command == "close":
+                    self._stop()
+                    return
+                if command == "stop":
+                    self._stop()
+                elif command == "skip":
+                    self._skip()
+                elif command in ("enqueue", "urgent"):
+                    self._enqueue(audio_data, tag, command == "urgent")
+                self._advance()
+            except Exception as e:
+                logger.error(f"Playback error: {e}")
+                self._current = self._queued = None
+                self._pending.clear()
+                self._urgent.clear()
+
+    def _enqueue(self, audio_data, tag, urgent=False):
+        if not self.mixer_manager.initialized:
+            self.mixer_manager.init()
+            if not self.mixer_manager.initialized:
+                logger.warning("Dropping audio: mixer is not available")
+                return
+        # Decode on arrival so the sound is ready long before its turn
+        (self._urgent if urgent else self._pending).append([self.mixer_manager.load_sound(audio_data), tag, urgent])
+
+    def _requeue(self, item):
+        (self._urgent if item[2] else self._pending).appendleft(item)
+
+    def _next_item(self):
+        return (self._urgent or self._pending).popleft()
+
+    def _stop(self):
+        if self._current is None and not self._pending and not self._urgent:
+            return
+        if self.mixer_manager.voice_channel is not None:
+            self.mixer_manager.voice_channel.stop()
+        self._pending.clear()
+        self._urgent.clear()
+        tag = self._current[1] if self._current else None
+        self._current = self._queued = None
+        self._emit("stopped", tag)
+
+    def _skip(self):
+        if self._current is None:
+            return
+        self.mixer_manager.voice_channel.stop()
+        if self._queued is not None:
+            self._requeue(self._queued)
+        self._emit("track_end", self._current[1])
+        self._current = self._queued = None
+        if not self._pending and not self._urgent:
+            self._emit("idle", None)
+
+    def _interrupt(self, channel):
+        """Stops a normal track for an alert; it replays from its start afterwards."""
+        channel.stop()
+        if self._queued is not None:
+            self._requeue(self._queued)
+        sound, tag = self._current[0], self._current[1]
+        self._pending.appendleft([sound, tag, False])
+        self._current = self._queued = None
+        self._emit("interrupted", tag)
+
+    def _start(self, sound, tag, urgent, started_at):
+        self._current = [sound, tag, started_at + sound.get_length(), urgent]
+        self._emit("track_start", tag)
+
+    def _advance(self):
+        channel = self.mixer_manager.voice_channel
+        if self._current is not None and time.monotonic() >= self._current[2]:
+            if self._queued is not None and channel.get_queue() is None:
+                # The channel moved on to the queued sound by itself
+                ended_at = self._current[2]
+                self._emit("track_end", self._current[1])
+                sound, tag, urgent = self._queued
+                self._queued = None
+                self._start(sound, tag, urgent, ended_at)
+            elif not channel.get_busy():
+                self._emit("track_end", self._current[1])
+                self._current = None
+                if not self._pending and not self._urgent:
+                    self._emit("idle", None)
+            else:
+                # Still draining the mixer buffer; look again shortly
+                self._current[2] = time.monotonic() + END_GRACE_SECONDS
+        if self._urgent and self._current is not None and not self._current[3]:
+            self._interrupt(channel)
+        if self._current is None and (self._urgent or self._pending):
+            sound, tag, urgent = self._next_item()
+            channel.play(sound)
+            self._start(sound, tag, urgent, time.monotonic())
+        # Normal audio is never queued behind an alert, so a later alert can still cut in line
+        if self._current is not None and self._queued is None and (self._urgent or (self._pending and not self._current[3])):
+            self._queued = self._next_item()
+            channel.queue(self._queued[0])
@@ -0,0 +1,166 @@
+# ratelimit_storage.py
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rejections (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    last_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Expired counters are purged after this many writes in a process
+PURGE_EVERY = 1000
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate-limit storage shared by every worker through one SQLite file.
+
+    Use with flask-limiter as storage_uri="sqlite:///ratelimits.db" (relative)
+    or "sqlite:////var/lib/app/ratelimits.db" (absolute). Each counter is a
+    primary-key row, so every check is O(1), and limits survive restarts.
+    """
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        path = (uri or "sqlite:///ratelimits.db")[len("sqlite://"):]
+        self.path = path[1:] if path.startswith("/") else path
+        self._local = threading.local()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._connection().executescript(SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        # One connection per thread and per process (safe across gunicorn forks)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, conn, key, now):
+        row = conn.execute("SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        return row[0] if row else 0
+
+    def _incr(self, conn, key, expiry, amount, now):
+        conn.execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+            "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END",
+            (key, amount, now + expiry, now, now)
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return self._get(conn, key, now)
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = self._incr(conn, key, expiry, amount, time.time())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, key):
+        return self._get(self._connection(), key, time.time())
+
+    def get_expiry(self, key):
+        row = self._connection().execute("SELECT expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0]
+        conn.execute("DELETE FROM counters")
+        return count
+
+    def clear(self, key):
+        self._connection().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def _sliding_window_info(self, conn, key, expiry, now):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(conn, previous_key, now)
+        current_count = self._get(conn, current_key, now)
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        conn = self._connection()
+        now = time.time()
+        # The read and the increment share one write lock, so workers can't overshoot the limit
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window_info(conn, key, expiry, now)
+            allowed = floor(previous_count * previous_ttl / expiry + current_count) + amount <= limit
+            if allowed:
+                _, current_key = self.sliding_window_keys(key, expiry, now)
+                self._incr(conn, current_key, 2 * expiry, amount, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def get_sliding_window(self, key, expiry):
+        return self._sliding_window_info(self._connection(), key, expiry, time.time())
+
+    def clear_sliding_window(self, key, expiry):
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
+
+    def record_rejection(self, key):
+        """Counts one rejected request for a rate-limit key."""
+        self._connection().execute(
+            "INSERT INTO rejections (key, count, last_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET count = count + 1, last_at = excluded.last_at",
+            (key, time.time())
+        )
+
+    def rejection_counts(self):
+        """Returns {key: rejected request count}, most rejected first."""
+        rows = self._connection().execute("SELECT key, count FROM rejections ORDER BY count DESC").fetchall()
+        return dict(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show rate-limit rejections per key.")
+    parser.add_argument("--uri", default=os.getenv("RATELIMIT_STORAGE_URI", "sqlite:///ratelimits.db"))
+    args = parser.parse_args()
+    for key, count in SQLiteStorage(args.uri).rejection_counts().items():
+        print(f"{count:8d}  {key}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# serve.py
+import argparse
+import logging
+import os
+import signal
+import sys
+
+# Importing server loads the keys and builds the codec; logging starts in main()
+import server
+from server import app
+
+logger = logging.getLogger(__name__)
+
+# --- Serving Defaults ---
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5000
+DEFAULT_WORKERS = (os.cpu_count() or 1) * 2 + 1
+DEFAULT_THREADS = 4
+GRACEFUL_TIMEOUT = 30
+
+def worker_log_path(path, slot):
+    """Returns path with the worker's slot before the extension, e.g. server.worker0.log."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.worker{slot}{extension}"
+
+def free_slot(workers):
+    """Returns the lowest slot number not held by a live worker."""
+    taken = {getattr(worker, "log_slot", None) for worker in workers}
+    slot = 0
+    while slot in taken:
+        slot += 1
+    return slot
+
+def run_gunicorn(args):
+    """Serves the app from multiple pre-forked gunicorn worker processes (Linux/macOS)."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # Also what Windows hits (gunicorn needs fcntl)
+        sys.exit("gunicorn is not available: pip install gunicorn, or use --mode waitress")
+
+    def pre_fork(arbiter, worker):
+        # Runs in the master, so slots are handed out without races; a replacement
+        # worker takes over the slot (and log file) of the one that exited
+        worker.log_slot = free_slot(arbiter.WORKERS.values())
+
+    def post_fork(arbiter, worker):
+        # Each worker runs its own log queue and listener (threads don't survive fork) and
+        # writes its own file, so size/time rotation never races between processes
+        server.init_logging(worker_log_path(server.LOG_FILE, worker.log_slot))
+        logger.info(f"Worker {worker.pid} ready (slot {worker.log_slot})")
+
+    class LicenseServerApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        # server.py is imported once in the master, so the key is read (or
+        # generated) a single time and every forked worker starts with its
+        # cipher ready.
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork
+    }
+    logger.info(f"Starting gunicorn on {options['bind']} with {args.workers} workers x {args.threads} threads")
+    LicenseServerApplication(options).run()
+
+def run_waitress(args):
+    """Serves the app from a multi-threaded waitress server (works on Windows)."""
+    try:
+        from waitress import create_server
+    except ImportError:
+        sys.exit("waitress is not installed: pip install waitress, or use --mode gunicorn")
+
+    waitress_server = create_server(app, host=args.host, port=args.port, threads=args.threads * args.workers)
+
+    def shutdown(signum, frame):
+        # On SystemExit waitress stops its event loop and gives worker threads
+        # up to 5 s to finish the request they are running; queued requests
+        # are cancelled and nothing more is written to sockets, so this is
+        # not a graceful drain (run several instances behind a proxy for that)
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    logger.info(f"Starting waitress on {args.host}:{args.port} with {args.threads * args.workers} threads")
+    waitress_server.run()
+    logger.info("Server stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Production entry point for the license server.")
+    parser.add_argument("--mode", choices=["gunicorn", "waitress"],
+                        default="waitress" if sys.platform == "win32" else "gunicorn")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes (gunicorn)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Threads per worker")
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT,
+                        help="Seconds to let in-flight requests finish on shutdown (gunicorn only)")
+    args = parser.parse_args()
+    server.init_logging()
+    if args.mode == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,123 @@
 # server.py
-from flask import Flask, request, jsonify
+from flask import Flask, g, has_request_context, request, jsonify
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import json
-import base64
 from cryptography.fernet import Fernet
-import datetime
 import logging
 import os
+import time
+import uuid
 from dotenv import load_dotenv
+from license_codec import LicenseCodec, PERMANENT_LABEL, TOKEN_PREFIX, format_epoch, generate_signing_key, parse_date, public_key_for
+from license_store import LicenseStore
+import ratelimit_storage  # registers the sqlite:// rate-limit storage scheme
+from log_setup import setup_logging
 
-# --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler('server.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-# --- Load or Generate Fernet Key ---
+# --- Load or Generate Keys ---
+# FERNET_KEY only serves legacy clients; licenses are signed with LICENSE_SIGNING_KEY
+# (Ed25519) and clients carry just its public key.
 load_dotenv()
 KEY = os.getenv("FERNET_KEY")
-if not KEY:
+key_generated = not KEY
+if key_generated:
     KEY = Fernet.generate_key().decode()
-    with open('.env', 'w') as f:
+    with open('.env', 'a') as f:
         f.write(f"FERNET_KEY={KEY}\n")
-    logger.info(f"Generated new Fernet key: {KEY}")
-else:
-    logger.info("Loaded Fernet key from .env")
+SIGNING_KEY = os.getenv("LICENSE_SIGNING_KEY")
+signing_key_generated = not SIGNING_KEY
+if signing_key_generated:
+    SIGNING_KEY = generate_signing_key()
+    with open('.env', 'a') as f:
+        f.write(f"LICENSE_SIGNING_KEY={SIGNING_KEY}\n")
+
+# --- Logging Setup ---
+# JSON lines in server.log, written by a background listener; request threads
+# only enqueue records. Set LOG_ROTATE_WHEN=midnight for daily instead of size-based rotation.
+LOG_FILE = os.getenv("LOG_FILE", "server.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")
+
+class RequestContextFilter(logging.Filter):
+    """Tags records logged while handling a request with its request id."""
+
+    def filter(self, record):
+        if has_request_context() and "request_id" in g:
+            record.request_id = g.request_id
+        return True
+
+logger = logging.getLogger(__name__)
+_startup_logged = False
+
+def init_logging(path=LOG_FILE):
+    """Sends this process's logging to path (see log_setup.setup_logging).
+
+    Importing this module leaves logging alone; entry points call this once
+    per serving process (serve.py also calls it in each gunicorn worker).
+    """
+    global _startup_logged
+    setup_logging(path, secrets=[KEY, SIGNING_KEY], filters=[RequestContextFilter()], max_bytes=LOG_MAX_BYTES,
+                  backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN)
+    if not _startup_logged:
+        _startup_logged = True
+        logger.info("Generated new Fernet key and saved it to .env" if key_generated else "Loaded Fernet key from .env")
+        logger.info("Generated new license signing key and saved it to .env" if signing_key_generated else "Loaded license signing key from .env")
+        # Clients need this as LICENSE_PUBLIC_KEY to verify licenses
+        logger.info(f"License public key: {public_key_for(SIGNING_KEY)}")
 
 try:
     cipher = Fernet(KEY.encode())
+    codec = LicenseCodec(signing_key=SIGNING_KEY, legacy_key=KEY)
 except Exception as e:
-    logger.error(f"Failed to initialize Fernet cipher: {e}")
+    logger.error(f"Failed to initialize license keys: {e}")
     exit(1)
 
 # --- Flask Setup ---
 app = Flask(__name__)
-limiter = Limiter(app=app, key_func=get_remote_address, default_limits=["100 per day", "10 per minute"])
+# Set RATELIMIT_ENABLED=false in .env when load testing
+app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "true").lower() != "false"
+
+# --- Request Logging ---
+@app.before_request
+def start_request():
+    g.request_id = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex[:16]
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def log_request(response):
+    latency_ms = round((time.perf_counter() - g.request_started) * 1000, 2)
+    logger.info(f"{request.method} {request.path} {response.status_code} in {latency_ms} ms", extra={
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "latency_ms": latency_ms,
+        "remote_addr": request.remote_addr
+    })
+    response.headers["X-Request-ID"] = g.request_id
+    return response
+
+# --- Rate Limiting ---
+# Counters live in one SQLite file so limits hold across workers and restarts
+RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "sqlite:///ratelimits.db")
+RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "sliding-window-counter")
+
+def record_rejection(request_limit):
+    """Counts rejected requests per rate-limit key."""
+    logger.warning(f"Rate limit exceeded: {request_limit.key}")
+    try:
+        if hasattr(limiter.storage, "record_rejection"):
+            limiter.storage.record_rejection(request_limit.key)
+    except Exception as e:
+        logger.error(f"Error recording rate-limit rejection: {e}")
+
+limiter = Limiter(
+    app=app,
+    key_func=get_remote_address,
+    default_limits=["100 per day", "10 per minute"],
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy=RATELIMIT_STRATEGY,
+    on_breach=record_rejection
+)
 
 # --- Subscription Packages ---
 PACKAGES = {
@@ -50,6 +127,46 @@ PACKAGES = {
     "PERM": None
 }
 
+# --- Issued License Store ---
+# Repeat activations for the same machine and package inside this window get
+# the stored license back instead of a newly minted one.
+REISSUE_WINDOW_SECONDS = int(os.getenv("REISSUE_WINDOW_SECONDS", "600"))
+license_store = LicenseStore(os.getenv("LICENSE_DB", "licenses.db"))
+
+# --- Batch Activation ---
+MAX_BATCH_SIZE = 500
+
+def validate_activation(machine_id, package):
+    """Returns an error message for an invalid activation request, or None."""
+    if not machine_id or not isinstance(machine_id, str) or not 8 <= len(machine_id) <= 255:
+        return "Invalid machine_id"
+    if not isinstance(package, str) or package not in PACKAGES:
+        return "Invalid package"
+    return None
+
+def expiry_for(package, issued_at):
+    """Returns the expiry epoch of a package issued at issued_at, or None if permanent."""
+    if PACKAGES[package] is None:
+        return None
+    return issued_at + PACKAGES[package] * 86400
+
+def issue_license(machine_id, package, issued_at):
+    """Returns a new compact license token and its display expiration date."""
+    expires_at = expiry_for(package, issued_at)
+    token = codec.encode(machine_id, package, issued_at, expires_at)
+    return token, format_epoch(expires_at) if expires_at else PERMANENT_LABEL
+
+def client_token(token, token_format):
+    """Returns a stored token in the format the client asked for.
+
+    Clients that send token_format "v2" get the signed compact token; older
+    clients get the legacy base64-wrapped Fernet token they know how to
+    decrypt. Tokens stored before signing are re-signed on the way out.
+    """
+    if token_format == "v2":
+        return token if token.startswith(TOKEN_PREFIX) else codec.encode_data(codec.decode(token))
+    return codec.encode_legacy(codec.decode(token))
+
 @app.route('/activate', methods=['POST'])
 @limiter.limit("5 per minute")
 def activate_license():
@@ -63,38 +180,121 @@ def activate_license():
         machine_id = data.get('machine_id')
         package = data.get('package')
 
-        if not machine_id or not isinstance(machine_id, str) or len(machine_id) < 8:
-            logger.warning("Invalid machine_id")
-            return jsonify({"error": "Invalid machine_id"}), 400
+        error = validate_activation(machine_id, package)
+        if error:
+            logger.warning(f"Invalid package: {package}" if error == "Invalid package" else error)
+            return jsonify({"error": error}), 400
+
+        def issue(machine_id, package):
+            return issue_license(machine_id, package, int(time.time()))
 
-        if package not in PACKAGES:
-            logger.warning(f"Invalid package: {package}")
-            return jsonify({"error": "Invalid package"}), 400
-
-        start_date = datetime.datetime.now()
-        expiry_date = "Vĩnh viễn" if package == "PERM" else (
-            start_date + datetime.timedelta(days=PACKAGES[package])
-        ).strftime("%d/%m/%Y %H:%M:%S")
-
-        license_data = {
-            "username": "hoanq",
-            "voice_id": "Free",
-            "registration_date": start_date.strftime("%d/%m/%Y %H:%M:%S"),
-            "status": "Đã đăng ký",
-            "expiration_date": expiry_date,
-            "package": package,
-            "machine_id": machine_id
-        }
-
-        encrypted_data = cipher.encrypt(json.dumps(license_data).encode())
-        encoded_data = base64.b64encode(encrypted_data).decode()
-
-        logger.info(f"Activated license for machine_id: {machine_id}, package: {package}")
-        return jsonify({"license": encoded_data})
+        token, reused = license_store.get_or_issue(machine_id, package, REISSUE_WINDOW_SECONDS, issue)
+        if token is None:
+            logger.warning(f"Refused activation of revoked machine_id: {machine_id}")
+            return jsonify({"error": "License revoked"}), 403
+        encoded_data = client_token(token, data.get('token_format'))
+
+        if reused:
+            logger.info(f"Returned stored license for machine_id: {machine_id}, package: {package}")
+        else:
+            logger.info(f"Activated license for machine_id: {machine_id}, package: {package}")
+        return jsonify({"license": encoded_data, "reused": reused})
     except Exception as e:
         logger.error(f"Error processing activation: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/activate/batch', methods=['POST'])
+@limiter.limit("20 per day;2 per minute")
+def activate_batch():
+    """Activates up to MAX_BATCH_SIZE machines in one request for resellers."""
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            logger.warning("Invalid batch request")
+            return jsonify({"error": "Expected a non-empty 'items' list"}), 400
+        if len(items) > MAX_BATCH_SIZE:
+            logger.warning(f"Batch too large: {len(items)} items")
+            return jsonify({"error": f"Batch exceeds {MAX_BATCH_SIZE} items"}), 413
+
+        # Dates are computed once per package for the whole batch
+        issued_at = int(time.time())
+        expiry_epochs = {package: expiry_for(package, issued_at) for package in PACKAGES}
+        expiry_labels = {package: format_epoch(epoch) if epoch else PERMANENT_LABEL for package, epoch in expiry_epochs.items()}
+        encode = codec.encode
+        token_format = data.get('token_format')
+
+        def issue(machine_id, package):
+            return encode(machine_id, package, issued_at, expiry_epochs[package]), expiry_labels[package]
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            machine_id = item.get('machine_id') if isinstance(item, dict) else None
+            package = item.get('package') if isinstance(item, dict) else None
+            error = validate_activation(machine_id, package)
+            if error:
+                results[index] = {"machine_id": machine_id, "error": error}
+            else:
+                valid.append((index, machine_id, package))
+
+        # One short store transaction for the whole batch; tokens are signed before it starts
+        issued_licenses = license_store.get_or_issue_many(
+            [(machine_id, package) for _, machine_id, package in valid], REISSUE_WINDOW_SECONDS, issue)
+        issued = 0
+        revoked = 0
+        for (index, machine_id, package), (token, reused) in zip(valid, issued_licenses):
+            if token is None:
+                results[index] = {"machine_id": machine_id, "error": "License revoked"}
+                revoked += 1
+                continue
+            results[index] = {"machine_id": machine_id, "package": package,
+                              "license": client_token(token, token_format), "reused": reused}
+            issued += not reused
+        reused_count = len(valid) - issued - revoked
+
+        failed = len(items) - len(valid) + revoked
+        logger.info(f"Batch activation: {issued} issued, {reused_count} reused, {failed} rejected")
+        return jsonify({"results": results, "issued": issued, "reused": reused_count, "failed": failed})
+    except Exception as e:
+        logger.error(f"Error processing batch activation: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/status/<machine_id>', methods=['GET'])
+@limiter.limit("30 per minute")
+def license_status(machine_id):
+    """Reports whether a machine's newest license is active, expired or revoked.
+
+    The ETag changes only when that answer does, so clients polling with
+    If-None-Match usually get an empty 304 after one indexed lookup.
+    """
+    try:
+        if not 8 <= len(machine_id) <= 255:
+            return jsonify({"error": "Invalid machine_id"}), 400
+        record = license_store.status(machine_id)
+        if record is None:
+            return jsonify({"error": "Unknown machine_id"}), 404
+        expires_at = None if record["expiration_date"] in (None, PERMANENT_LABEL) else parse_date(record["expiration_date"])
+        if record["revoked_at"] is not None:
+            state = "revoked"
+        elif expires_at is not None and time.time() >= expires_at:
+            state = "expired"
+        else:
+            state = "active"
+        etag = f'{record["id"]}-{state}'
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify({"status": state, "package": record["package"], "expires_at": expires_at})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    except Exception as e:
+        logger.error(f"Error checking license status: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 if __name__ == '__main__':
-    logger.info(f"Starting Flask server with KEY: {KEY}")
+    # Development server only; use serve.py for production
+    init_logging()
+    logger.info("Starting Flask development server")
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
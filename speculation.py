@@ -0,0 +1,110 @@
+# speculation.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from speech_pipeline import SENTENCE_END, split_sentences
+
+logger = logging.getLogger(__name__)
+
+# --- Speculation Defaults ---
+MAX_WORKERS = 2         # Leaves backend capacity for text the user actually asked to hear
+BUDGET_CHARS = 1500     # Characters speculatively synthesized per draft
+
+def completed_chunks(text):
+    """Returns the chunks of text up to its last finished sentence.
+
+    Chunking works sentence by sentence, so these are exactly the leading
+    chunks the full text will produce once it is submitted.
+    """
+    ends = list(SENTENCE_END.finditer(text))
+    if not ends:
+        return []
+    return split_sentences(text[:ends[-1].start()])
+
+class Speculator:
+    """Pre-synthesizes the finished sentences of a draft in the background.
+
+    update() takes the draft's current chunks: new ones are synthesized
+    (through the normal cached synthesizer, so a later request finds them in
+    the cache or joins the running call) until the draft's character budget
+    is spent. Chunks edited away are cancelled if they have not started, or
+    counted as wasted if the backend call was already made. claim() marks
+    the chunks that were actually spoken as useful and starts a new draft.
+    """
+
+    def __init__(self, synthesize, needed=None, record=None, max_workers=MAX_WORKERS, budget_chars=BUDGET_CHARS):
+        self.synthesize = synthesize
+        self.needed = needed or (lambda text, lang: True)
+        self.record = record
+        self.budget_chars = budget_chars
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+        self._futures = {}  # (text, lang) -> Future
+        self._spent = 0
+        self._counters = {"submitted": 0, "useful": 0, "wasted": 0, "cancelled": 0, "failed": 0, "over_budget": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        self._counters[name] += amount
+        if self.record is not None:
+            self.record(f"speculative_{name}", amount)
+
+    def _run(self, key):
+        try:
+            self.synthesize(*key)
+        except Exception as e:
+            logger.warning(f"Speculative synthesis failed: {e}")
+            with self._lock:
+                self._count("failed")
+            raise
+
+    def _drop(self, key):
+        future = self._futures.pop(key)
+        if future.cancel():
+            self._spent -= len(key[0])
+            self._count("cancelled")
+        elif future.done() and future.exception() is not None:
+            pass  # Already counted as failed
+        else:
+            # Running calls finish anyway; their audio stays in the cache
+            self._count("wasted")
+
+    def update(self, chunks, lang):
+        """Speculates on chunks not seen yet and drops chunks no longer in the draft."""
+        keys = [(chunk, lang) for chunk in chunks]
+        wanted = set(keys)
+        with self._lock:
+            for key in [key for key in self._futures if key not in wanted]:
+                self._drop(key)
+            for key in keys:
+                if key in self._futures or not self.needed(*key):
+                    continue
+                if self._spent + len(key[0]) > self.budget_chars:
+                    self._count("over_budget")
+                    break
+                self._spent += len(key[0])
+                self._futures[key] = self._pool.submit(self._run, key)
+                self._count("submitted")
+
+    def claim(self, chunks, lang):
+        """Counts speculated chunks among the ones being spoken as useful; drops the rest."""
+        with self._lock:
+            for chunk in chunks:
+                future = self._futures.pop((chunk, lang), None)
+                if future is not None and not (future.done() and future.exception() is not None):
+                    self._count("useful")
+            for key in list(self._futures):
+                self._drop(key)
+            self._spent = 0
+
+    def reset(self):
+        """Drops all speculative work, e.g. when speculation is switched off."""
+        self.claim([], None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "pending": len(self._futures), "spent_chars": self._spent}
+
+    def close(self):
+        self.reset()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,104 @@
+# speech_pipeline.py
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- Pipeline Configuration ---
+SYNTH_WORKERS = 4
+MAX_CHUNK_CHARS = 200
+FIRST_CHUNK_CHARS = 60  # Keep the first chunk short so playback starts early
+
+SENTENCE_END = re.compile(r'(?<=[.!?…;:])\s+|\n+')
+PHRASE_END = re.compile(r'(?<=[,])\s+')
+
+def _split_long(piece, limit):
+    """Splits a piece at phrase boundaries, then at word boundaries, to fit limit."""
+    if len(piece) <= limit:
+        return [piece]
+    parts = []
+    for phrase in PHRASE_END.split(piece):
+        if len(phrase) <= limit:
+            parts.append(phrase)
+            continue
+        current = ""
+        for word in phrase.split():
+            if current and len(current) + 1 + len(word) > limit:
+                parts.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            parts.append(current)
+    # Re-pack short phrases so we don't issue a request per comma
+    packed = []
+    for part in parts:
+        if packed and len(packed[-1]) + 1 + len(part) <= limit:
+            packed[-1] = f"{packed[-1]} {part}"
+        else:
+            packed.append(part)
+    return packed
+
+def split_sentences(text, max_chars=MAX_CHUNK_CHARS, first_chunk_chars=FIRST_CHUNK_CHARS):
+    """Splits text into sentence/phrase chunks suitable for independent synthesis."""
+    chunks = []
+    for sentence in SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        limit = first_chunk_chars if not chunks else max_chars
+        pieces = _split_long(sentence, limit)
+        if len(pieces) > 1 and not chunks:
+            # Only the leading piece needs to be short; pack the rest normally
+            pieces = pieces[:1] + _split_long(" ".join(pieces[1:]), max_chars)
+        chunks.extend(pieces)
+    return chunks
+
+def synthesize_chunks(chunks, synthesize, max_workers=SYNTH_WORKERS):
+    """Synthesizes chunks concurrently and yields results in order as each is ready."""
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+    futures = [pool.submit(synthesize, chunk) for chunk in chunks]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # Drop work that is no longer needed if the consumer stops early
+        pool.shutdown(wait=False, cancel_futures=True)
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller runs fn; callers arriving while it is still running
+    wait for and share its result (or exception). Nothing is kept once the
+    call finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
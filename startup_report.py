@@ -0,0 +1,72 @@
+# startup_report.py
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# --- Report Configuration ---
+DEFAULT_MODULE = "client"
+DEFAULT_TOP = 15
+# Heavy dependencies that should only load on first use
+DEFERRED_MODULES = ["pygame", "gtts", "requests", "urllib3", "cryptography", "numpy"]
+
+def measure_imports(module):
+    """Imports module in a fresh interpreter with -X importtime and parses the breakdown."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+    return rows
+
+def build_report(module, top):
+    rows = measure_imports(module)
+    # Keep only the subtree of the requested import; the rest is interpreter startup
+    end = max(i for i, row in enumerate(rows) if row["module"] == module and row["depth"] == 0)
+    start = end
+    while start > 0 and rows[start - 1]["depth"] > 0:
+        start -= 1
+    rows = rows[start:end + 1]
+    total = rows[-1]["cumulative_us"]
+    loaded = {row["module"].split(".")[0] for row in rows}
+    return {
+        "module": module,
+        "total_ms": round(total / 1000, 1),
+        "slowest": sorted(rows, key=lambda row: row["cumulative_us"], reverse=True)[1:top + 1],
+        "eager_heavy_modules": [name for name in DEFERRED_MODULES if name in loaded]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how long the client takes to import, module by module.")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Number of slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Exit non-zero if the import takes longer")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = build_report(args.module, args.top)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"import {report['module']}: {report['total_ms']} ms")
+        print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+        for row in report["slowest"]:
+            print(f"{row['cumulative_us'] / 1000:>14.1f}{row['self_us'] / 1000:>10.1f}  {'  ' * row['depth']}{row['module']}")
+        if report["eager_heavy_modules"]:
+            print(f"warning: loaded at startup but meant to be lazy: {', '.join(report['eager_heavy_modules'])}")
+    over_budget = args.budget_ms is not None and report["total_ms"] > args.budget_ms
+    sys.exit(1 if over_budget or report["eager_heavy_modules"] else 0)
+
+if __name__ == "__main__":
+    main()
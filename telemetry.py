@@ -0,0 +1,218 @@
+# telemetry.py
+import argparse
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from tts_cache import default_state_dir
+
+logger = logging.getLogger(__name__)
+
+# --- Telemetry Configuration ---
+# Per-user, so telemetry works when the app runs from a read-only install directory
+TELEMETRY_FILE = os.path.join(default_state_dir(), "telemetry.jsonl")
+FLUSH_INTERVAL = 60
+MAX_FILE_BYTES = 2 * 1024 * 1024
+BACKUP_COUNT = 5
+# Histogram bucket upper bounds in milliseconds: 10 per decade (~26% apart), 1 ms to 10 min
+BUCKETS = [round(10 ** (i / 10), 2) for i in range(58)]
+
+class Histogram:
+    """Fixed-bucket latency histogram; cheap to update and to merge across flushes."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, data):
+        """Adds a histogram previously serialized with to_dict()."""
+        for i, count in enumerate(data["counts"]):
+            self.counts[i] += count
+        self.count += data["count"]
+        self.total += data["sum"]
+        self.min = data["min"] if self.min is None else min(self.min, data["min"])
+        self.max = data["max"] if self.max is None else max(self.max, data["max"])
+
+    def percentile(self, p):
+        """Estimates the p-th percentile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                value = low + (high - low) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {"counts": self.counts, "count": self.count, "sum": round(self.total, 3),
+                "min": self.min, "max": self.max}
+
+class Telemetry:
+    """In-process counters and latency histograms, flushed periodically as JSONL.
+
+    Each flush appends one record with the counters and histograms gathered
+    since the previous flush, then starts over. The file rotates like the
+    app's logs, so it never grows without bound.
+    """
+
+    def __init__(self, path=TELEMETRY_FILE, flush_interval=FLUSH_INTERVAL, max_bytes=MAX_FILE_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._window_started = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+        # A private logger gives us size-based rotation for free
+        self._writer = logging.getLogger(f"{__name__}.writer.{id(self)}")
+        self._writer.propagate = False
+        self._writer.setLevel(logging.INFO)
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, value_ms):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value_ms)
+
+    @contextmanager
+    def timer(self, name):
+        """Records the duration of the with-block in milliseconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def start(self):
+        """Starts the background flush thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Writes everything gathered since the last flush as one JSONL record."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+            now = time.time()
+            started, self._window_started = self._window_started, now
+        if not counters and not histograms:
+            return
+        record = {
+            "ts": round(now, 3),
+            "window_s": round(now - started, 1),
+            "counters": counters,
+            "histograms": {name: histogram.to_dict() for name, histogram in histograms.items()}
+        }
+        try:
+            if not self._writer.handlers:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=self._max_bytes,
+                                                               backupCount=self._backup_count, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._writer.addHandler(handler)
+            self._writer.info(json.dumps(record, separators=(",", ":")))
+        except Exception as e:
+            logger.warning(f"Failed to write telemetry: {e}")
+
+    def close(self):
+        """Stops the flush thread and writes the remaining data."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.flush()
+        for handler in list(self._writer.handlers):
+            handler.close()
+            self._writer.removeHandler(handler)
+
+def read_records(path, since=None):
+    """Yields records from the telemetry file and its rotated backups, oldest first."""
+    paths = [f"{path}.{i}" for i in range(BACKUP_COUNT, 0, -1)] + [path]
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or record["ts"] >= since:
+                    yield record
+
+def summarize(records):
+    """Merges records into total counters and per-metric histograms."""
+    counters = {}
+    histograms = {}
+    for record in records:
+        for name, value in record["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+        for name, data in record["histograms"].items():
+            histograms.setdefault(name, Histogram()).merge(data)
+    return counters, histograms
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize client telemetry: latency percentiles and counters.")
+    parser.add_argument("path", nargs="?", default=TELEMETRY_FILE)
+    parser.add_argument("--hours", type=float, default=None, help="Only include the last N hours")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    counters, histograms = summarize(read_records(args.path, since))
+    rows = {
+        name: {
+            "count": histogram.count,
+            "avg": round(histogram.total / histogram.count, 1),
+            "p50": round(histogram.percentile(50), 1),
+            "p90": round(histogram.percentile(90), 1),
+            "p99": round(histogram.percentile(99), 1),
+            "max": round(histogram.max, 1)
+        }
+        for name, histogram in sorted(histograms.items())
+    }
+    if args.json:
+        print(json.dumps({"counters": counters, "histograms": rows}))
+        return
+    print(f"{'metric (ms)':<24}{'count':>8}{'avg':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, row in rows.items():
+        print(f"{name:<24}{row['count']:>8}{row['avg']:>10}{row['p50']:>10}{row['p90']:>10}{row['p99']:>10}{row['max']:>10}")
+    print()
+    for name, value in sorted(counters.items()):
+        print(f"{name:<24}{value:>12}")
+
+if __name__ == "__main__":
+    main()
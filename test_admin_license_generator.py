@@ -0,0 +1,75 @@
+# test_admin_license_generator.py
+import csv
+import json
+
+import pytest
+
+from admin_license_generator import license_file_name, run_bulk
+from license_codec import LicenseCodec, generate_signing_key, public_key_for
+from license_store import LicenseStore
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return generate_signing_key()
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["machine_id", "package", "username"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_bulk_issues_valid_rows_and_reports_bad_ones(tmp_path, signing_key):
+    rows = [{"machine_id": f"machine-{index}", "package": "1M"} for index in range(6)]
+    rows[2] = {"machine_id": "machine-2", "package": "12M"}
+    rows[4] = {"machine_id": "", "package": "PERM"}
+    input_path = write_csv(tmp_path / "may.csv", rows)
+    summary = run_bulk(input_path, str(tmp_path / "out.jsonl"), None, signing_key, workers=2, batch_size=2)
+    assert (summary["issued"], summary["errors"]) == (4, 2)
+    # CSV line numbers count the header
+    assert summary["error_details"] == [{"line": 4, "error": "Gói không hợp lệ: 12M"},
+                                        {"line": 6, "error": "Thiếu machine_id"}]
+    results = read_jsonl(tmp_path / "out.jsonl")
+    assert [result["machine_id"] for result in results] == ["machine-0", "machine-1", "machine-3", "machine-5"]
+    codec = LicenseCodec(public_key=public_key_for(signing_key))
+    assert codec.decode(results[0]["license"])["machine_id"] == "machine-0"
+
+def test_invalid_jsonl_lines_are_counted(tmp_path, signing_key):
+    input_path = tmp_path / "may.jsonl"
+    input_path.write_text('{"machine_id": "a", "package": "3M"}\nnot json\n["a list"]\n', encoding="utf-8")
+    summary = run_bulk(str(input_path), str(tmp_path / "out.jsonl"), None, signing_key, workers=1)
+    assert (summary["issued"], summary["errors"]) == (1, 2)
+    assert [error["line"] for error in summary["error_details"]] == [2, 3]
+
+def test_out_dir_rejects_duplicate_machines(tmp_path, signing_key):
+    rows = [{"machine_id": "dup", "package": "1M", "username": "first"},
+            {"machine_id": "dup", "package": "3M", "username": "second"},
+            {"machine_id": "other", "package": "1M"},
+            {"machine_id": "dup", "package": "6M"}]
+    input_path = write_csv(tmp_path / "may.csv", rows)
+    out_dir = tmp_path / "licenses"
+    summary = run_bulk(input_path, None, str(out_dir), signing_key, workers=2, batch_size=2)
+    assert (summary["issued"], summary["errors"]) == (2, 2)
+    assert all(error["error"].startswith("Trùng machine_id") for error in summary["error_details"])
+    assert sorted(path.name for path in out_dir.iterdir()) == sorted([license_file_name("dup"), license_file_name("other")])
+    # Within a batch the first row wins; across batches, whichever batch finishes first
+    codec = LicenseCodec(public_key=public_key_for(signing_key))
+    issued = codec.decode((out_dir / license_file_name("dup")).read_text(encoding="ascii"))
+    assert issued["username"] != "second"
+    # Files from an earlier run are never overwritten
+    summary = run_bulk(input_path, None, str(out_dir), signing_key, workers=1)
+    assert (summary["issued"], summary["errors"]) == (0, 4)
+
+def test_store_records_licenses_and_skips_revoked(tmp_path, signing_key):
+    store = LicenseStore(str(tmp_path / "licenses.db"))
+    store.revoke("revoked")
+    input_path = write_csv(tmp_path / "may.csv", [{"machine_id": "revoked", "package": "1M"},
+                                                  {"machine_id": "fresh", "package": "PERM"}])
+    summary = run_bulk(input_path, str(tmp_path / "out.jsonl"), None, signing_key, workers=1, store=store)
+    assert summary["issued"] == 1
+    assert summary["error_details"] == [{"line": 2, "error": "License revoked"}]
+    assert store.status("fresh")["package"] == "PERM"
@@ -0,0 +1,129 @@
+# test_audio_effects.py
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_effects import (PEAK_CEILING_DBFS, STRETCH_FRAME_MS, TARGET_DBFS, AudioProcessor, db_to_gain, decode_wav,
+                           normalize_loudness, resample, time_stretch)
+
+RATE = 22050
+TONE_HZ = 220
+
+def sine(seconds=1.0, amplitude=0.5, rate=RATE, channels=1):
+    """Float samples (frames, channels) of a TONE_HZ sine."""
+    t = np.arange(int(seconds * rate)) / rate
+    wave_samples = (amplitude * np.sin(2 * np.pi * TONE_HZ * t)).astype(np.float32)
+    return np.repeat(wave_samples[:, None], channels, axis=1)
+
+def square(seconds=1.0, amplitude=0.05, channels=1):
+    """Float samples of a TONE_HZ square wave; every sample counts as active for normalize_loudness."""
+    return np.sign(sine(seconds, 1.0, RATE, channels)) * np.float32(amplitude)
+
+def to_wav(samples, rate=RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def sine_wav(seconds=1.0, amplitude=0.5, rate=RATE, channels=1):
+    return to_wav(sine(seconds, amplitude, rate, channels), rate)
+
+def dbfs(samples):
+    return 20 * np.log10(rms(samples))
+
+def rms(samples):
+    return float(np.sqrt(np.mean(np.square(samples))))
+
+def middle(samples):
+    """The central half, away from the quiet ramps at the ends of a stretch."""
+    quarter = len(samples) // 4
+    return samples[quarter:len(samples) - quarter]
+
+def tone_hz(samples, rate):
+    spectrum = np.abs(np.fft.rfft(samples[:, 0]))
+    return np.argmax(spectrum) * rate / len(samples)
+
+def test_decode_wav_reads_pcm16():
+    samples, rate = decode_wav(sine_wav(channels=2))
+    assert rate == RATE
+    assert samples.shape == (RATE, 2)
+    assert np.abs(samples).max() == pytest.approx(0.5, abs=1e-3)
+
+@pytest.mark.parametrize("rate", [16000, RATE, 44100])
+@pytest.mark.parametrize("speed", [0.5, 0.8, 1.25, 1.5, 2.0])
+def test_time_stretch_changes_length_not_pitch_or_level(speed, rate):
+    samples = sine(channels=2, rate=rate)
+    stretched = time_stretch(samples, speed, rate)
+    frame = rate * STRETCH_FRAME_MS // 1000
+    # Whole frames only: up to a frame and a hop short or long
+    assert abs(len(stretched) - len(samples) / speed) <= frame * 1.25
+    assert stretched.shape[1] == 2
+    assert tone_hz(middle(stretched), rate) == pytest.approx(TONE_HZ, abs=2)
+    # Frames are aligned, so a tone whose period doesn't divide the hop keeps its level
+    assert rms(middle(stretched)) == pytest.approx(rms(samples), rel=0.02)
+
+def test_time_stretch_keeps_unit_speed_and_short_input():
+    samples = sine()
+    assert time_stretch(samples, 1.0, RATE) is samples
+    short = sine(seconds=0.005)
+    assert len(time_stretch(short, 2.0, RATE)) > 0
+
+def test_normalize_loudness_reaches_target():
+    normalized = normalize_loudness(square(channels=2))
+    assert dbfs(normalized) == pytest.approx(TARGET_DBFS, abs=0.01)
+
+def test_normalize_loudness_respects_peak_ceiling():
+    samples = square(amplitude=0.02)
+    samples[100] = 0.9
+    normalized = normalize_loudness(samples)
+    assert np.abs(normalized).max() == pytest.approx(db_to_gain(PEAK_CEILING_DBFS), rel=1e-4)
+    assert dbfs(normalized) < TARGET_DBFS
+
+def test_normalize_loudness_leaves_silence_alone():
+    silence = np.zeros((RATE, 1), dtype=np.float32)
+    assert normalize_loudness(silence) is silence
+
+@pytest.mark.parametrize("target_rate", [8000, 16000, 44100])
+def test_resample_changes_rate_not_pitch_or_level(target_rate):
+    samples = sine(channels=2)
+    resampled = resample(samples, RATE, target_rate)
+    assert len(resampled) == round(len(samples) * target_rate / RATE)
+    assert resampled.shape[1] == 2
+    assert resampled.dtype == np.float32
+    assert tone_hz(resampled, target_rate) == pytest.approx(TONE_HZ, abs=2)
+    assert rms(resampled) == pytest.approx(rms(samples), rel=0.02)
+
+def test_resample_same_rate_is_a_no_op():
+    samples = sine()
+    assert resample(samples, RATE, RATE) is samples
+
+def test_process_without_changes_returns_input_bytes():
+    audio_data = sine_wav()
+    assert AudioProcessor().process(audio_data) is audio_data
+
+def test_process_applies_speed_and_sample_rate():
+    output = AudioProcessor().process(sine_wav(), speed=2.0, sample_rate=16000)
+    with wave.open(io.BytesIO(output), "rb") as wav:
+        assert (wav.getframerate(), wav.getsampwidth(), wav.getnchannels()) == (16000, 2, 1)
+        assert abs(wav.getnframes() - 8000) <= 16000 * 0.04
+    samples, rate = decode_wav(output)
+    assert tone_hz(middle(samples), rate) == pytest.approx(TONE_HZ, abs=5)
+
+def test_process_gain_and_normalize():
+    quiet = AudioProcessor().process(sine_wav(), gain_db=-6.0)
+    assert rms(decode_wav(quiet)[0]) == pytest.approx(rms(sine()) * db_to_gain(-6.0), rel=0.01)
+    normalized = AudioProcessor().process(to_wav(square()), normalize=True)
+    assert dbfs(decode_wav(normalized)[0]) == pytest.approx(TARGET_DBFS, abs=0.01)
+
+def test_process_rejects_bad_options():
+    with pytest.raises(ValueError):
+        AudioProcessor().process(sine_wav(), speed=3.0)
+    with pytest.raises(ValueError):
+        AudioProcessor().process(sine_wav(), fmt="flac")
+    with pytest.raises(RuntimeError):
+        AudioProcessor().process(b"ID3 not a wav", speed=1.5)
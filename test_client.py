@@ -0,0 +1,59 @@
+# test_client.py
+import importlib
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+YEAR = 365 * 86400
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """client.py imported without a display, writing client.log, cache and state to a temporary directory."""
+    workdir = tmp_path_factory.mktemp("gui")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(workdir)
+        monkeypatch.setenv("TTS_BACKEND", "offline")
+        monkeypatch.delenv("LOCALAPPDATA", raising=False)
+        monkeypatch.setenv("XDG_CACHE_HOME", str(workdir / "cache"))
+        monkeypatch.setenv("XDG_STATE_HOME", str(workdir / "state"))
+        for name in ("client", "client_core", "telemetry"):
+            sys.modules.pop(name, None)
+        module = importlib.import_module("client")
+        yield module
+        module.telemetry.close()
+        for name in ("client", "client_core", "telemetry"):
+            sys.modules.pop(name, None)
+
+def app_state(client, license_data, deadline):
+    """The attributes SmartHomeApp.is_license_active reads, with the expiry timer armed for license_data."""
+    return SimpleNamespace(license_revoked=False, license_data=license_data, license_state=client.LicenseState(),
+                           expiry_deadline=deadline, expiry_license=license_data if deadline is not None else None)
+
+def test_deadline_ignores_wall_clock(client, monkeypatch):
+    license_data = client.trial_license(60)
+    app = app_state(client, license_data, time.monotonic() + 60)
+    # Clock moved a year ahead: the monotonic deadline hasn't passed, so the license is still active
+    monkeypatch.setattr(client.time, "time", lambda: license_data["expires_at"] + YEAR)
+    assert client.SmartHomeApp.is_license_active(app)
+    # Clock set back a year after the deadline passed: still expired
+    app.expiry_deadline = time.monotonic() - 1
+    monkeypatch.setattr(client.time, "time", lambda: license_data["expires_at"] - YEAR)
+    assert not client.SmartHomeApp.is_license_active(app)
+
+def test_without_deadline_falls_back_to_expiry_date(client, monkeypatch):
+    license_data = client.trial_license(60)
+    app = app_state(client, license_data, None)
+    assert client.SmartHomeApp.is_license_active(app)
+    monkeypatch.setattr(client.time, "time", lambda: license_data["expires_at"] + 1)
+    assert not client.SmartHomeApp.is_license_active(app)
+
+def test_deadline_of_replaced_license_is_not_used(client):
+    app = app_state(client, client.trial_license(60), time.monotonic() + 60)
+    # The license file changed on disk before the timer was re-armed
+    app.license_data = client.trial_license(-60)
+    assert not client.SmartHomeApp.is_license_active(app)
+    app.license_revoked = True
+    app.license_data = app.expiry_license
+    assert not client.SmartHomeApp.is_license_active(app)
@@ -0,0 +1,185 @@
+# test_job_queue.py
+import threading
+import time
+
+import pytest
+
+from job_queue import PRIORITY_ALERT, PRIORITY_LOW, PRIORITY_NORMAL, JobScheduler
+
+FINISHED = ("done", "failed", "cancelled", "dropped")
+
+class Recorder:
+    """Handler that records the texts it runs; the "gate" job blocks its worker until released."""
+
+    def __init__(self):
+        self.ran = []
+        self.gate_started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        if job.text == "gate":
+            self.gate_started.set()
+            self.release.wait(5)
+        self.ran.append(job.text)
+
+@pytest.fixture
+def recorder():
+    recorder = Recorder()
+    yield recorder
+    recorder.release.set()
+
+def wait_finished(*jobs, timeout=5):
+    deadline = time.monotonic() + timeout
+    while any(job.state not in FINISHED for job in jobs):
+        assert time.monotonic() < deadline, f"jobs did not finish: {jobs}"
+        time.sleep(0.001)
+
+def block_worker(scheduler, recorder):
+    gate = scheduler.submit("gate", "vi")
+    assert recorder.gate_started.wait(5)
+    return gate
+
+def test_runs_by_priority_then_submission_order(recorder):
+    scheduler = JobScheduler(recorder, max_workers=1)
+    gate = block_worker(scheduler, recorder)
+    jobs = [scheduler.submit("low", "vi", PRIORITY_LOW),
+            scheduler.submit("normal 1", "vi", PRIORITY_NORMAL),
+            scheduler.submit("alert", "vi", PRIORITY_ALERT),
+            scheduler.submit("normal 2", "vi", PRIORITY_NORMAL)]
+    recorder.release.set()
+    wait_finished(gate, *jobs)
+    assert recorder.ran == ["gate", "alert", "normal 1", "normal 2", "low"]
+    assert scheduler.stats()["done"] == 5
+    scheduler.close()
+
+def test_identical_pending_texts_are_coalesced(recorder):
+    scheduler = JobScheduler(recorder, max_workers=1)
+    gate = block_worker(scheduler, recorder)
+    first = scheduler.submit("same", "vi", PRIORITY_LOW)
+    other = scheduler.submit("other", "vi", PRIORITY_NORMAL)
+    second = scheduler.submit("same", "vi", PRIORITY_ALERT)
+    assert second is first
+    assert first.coalesced == 1
+    assert first.priority == PRIORITY_ALERT
+    # Different language or effects are different audio, so not coalesced
+    assert scheduler.submit("same", "en", PRIORITY_LOW) is not first
+    assert scheduler.submit("same", "vi", PRIORITY_LOW, {"speed": 1.25}) is not first
+    recorder.release.set()
+    wait_finished(gate, first, other)
+    assert recorder.ran[:3] == ["gate", "same", "other"]
+    assert recorder.ran.count("same") == 3
+    assert scheduler.stats()["coalesced"] == 1
+    scheduler.close()
+
+def test_full_queue_evicts_newest_lower_priority_job(recorder):
+    scheduler = JobScheduler(recorder, max_workers=1, max_pending=2)
+    gate = block_worker(scheduler, recorder)
+    older = scheduler.submit("low 1", "vi", PRIORITY_LOW)
+    newer = scheduler.submit("low 2", "vi", PRIORITY_LOW)
+    normal = scheduler.submit("normal", "vi", PRIORITY_NORMAL)
+    assert newer.state == "dropped"
+    assert older.state == "pending"
+    # Nothing pending ranks below a low-priority job, so it is rejected
+    assert scheduler.submit("low 3", "vi", PRIORITY_LOW) is None
+    alert = scheduler.submit("alert", "vi", PRIORITY_ALERT)
+    assert older.state == "dropped"
+    recorder.release.set()
+    wait_finished(gate, normal, alert)
+    assert recorder.ran == ["gate", "alert", "normal"]
+    stats = scheduler.stats()
+    assert (stats["dropped"], stats["rejected"], stats["max_depth"]) == (2, 1, 2)
+    scheduler.close()
+
+def test_cancel_pending_running_and_finished_jobs(recorder):
+    scheduler = JobScheduler(recorder, max_workers=1)
+    gate = block_worker(scheduler, recorder)
+    pending = scheduler.submit("pending", "vi")
+    assert scheduler.cancel(pending)
+    assert pending.cancelled
+    assert scheduler.cancel(gate)
+    assert gate.state == "cancelled"
+    recorder.release.set()
+    later = scheduler.submit("later", "vi")
+    wait_finished(gate, later)
+    assert not scheduler.cancel(later)
+    assert "pending" not in recorder.ran
+    # A job cancelled while running stays cancelled after its handler returns
+    assert gate.state == "cancelled"
+    assert scheduler.stats()["cancelled"] == 2
+    scheduler.close()
+
+def test_cancel_all_and_close(recorder):
+    scheduler = JobScheduler(recorder, max_workers=1)
+    gate = block_worker(scheduler, recorder)
+    jobs = [scheduler.submit(f"text {index}", "vi") for index in range(3)]
+    assert scheduler.cancel_all() == 4
+    assert all(job.cancelled for job in [gate, *jobs])
+    recorder.release.set()
+    scheduler.close()
+    assert scheduler.submit("after close", "vi") is None
+
+def test_wait_turn_keeps_start_order_per_lane():
+    finish_first = threading.Event()
+    first_started = threading.Event()
+    output = []
+    scheduler = None
+
+    def handler(job):
+        if job.text == "first":
+            first_started.set()
+            finish_first.wait(5)
+        scheduler.wait_turn(job)
+        output.append(job.text)
+
+    scheduler = JobScheduler(handler, max_workers=3)
+    first = scheduler.submit("first", "vi")
+    assert first_started.wait(5)
+    second = scheduler.submit("second", "vi")
+    # Alerts have their own start order, so they never wait behind normal speech
+    alert = scheduler.submit("alert", "vi", PRIORITY_ALERT)
+    wait_finished(alert)
+    time.sleep(0.05)
+    assert output == ["alert"]
+    assert second.state == "running"
+    finish_first.set()
+    wait_finished(first, second)
+    assert output == ["alert", "first", "second"]
+    assert alert.urgent and not second.urgent
+    scheduler.close()
+
+def test_wait_turn_skips_cancelled_jobs():
+    release = threading.Event()
+    first_started = threading.Event()
+    output = []
+    scheduler = None
+
+    def handler(job):
+        if job.text == "first":
+            first_started.set()
+            release.wait(5)
+            return
+        scheduler.wait_turn(job)
+        output.append(job.text)
+
+    scheduler = JobScheduler(handler, max_workers=2)
+    first = scheduler.submit("first", "vi")
+    assert first_started.wait(5)
+    second = scheduler.submit("second", "vi")
+    time.sleep(0.05)
+    assert scheduler.cancel(second)
+    wait_finished(second)
+    release.set()
+    wait_finished(first)
+    scheduler.close()
+    assert output == ["second"]
+
+def test_failed_handler_is_counted():
+    def handler(job):
+        raise RuntimeError("backend down")
+
+    scheduler = JobScheduler(handler, max_workers=1)
+    job = scheduler.submit("text", "vi")
+    wait_finished(job)
+    assert job.state == "failed"
+    assert scheduler.stats()["failed"] == 1
+    scheduler.close()
@@ -0,0 +1,88 @@
+# test_license_codec.py
+import pytest
+from cryptography.fernet import Fernet
+
+from license_codec import (PERMANENT_LABEL, TOKEN_PREFIX, LicenseCodec, LicenseTokenError, format_epoch,
+                           generate_signing_key, public_key_for)
+
+ISSUED_AT = 1_700_000_000
+EXPIRES_AT = ISSUED_AT + 30 * 86400
+HEX_MACHINE_ID = "ab" * 32
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return generate_signing_key()
+
+@pytest.fixture(scope="module")
+def server_codec(signing_key):
+    return LicenseCodec(signing_key=signing_key, legacy_key=Fernet.generate_key())
+
+@pytest.fixture(scope="module")
+def client_codec(signing_key):
+    return LicenseCodec(public_key=public_key_for(signing_key))
+
+def test_round_trip(server_codec, client_codec):
+    token = server_codec.encode(HEX_MACHINE_ID, "1M", ISSUED_AT, EXPIRES_AT, "alice", "Pro")
+    assert token.startswith(TOKEN_PREFIX)
+    data = client_codec.decode(token)
+    assert data["machine_id"] == HEX_MACHINE_ID
+    assert data["package"] == "1M"
+    assert data["username"] == "alice"
+    assert data["voice_id"] == "Pro"
+    assert data["issued_at"] == ISSUED_AT
+    assert data["expires_at"] == EXPIRES_AT
+    assert data["expiration_date"] == format_epoch(EXPIRES_AT)
+
+def test_permanent_license(server_codec, client_codec):
+    data = client_codec.decode(server_codec.encode("machine-1", "PERM", ISSUED_AT))
+    assert data["expires_at"] is None
+    assert data["expiration_date"] == PERMANENT_LABEL
+
+@pytest.mark.parametrize("machine_id", ["AB" * 32, "zz" * 32, "short-id", "máy-1"])
+def test_machine_id_round_trips_verbatim(server_codec, client_codec, machine_id):
+    assert client_codec.decode(server_codec.encode(machine_id, "3M", ISSUED_AT, EXPIRES_AT))["machine_id"] == machine_id
+
+def test_hex_machine_id_is_packed(server_codec):
+    packed = server_codec.encode(HEX_MACHINE_ID, "1M", ISSUED_AT, EXPIRES_AT)
+    text = server_codec.encode(HEX_MACHINE_ID.upper(), "1M", ISSUED_AT, EXPIRES_AT)
+    assert len(packed) < len(text)
+
+def test_tampered_token_is_rejected(server_codec, client_codec):
+    token = server_codec.encode(HEX_MACHINE_ID, "1M", ISSUED_AT, EXPIRES_AT)
+    position = len(TOKEN_PREFIX) + 5
+    tampered = token[:position] + ("A" if token[position] != "A" else "B") + token[position + 1:]
+    with pytest.raises(LicenseTokenError):
+        client_codec.decode(tampered)
+
+def test_token_from_other_key_is_rejected(client_codec):
+    other = LicenseCodec(signing_key=generate_signing_key())
+    with pytest.raises(LicenseTokenError):
+        client_codec.decode(other.encode(HEX_MACHINE_ID, "1M", ISSUED_AT, EXPIRES_AT))
+
+@pytest.mark.parametrize("token", ["L2.", "L2.!!!", "garbage"])
+def test_malformed_token_is_rejected(client_codec, token):
+    with pytest.raises(LicenseTokenError):
+        client_codec.decode(token)
+
+def test_client_cannot_sign(client_codec):
+    with pytest.raises(LicenseTokenError):
+        client_codec.encode(HEX_MACHINE_ID, "PERM", ISSUED_AT)
+
+def test_unknown_package_is_rejected(server_codec):
+    with pytest.raises(LicenseTokenError):
+        server_codec.encode(HEX_MACHINE_ID, "12M", ISSUED_AT)
+
+def test_key_is_required():
+    with pytest.raises(ValueError):
+        LicenseCodec()
+
+def test_legacy_token_needs_legacy_key(server_codec, client_codec):
+    legacy = server_codec.encode_legacy(server_codec.decode(server_codec.encode(HEX_MACHINE_ID, "6M", ISSUED_AT, EXPIRES_AT)))
+    assert server_codec.decode(legacy)["machine_id"] == HEX_MACHINE_ID
+    with pytest.raises(LicenseTokenError):
+        client_codec.decode(legacy)
+
+def test_encode_data_re_signs_legacy_data(server_codec, client_codec):
+    legacy = server_codec.decode(server_codec.encode_legacy(server_codec.decode(server_codec.encode(HEX_MACHINE_ID, "1M", ISSUED_AT, EXPIRES_AT))))
+    data = client_codec.decode(server_codec.encode_data(legacy))
+    assert (data["machine_id"], data["package"], data["expires_at"]) == (HEX_MACHINE_ID, "1M", EXPIRES_AT)
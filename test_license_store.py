@@ -0,0 +1,89 @@
+# test_license_store.py
+import threading
+
+import pytest
+
+from license_store import LicenseStore
+
+WINDOW = 600
+
+@pytest.fixture
+def store(tmp_path):
+    return LicenseStore(str(tmp_path / "licenses.db"))
+
+class Issuer:
+    """Stand-in for the server's issue callback; numbers every token it mints."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, machine_id, package):
+        with self._lock:
+            self.calls.append((machine_id, package))
+            return f"token-{machine_id}-{package}-{len(self.calls)}", "01/01/2030 00:00:00"
+
+def test_issues_then_reuses_within_window(store):
+    issue = Issuer()
+    token, reused = store.get_or_issue("machine-a", "1M", WINDOW, issue)
+    assert not reused
+    assert store.get_or_issue("machine-a", "1M", WINDOW, issue) == (token, True)
+    assert len(issue.calls) == 1
+
+def test_reissues_outside_window_or_for_other_package(store):
+    issue = Issuer()
+    store.get_or_issue("machine-a", "1M", WINDOW, issue)
+    assert not store.get_or_issue("machine-a", "1M", -1, issue)[1]
+    assert not store.get_or_issue("machine-a", "PERM", WINDOW, issue)[1]
+    assert len(store.history("machine-a")) == 3
+
+def test_batch_keeps_order_and_deduplicates(store):
+    issue = Issuer()
+    results = store.get_or_issue_many([("a", "1M"), ("b", "3M"), ("a", "1M")], WINDOW, issue)
+    assert [reused for _, reused in results] == [False, False, True]
+    assert results[0][0] == results[2][0]
+    assert len(store.history("a")) == 1
+
+def test_revoked_machine_gets_nothing_until_unrevoked(store):
+    issue = Issuer()
+    store.get_or_issue("machine-a", "1M", WINDOW, issue)
+    store.revoke("machine-a")
+    assert store.get_or_issue("machine-a", "1M", WINDOW, issue) == (None, False)
+    assert store.get_or_issue("machine-a", "PERM", WINDOW, issue) == (None, False)
+    assert store.status("machine-a")["revoked_at"] is not None
+    assert store.unrevoke("machine-a")
+    assert not store.unrevoke("machine-a")
+    assert store.get_or_issue("machine-a", "PERM", WINDOW, issue)[0] is not None
+    assert store.status("machine-a")["revoked_at"] is None
+
+def test_revoked_never_issued_machine(store):
+    store.revoke("machine-b")
+    assert store.get_or_issue("machine-b", "1M", WINDOW, Issuer()) == (None, False)
+    assert store.status("machine-b") is None
+
+def test_concurrent_requests_store_one_license(tmp_path):
+    path = str(tmp_path / "licenses.db")
+    LicenseStore(path)
+    issue = Issuer()
+    results = []
+    barrier = threading.Barrier(8)
+
+    def activate():
+        store = LicenseStore(path)
+        barrier.wait()
+        results.append(store.get_or_issue("machine-a", "1M", WINDOW, issue))
+
+    threads = [threading.Thread(target=activate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({token for token, _ in results}) == 1
+    assert len(LicenseStore(path).history("machine-a")) == 1
+
+def test_recorded_licenses_show_in_status(store):
+    store.record_many([("machine-a", "6M", "token-a", "01/01/2030 00:00:00", 1_700_000_000.0),
+                       ("machine-b", "PERM", "token-b", None, 1_700_000_000.0)])
+    assert store.status("machine-a")["package"] == "6M"
+    store.revoke("machine-b")
+    assert store.revoked_among(["machine-a", "machine-b", "machine-c"]) == {"machine-b"}
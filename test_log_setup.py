@@ -0,0 +1,90 @@
+# test_log_setup.py
+import json
+import logging
+
+import pytest
+from cryptography.fernet import Fernet
+
+from license_codec import LicenseCodec, generate_signing_key, make_license_data
+from log_setup import REDACTED, setup_logging, stop_logging
+
+ISSUED_AT = 1_700_000_000
+
+@pytest.fixture(scope="module")
+def secrets():
+    """Real keys and tokens of every kind the server handles (legacy tokens are base64-wrapped Fernet)."""
+    fernet_key = Fernet.generate_key().decode()
+    signing_key = generate_signing_key()
+    codec = LicenseCodec(signing_key=signing_key, legacy_key=fernet_key)
+    return {
+        "fernet_key": fernet_key,
+        "signing_key": signing_key,
+        "signed": codec.encode("machine-1", "1M", ISSUED_AT),
+        "legacy": codec.encode_legacy(make_license_data("machine-1", "1M", ISSUED_AT)),
+        "fernet": Fernet(fernet_key).encrypt(b"payload").decode()
+    }
+
+@pytest.fixture
+def log_file(tmp_path, secrets):
+    """Routes logging through setup_logging for one test, then puts the root logger back."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    path = tmp_path / "server.log"
+    queue_handler = setup_logging(str(path), secrets=[secrets["fernet_key"], secrets["signing_key"]])
+    yield path
+    stop_logging()
+    root.removeHandler(queue_handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def read_entries(path):
+    stop_logging()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def assert_clean(path, secrets):
+    text = path.read_text(encoding="utf-8")
+    for name, value in secrets.items():
+        assert value not in text, f"{name} leaked into the log"
+
+def test_messages_and_args_are_redacted(log_file, secrets):
+    logger = logging.getLogger("test.messages")
+    logger.info(f"Issued {secrets['signed']} and {secrets['legacy']}")
+    logger.info("Fernet %s", secrets["fernet"])
+    logger.warning("Keys %s / %s", secrets["fernet_key"], secrets["signing_key"])
+    entries = read_entries(log_file)
+    assert len(entries) == 3
+    assert all(REDACTED in entry["msg"] for entry in entries)
+    assert entries[0]["msg"] == f"Issued {REDACTED} and {REDACTED}"
+    assert_clean(log_file, secrets)
+
+def test_extra_fields_are_redacted(log_file, secrets):
+    logging.getLogger("test.extra").info("License issued", extra={
+        "license": secrets["signed"],
+        "fernet_key": secrets["fernet_key"],
+        "Authorization": f"Bearer {secrets['legacy']}",
+        "note": f"renewed from {secrets['legacy']}",
+        "detail": f"token={secrets['fernet']} key={secrets['signing_key']}",
+        "machine_id": "machine-1"
+    })
+    (entry,) = read_entries(log_file)
+    assert entry["license"] == entry["fernet_key"] == entry["Authorization"] == REDACTED
+    assert entry["note"] == f"renewed from {REDACTED}"
+    assert entry["machine_id"] == "machine-1"
+    assert_clean(log_file, secrets)
+
+def test_tracebacks_are_redacted(log_file, secrets):
+    logger = logging.getLogger("test.exc")
+    try:
+        raise ValueError(f"bad token {secrets['signed']} for key {secrets['fernet_key']}")
+    except ValueError:
+        logger.exception("Decode failed")
+    record = logging.makeLogRecord({"name": "test.exc", "levelno": logging.ERROR, "levelname": "ERROR",
+                                    "msg": "Precomputed traceback",
+                                    "exc_text": f"Traceback ...\nValueError: {secrets['legacy']} {secrets['signing_key']}"})
+    logger.handle(record)
+    entries = read_entries(log_file)
+    assert [entry["msg"] for entry in entries] == ["Decode failed", "Precomputed traceback"]
+    assert "ValueError: bad token" in entries[0]["exc"]
+    assert all(REDACTED in entry["exc"] for entry in entries)
+    assert_clean(log_file, secrets)
@@ -0,0 +1,68 @@
+# test_ratelimit_storage.py
+import threading
+
+import pytest
+from limits import RateLimitItemPerMinute
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+from ratelimit_storage import SQLiteStorage
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'ratelimits.db'}"
+
+@pytest.fixture
+def storage(uri):
+    return SQLiteStorage(uri)
+
+def test_absolute_uri_keeps_leading_slash(tmp_path):
+    assert SQLiteStorage(f"sqlite:///{tmp_path / 'a.db'}").path == str(tmp_path / "a.db")
+
+@pytest.mark.parametrize("strategy", [FixedWindowRateLimiter, SlidingWindowCounterRateLimiter])
+def test_limit_is_enforced(storage, strategy):
+    limiter = strategy(storage)
+    limit = RateLimitItemPerMinute(5)
+    assert all(limiter.hit(limit, "client") for _ in range(5))
+    assert not limiter.hit(limit, "client")
+    assert limiter.hit(limit, "other-client")
+
+def test_counters_are_shared_between_instances(uri):
+    limit = RateLimitItemPerMinute(3)
+    first = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    second = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    assert first.hit(limit, "client") and second.hit(limit, "client") and first.hit(limit, "client")
+    assert not second.hit(limit, "client")
+
+def test_concurrent_hits_never_overshoot(uri):
+    limit = RateLimitItemPerMinute(20)
+    allowed = []
+    barrier = threading.Barrier(8)
+
+    def hammer():
+        limiter = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+        barrier.wait()
+        for _ in range(10):
+            allowed.append(limiter.hit(limit, "client"))
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(allowed) == 20
+
+def test_clear_and_reset(storage):
+    limiter = FixedWindowRateLimiter(storage)
+    limit = RateLimitItemPerMinute(1)
+    limiter.hit(limit, "client")
+    assert not limiter.hit(limit, "client")
+    limiter.clear(limit, "client")
+    assert limiter.hit(limit, "client")
+    assert storage.reset() >= 1
+    assert storage.check()
+
+def test_rejections_are_counted(storage):
+    storage.record_rejection("a")
+    storage.record_rejection("b")
+    storage.record_rejection("b")
+    assert list(storage.rejection_counts().items()) == [("b", 2), ("a", 1)]
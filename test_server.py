@@ -0,0 +1,109 @@
+# test_server.py
+import importlib
+import logging
+import sys
+
+import pytest
+from cryptography.fernet import Fernet
+
+from license_codec import TOKEN_PREFIX, LicenseCodec, generate_signing_key, public_key_for
+from log_setup import RecordQueueHandler
+
+MACHINE_ID = "ab" * 32
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """The server module configured with throwaway keys and a fresh license database."""
+    workdir = tmp_path_factory.mktemp("server")
+    signing_key = generate_signing_key()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+        monkeypatch.setenv("LICENSE_SIGNING_KEY", signing_key)
+        monkeypatch.setenv("LICENSE_DB", str(workdir / "licenses.db"))
+        monkeypatch.setenv("LOG_FILE", str(workdir / "server.log"))
+        monkeypatch.setenv("RATELIMIT_ENABLED", "false")
+        monkeypatch.setenv("RATELIMIT_STORAGE_URI", "memory://")
+        sys.modules.pop("server", None)
+        module = importlib.import_module("server")
+        module.client_codec = LicenseCodec(public_key=public_key_for(signing_key))
+        yield module
+        sys.modules.pop("server", None)
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+def activate(client, machine_id=MACHINE_ID, package="1M", **extra):
+    return client.post("/activate", json={"machine_id": machine_id, "package": package, **extra})
+
+def test_activate_returns_signed_token(server, client):
+    response = activate(client, token_format="v2")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["license"].startswith(TOKEN_PREFIX)
+    data = server.client_codec.decode(body["license"])
+    assert (data["machine_id"], data["package"]) == (MACHINE_ID, "1M")
+
+def test_repeat_activation_reuses_license(client):
+    machine_id = "cd" * 32
+    first = activate(client, machine_id, token_format="v2").get_json()
+    second = activate(client, machine_id, token_format="v2").get_json()
+    assert not first["reused"]
+    assert second["reused"]
+    assert second["license"] == first["license"]
+
+def test_old_clients_get_legacy_tokens(server, client):
+    token = activate(client, "ef" * 32, "PERM").get_json()["license"]
+    assert not token.startswith(TOKEN_PREFIX)
+    assert server.codec.decode_legacy(token)["package"] == "PERM"
+
+@pytest.mark.parametrize("payload", [{"machine_id": "short", "package": "1M"},
+                                     {"machine_id": MACHINE_ID, "package": "12M"},
+                                     {"package": "1M"}])
+def test_activate_rejects_invalid_requests(client, payload):
+    assert client.post("/activate", json=payload).status_code == 400
+
+def test_batch_activation(client):
+    items = [{"machine_id": f"{index:064x}", "package": "3M"} for index in range(3)] + [{"machine_id": "bad"}]
+    body = client.post("/activate/batch", json={"items": items, "token_format": "v2"}).get_json()
+    assert (body["issued"], body["failed"]) == (3, 1)
+    assert "error" in body["results"][3]
+
+def test_batch_size_limit(server, client):
+    items = [{"machine_id": MACHINE_ID, "package": "1M"}] * (server.MAX_BATCH_SIZE + 1)
+    assert client.post("/activate/batch", json={"items": items}).status_code == 413
+
+def test_status_etag_and_not_modified(client):
+    machine_id = "12" * 32
+    activate(client, machine_id, token_format="v2")
+    response = client.get(f"/status/{machine_id}")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "active"
+    etag = response.headers["ETag"]
+    assert client.get(f"/status/{machine_id}", headers={"If-None-Match": etag}).status_code == 304
+
+def test_status_unknown_machine(client):
+    assert client.get(f"/status/{'99' * 32}").status_code == 404
+
+def test_revoked_machine_is_refused(server, client):
+    machine_id = "34" * 32
+    activate(client, machine_id, token_format="v2")
+    etag = client.get(f"/status/{machine_id}").headers["ETag"]
+    server.license_store.revoke(machine_id)
+    try:
+        response = activate(client, machine_id, token_format="v2")
+        assert response.status_code == 403
+        assert response.get_json()["error"] == "License revoked"
+        body = client.post("/activate/batch", json={"items": [{"machine_id": machine_id, "package": "1M"}]}).get_json()
+        assert body["failed"] == 1
+        # The state changed, so a client holding the old ETag gets the new answer
+        status = client.get(f"/status/{machine_id}", headers={"If-None-Match": etag})
+        assert status.status_code == 200
+        assert status.get_json()["status"] == "revoked"
+    finally:
+        server.license_store.unrevoke(machine_id)
+    assert activate(client, machine_id, token_format="v2").status_code == 200
+    assert client.get(f"/status/{machine_id}").get_json()["status"] == "active"
+
+def test_import_leaves_logging_alone(server):
+    assert not any(isinstance(handler, RecordQueueHandler) for handler in logging.getLogger().handlers)
@@ -0,0 +1,99 @@
+# test_speculation.py
+import threading
+import time
+
+import pytest
+
+from speculation import Speculator, completed_chunks
+from speech_pipeline import split_sentences
+
+class Backend:
+    """Synthesizer stub that blocks until released, so tests control what is running."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, text, lang):
+        with self._lock:
+            self.calls.append(text)
+        self.release.wait(5)
+        return b"audio"
+
+@pytest.fixture
+def backend():
+    backend = Backend()
+    yield backend
+    backend.release.set()
+
+def wait_idle(speculator):
+    speculator._pool.submit(lambda: None).result(5)
+
+def test_completed_chunks_drop_unfinished_sentence():
+    assert completed_chunks("Đèn đã bật. Cửa đang") == ["Đèn đã bật."]
+    assert completed_chunks("Chưa xong") == []
+
+def test_completed_chunks_are_a_prefix_of_the_final_split():
+    draft = "Nhiệt độ là 26 độ. Độ ẩm 60%! Cửa garage"
+    final = split_sentences(draft + " đang mở.")
+    assert final[:len(completed_chunks(draft))] == completed_chunks(draft)
+
+def test_update_synthesizes_new_chunks_once(backend):
+    backend.release.set()
+    speculator = Speculator(backend, max_workers=1)
+    speculator.update(["Một.", "Hai."], "vi")
+    speculator.update(["Một.", "Hai."], "vi")
+    wait_idle(speculator)
+    assert sorted(backend.calls) == ["Hai.", "Một."]
+    assert speculator.stats()["submitted"] == 2
+    speculator.close()
+
+def test_claim_counts_useful_and_wasted(backend):
+    backend.release.set()
+    speculator = Speculator(backend, max_workers=1)
+    speculator.update(["Một.", "Hai."], "vi")
+    wait_idle(speculator)
+    speculator.claim(["Một."], "vi")
+    stats = speculator.stats()
+    assert (stats["useful"], stats["wasted"], stats["pending"], stats["spent_chars"]) == (1, 1, 0, 0)
+    speculator.close()
+
+def test_edited_chunks_are_cancelled_before_they_start(backend):
+    speculator = Speculator(backend, max_workers=1)
+    speculator.update(["Một.", "Hai."], "vi")
+    # "Một." occupies the only worker, so "Hai." is still queued when edited away
+    while not backend.calls:
+        time.sleep(0.001)
+    speculator.update(["Một."], "vi")
+    assert speculator.stats()["cancelled"] == 1
+    backend.release.set()
+    wait_idle(speculator)
+    speculator.close()
+    assert backend.calls == ["Một."]
+
+def test_budget_limits_speculation(backend):
+    backend.release.set()
+    speculator = Speculator(backend, max_workers=1, budget_chars=10)
+    speculator.update(["Câu một.", "Câu hai."], "vi")
+    stats = speculator.stats()
+    assert (stats["submitted"], stats["over_budget"]) == (1, 1)
+    speculator.close()
+
+def test_needed_skips_cached_chunks(backend):
+    backend.release.set()
+    speculator = Speculator(backend, needed=lambda text, lang: text != "Một.", max_workers=1)
+    speculator.update(["Một.", "Hai."], "vi")
+    wait_idle(speculator)
+    assert backend.calls == ["Hai."]
+    speculator.close()
+
+def test_record_receives_counters(backend):
+    backend.release.set()
+    recorded = []
+    speculator = Speculator(backend, record=lambda name, amount: recorded.append(name), max_workers=1)
+    speculator.update(["Một."], "vi")
+    wait_idle(speculator)
+    speculator.claim(["Một."], "vi")
+    assert recorded == ["speculative_submitted", "speculative_useful"]
+    speculator.close()
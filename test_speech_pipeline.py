@@ -0,0 +1,90 @@
+# test_speech_pipeline.py
+import threading
+import time
+
+import pytest
+
+from speech_pipeline import FIRST_CHUNK_CHARS, MAX_CHUNK_CHARS, SingleFlight, split_sentences, synthesize_chunks
+
+def test_splits_at_sentence_ends():
+    assert split_sentences("Đèn đã bật. Cửa đang mở!  Bạn có muốn đóng không?\nXong") == [
+        "Đèn đã bật.", "Cửa đang mở!", "Bạn có muốn đóng không?", "Xong"]
+
+def test_blank_text_has_no_chunks():
+    assert split_sentences("  \n\n ") == []
+
+def test_long_sentences_fit_their_limits():
+    words = " ".join(f"từ{index}," for index in range(200))
+    chunks = split_sentences(words)
+    assert len(chunks[0]) <= FIRST_CHUNK_CHARS
+    assert all(len(chunk) <= MAX_CHUNK_CHARS for chunk in chunks)
+    assert " ".join(chunks).split() == words.split()
+
+def test_only_first_chunk_is_short():
+    sentence = " ".join(["chữ"] * 100)
+    chunks = split_sentences(f"{sentence}. {sentence}.")
+    assert len(chunks[0]) <= FIRST_CHUNK_CHARS
+    assert max(len(chunk) for chunk in chunks[1:]) > FIRST_CHUNK_CHARS
+
+def test_results_come_back_in_order():
+    release = {chunk: threading.Event() for chunk in "abc"}
+
+    def synthesize(chunk):
+        release[chunk].wait(5)
+        return chunk.upper()
+
+    # The last chunk finishes first; results are still yielded in order
+    release["c"].set()
+    results = synthesize_chunks(list("abc"), synthesize)
+    release["a"].set()
+    release["b"].set()
+    assert list(results) == ["A", "B", "C"]
+
+def test_errors_reach_the_consumer():
+    def synthesize(chunk):
+        if chunk == "b":
+            raise RuntimeError("backend down")
+        return chunk
+
+    results = synthesize_chunks(["a", "b", "c"], synthesize)
+    assert next(results) == "a"
+    with pytest.raises(RuntimeError):
+        next(results)
+
+def test_single_flight_collapses_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def synthesize():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"audio"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", synthesize)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", synthesize))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while flight.collapsed < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert results == [b"audio"] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+def test_single_flight_shares_errors_and_forgets_results():
+    def fail():
+        raise ValueError("bad")
+
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 42) == 42
+    assert flight.in_flight() == 0
@@ -0,0 +1,63 @@
+# test_tts_cache.py
+import os
+import unicodedata
+
+import pytest
+
+from tts_cache import AudioCache, make_cache_key
+
+@pytest.fixture(params=["disk", "memory"])
+def cache(request, tmp_path):
+    return AudioCache(str(tmp_path) if request.param == "disk" else None, max_bytes=1000, extension=".wav")
+
+def test_key_ignores_whitespace_and_unicode_form():
+    composed = make_cache_key("Xin  chào\n", "vi")
+    decomposed = make_cache_key("Xin chào", "vi")
+    assert composed == decomposed
+    assert composed != make_cache_key("Xin chào", "en")
+    assert composed != make_cache_key("Xin chào", "vi", slow=True)
+
+def test_put_get_and_counters(cache):
+    assert cache.get("a") is None
+    cache.put("a", b"x" * 100)
+    assert cache.get("a") == b"x" * 100
+    assert "a" in cache
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 100)
+
+def test_evicts_least_recently_used(cache):
+    for key in "abc":
+        cache.put(key, key.encode() * 400)
+    assert "a" not in cache
+    cache.get("b")
+    cache.put("d", b"d" * 400)
+    assert "b" in cache and "c" not in cache
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] <= 1000
+
+def test_keeps_oversized_newest_entry(cache):
+    cache.put("big", b"x" * 5000)
+    assert cache.get("big") == b"x" * 5000
+
+def test_replacing_entry_updates_size(cache):
+    cache.put("a", b"x" * 100)
+    cache.put("a", b"y" * 50)
+    assert cache.get("a") == b"y" * 50
+    assert cache.stats()["bytes"] == 50
+
+def test_index_survives_restart(tmp_path):
+    AudioCache(str(tmp_path), extension=".wav").put("a", b"audio")
+    (tmp_path / "leftover.tmp").write_bytes(b"partial")
+    (tmp_path / "empty.wav").write_bytes(b"")
+    cache = AudioCache(str(tmp_path), extension=".wav")
+    assert cache.get("a") == b"audio"
+    assert "empty" not in cache
+    assert not (tmp_path / "leftover.tmp").exists()
+
+def test_missing_file_counts_as_miss(tmp_path):
+    cache = AudioCache(str(tmp_path), extension=".wav")
+    cache.put("a", b"audio")
+    os.remove(cache.path_for("a"))
+    assert cache.get("a") is None
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 0
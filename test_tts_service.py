@@ -0,0 +1,156 @@
+# test_tts_service.py
+import http.client
+import importlib
+import io
+import json
+import socket
+import struct
+import sys
+import threading
+import wave
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from tts_service import WAV_STREAM_SIZE, TTSService, TTSServiceHandler, wav_pcm
+
+TEMPLATED = "The kitchen lights are on."
+MIXER_FORMAT = (2, 2, 44100)  # channels, sample width, sample rate of the splicer's output
+TOKEN = "hub-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+def make_wav(channels, sample_width, sample_rate, frames=441):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x01" * frames * channels * sample_width)
+    return buffer.getvalue()
+
+class TemplateRenderer:
+    """Stands in for PhraseRenderer: answers one sentence with WAV in the mixer's format."""
+
+    def render(self, text, lang):
+        return make_wav(*MIXER_FORMAT) if text == TEMPLATED else None
+
+@pytest.fixture(scope="module")
+def client_core(tmp_path_factory):
+    """client_core on the offline backend, with its cache and state in a temporary directory."""
+    workdir = tmp_path_factory.mktemp("client")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("TTS_BACKEND", "offline")
+        monkeypatch.delenv("LOCALAPPDATA", raising=False)
+        monkeypatch.setenv("XDG_CACHE_HOME", str(workdir / "cache"))
+        monkeypatch.setenv("XDG_STATE_HOME", str(workdir / "state"))
+        for name in ("client_core", "telemetry"):
+            sys.modules.pop(name, None)
+        module = importlib.import_module("client_core")
+        monkeypatch.setattr(module, "get_phrase_renderer", lambda: TemplateRenderer())
+        yield module
+        module.telemetry.close()
+        for name in ("client_core", "telemetry"):
+            sys.modules.pop(name, None)
+
+@pytest.fixture
+def service_url(client_core, monkeypatch):
+    service = TTSService(client_core, token=TOKEN, play=False)
+    monkeypatch.setattr(service, "license_active", lambda: True)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TTSServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+    service.scheduler.close()
+
+def request(address, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json", **(headers or {})})
+    response = connection.getresponse()
+    return response, response.read()
+
+def post(address, path, body, headers=AUTH):
+    return request(address, "POST", path, body, headers)
+
+def raw_post(address, path, body):
+    """Returns (response head, HTTP chunks, whether the terminating chunk arrived) without decoding the framing."""
+    body = body.encode("utf-8")
+    head = (f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nAuthorization: {AUTH['Authorization']}\r\nConnection: close\r\n\r\n")
+    with socket.create_connection(address, timeout=10) as sock:
+        sock.sendall(head.encode("ascii") + body)
+        data = b""
+        while received := sock.recv(65536):
+            data += received
+    head, rest = data.split(b"\r\n\r\n", 1)
+    chunks = []
+    while b"\r\n" in rest:
+        size_line, rest = rest.split(b"\r\n", 1)
+        size = int(size_line, 16)
+        if size == 0:
+            return head.decode("latin-1"), chunks, rest == b"\r\n"
+        assert rest[size:size + 2] == b"\r\n"
+        chunks.append(rest[:size])
+        rest = rest[size + 2:]
+    return head.decode("latin-1"), chunks, False
+
+def test_templates_only_serve_playback(client_core):
+    played = client_core.synthesize_chunk(TEMPLATED, "en", for_playback=True)
+    returned = client_core.synthesize_chunk(TEMPLATED, "en")
+    assert wav_format(played) == MIXER_FORMAT
+    assert wav_format(returned) == wav_format(client_core.tts_backend.synthesize("Dinner is ready.", "en"))
+
+def test_stream_mixing_templated_and_plain_sentences(client_core, service_url):
+    response, body = post(service_url, "/synthesize", f'{{"text": "{TEMPLATED} Dinner is ready.", "lang": "en"}}')
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "audio/wav"
+    backend_format = wav_format(client_core.tts_backend.synthesize("Dinner is ready.", "en"))
+    # One header for the whole stream, whichever source each sentence came from
+    assert wav_format(body) == backend_format
+    assert body.count(b"RIFF") == 1
+
+def test_stream_sends_one_chunk_per_sentence_after_one_header(client_core, service_url):
+    text = "Dinner is ready. The door is open! Shall I close it?"
+    sentences = client_core.split_sentences(text)
+    head, chunks, terminated = raw_post(service_url, "/synthesize", f'{{"text": "{text}", "lang": "en"}}')
+    assert head.startswith("HTTP/1.1 200")
+    assert "Transfer-Encoding: chunked" in head
+    assert terminated
+    assert len(chunks) == len(sentences) == 3
+    # The first chunk carries the only header, with the unknown-length sizes; the rest are raw PCM
+    assert chunks[0][:4] == b"RIFF" and struct.unpack("<I", chunks[0][4:8])[0] == WAV_STREAM_SIZE
+    assert struct.unpack("<I", chunks[0][40:44])[0] == WAV_STREAM_SIZE
+    assert not any(b"RIFF" in chunk for chunk in chunks[1:])
+    pcm = [wav_pcm(client_core.synthesize_chunk(sentence, "en"))[1] for sentence in sentences]
+    assert chunks[0][44:] == pcm[0]
+    assert chunks[1:] == pcm[1:]
+    with wave.open(io.BytesIO(b"".join(chunks)), "rb") as wav:
+        assert wav.readframes(len(b"".join(pcm))) == b"".join(pcm)
+
+def test_mixed_chunk_formats_end_the_stream_unterminated(client_core, service_url, monkeypatch):
+    def synthesize_chunk(text, lang, effects=None):
+        return make_wav(1, 2, 16000) if text.startswith("First") else make_wav(1, 2, 22050)
+
+    monkeypatch.setattr(client_core, "synthesize_chunk", synthesize_chunk)
+    head, chunks, terminated = raw_post(service_url, "/synthesize", '{"text": "First one. Second one.", "lang": "en"}')
+    assert head.startswith("HTTP/1.1 200")
+    # Headers were already sent, so the only way to report the failure is a stream without its last chunk
+    assert len(chunks) == 1 and chunks[0][:4] == b"RIFF"
+    assert not terminated
+
+def test_token_guards_everything_but_health(service_url):
+    assert request(service_url, "GET", "/health")[0].status == 200
+    assert request(service_url, "GET", "/status")[0].status == 401
+    assert request(service_url, "GET", "/status", headers={"Authorization": "Bearer wrong"})[0].status == 401
+    response, body = request(service_url, "GET", "/status", headers=AUTH)
+    assert response.status == 200
+    assert {"license_active", "queue", "cache"} <= set(json.loads(body))
+    assert post(service_url, "/synthesize", '{"text": "Hi.", "lang": "en"}', headers={})[0].status == 401
+    assert post(service_url, "/stop", "{}")[0].status == 200
+
+def wav_format(audio_data):
+    with wave.open(io.BytesIO(audio_data), "rb") as wav:
+        return wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
@@ -0,0 +1,140 @@
+# tts_backends.py
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import threading
+import time
+import wave
+
+logger = logging.getLogger(__name__)
+
+# --- Backend Configuration ---
+DEFAULT_BACKEND = "gtts"
+MOCK_TTS_URL = os.getenv("MOCK_TTS_URL", "http://127.0.0.1:5001/synthesize")
+MOCK_TTS_TIMEOUT = 30
+CHARS_PER_SECOND = 14  # Rough speaking rate of gTTS voices
+
+class TTSBackend:
+    """Base class for speech synthesizers; subclasses implement _synthesize."""
+    name = "base"
+    extension = ".mp3"
+    remote = False  # True if audio is fetched over the network
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self._lock = threading.Lock()
+
+    def _synthesize(self, text, lang, slow):
+        raise NotImplementedError
+
+    def synthesize(self, text, lang, slow=False):
+        """Returns encoded audio bytes for text and records the call latency."""
+        started = time.perf_counter()
+        try:
+            data = self._synthesize(text, lang, slow)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.last_latency = latency
+        logger.debug(f"{self.name} synthesized {len(text)} chars into {len(data)} bytes in {latency * 1000:.1f} ms")
+        return data
+
+    def stats(self):
+        """Returns call counters and latency figures in milliseconds."""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else None,
+                "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None
+            }
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS through the gTTS library (requires internet)."""
+    name = "gtts"
+    extension = ".mp3"
+    remote = True
+
+    def _synthesize(self, text, lang, slow):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class OfflineBackend(TTSBackend):
+    """Deterministic local synthesizer producing tone sequences as WAV.
+
+    The same text always yields the same bytes and the audio length follows
+    the speaking rate of gTTS, so it stands in for real speech in tests and
+    benchmarks without any network access.
+    """
+    name = "offline"
+    extension = ".wav"
+
+    def __init__(self, sample_rate=8000, chars_per_second=CHARS_PER_SECOND):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.chars_per_second = chars_per_second
+
+    def _synthesize(self, text, lang, slow):
+        rate = self.chars_per_second / (2 if slow else 1)
+        frames = bytearray()
+        for word in text.split():
+            digest = hashlib.sha256(f"{lang}:{word}".encode("utf-8")).digest()
+            frequency = 220 + digest[0] * 2  # 220-730 Hz
+            samples = int(self.sample_rate * (len(word) + 1) / rate)
+            step = 2 * math.pi * frequency / self.sample_rate
+            fade = max(1, samples // 10)
+            for i in range(samples):
+                envelope = min(1.0, i / fade, (samples - i) / fade)
+                frames.append(128 + int(80 * envelope * math.sin(step * i)))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(1)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(bytes(frames))
+        return buffer.getvalue()
+
+class HTTPBackend(TTSBackend):
+    """Client for mock_tts_server.py, a local stand-in for the gTTS service."""
+    name = "mock"
+    extension = ".wav"
+    remote = True
+
+    def __init__(self, url=MOCK_TTS_URL, timeout=MOCK_TTS_TIMEOUT):
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+
+    def _synthesize(self, text, lang, slow):
+        import urllib.request
+        body = json.dumps({"text": text, "lang": lang, "slow": slow}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return response.read()
+
+BACKENDS = {
+    "gtts": GTTSBackend,
+    "offline": OfflineBackend,
+    "mock": HTTPBackend
+}
+
+def get_backend(name=None, **options):
+    """Creates the backend selected by name or the TTS_BACKEND environment variable."""
+    name = name or os.getenv("TTS_BACKEND", DEFAULT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
@@ -0,0 +1,190 @@
+# tts_cache.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- Cache Configuration ---
+def default_cache_dir():
+    """Returns a per-user cache directory, independent of the install directory."""
+    base = os.getenv("LOCALAPPDATA") or os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "smarthome_tts")
+
+def default_state_dir():
+    """Returns a per-user directory for small state files, independent of the install directory."""
+    base = os.getenv("LOCALAPPDATA") or os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "smarthome_tts")
+
+CACHE_DIR = default_cache_dir()
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_EXTENSION = ".mp3"
+
+def normalize_text(text):
+    """Normalizes text so equivalent inputs share one cache entry."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+def make_cache_key(text, lang, slow=False):
+    """Builds a content-addressed key from normalized text, language and speed."""
+    payload = f"{lang}\x00{int(bool(slow))}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AudioCache:
+    """Audio cache with a size cap and LRU eviction.
+
+    Entries persist on disk when cache_dir is writable; otherwise (or when
+    cache_dir is None) the cache keeps them in memory only.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, extension=CACHE_EXTENSION):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._memory = {}  # key -> bytes, used when the cache is not persistent
+        self._lock = threading.Lock()
+        self.persistent = False
+        if cache_dir is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self.persistent = os.access(self.cache_dir, os.W_OK)
+            except OSError as e:
+                logger.warning(f"Audio cache directory unavailable: {e}")
+        if self.persistent:
+            self._load_index()
+        else:
+            logger.info("Audio cache running in memory only")
+
+    def _load_index(self):
+        """Rebuilds the LRU index from the files already on disk."""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # Leftover from an interrupted write
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(self.extension):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not stat.st_size:
+                # Writes are not fsynced, so a crash can leave an empty entry behind
+                continue
+            found.append((stat.st_mtime, name[:-len(self.extension)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+        logger.info(f"Audio cache loaded: {len(self._entries)} entries, {self._total_bytes} bytes")
+
+    def path_for(self, key):
+        """Returns the on-disk path of a cache entry."""
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def __contains__(self, key):
+        """Checks for an entry without reading it or counting a lookup."""
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """Returns cached audio bytes and marks the entry recently used, or None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if not self.persistent:
+                self.hits += 1
+                return self._memory[key]
+        # The file is read outside the lock so one slow disk read doesn't stall every lookup
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Persist recency across restarts via mtime
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                # Evicted meanwhile, or removed behind our back; unless a put() rewrote it, forget it
+                if key in self._entries and not os.path.exists(path):
+                    self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Stores audio bytes under key, atomically replacing any on-disk entry."""
+        if self.persistent:
+            try:
+                self._write_atomic(self.path_for(key), data)
+            except OSError as e:
+                logger.warning(f"Could not write cache entry {key}: {e}")
+                return
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            if not self.persistent:
+                self._memory[key] = data
+            self._evict()
+
+    def _write_atomic(self, path, data):
+        """Writes to a temp file and renames it so readers never see partial audio."""
+        # No fsync: entries can always be re-synthesized, so durability isn't worth the latency
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self):
+        """Drops least recently used entries until the cache fits its size cap."""
+        # Always keep the newest entry, even if it alone exceeds the cap
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            if not self.persistent:
+                del self._memory[key]
+                continue
+            try:
+                os.remove(self.path_for(key))
+            except OSError as e:
+                logger.warning(f"Could not evict cache entry {key}: {e}")
+
+    def stats(self):
+        """Returns hit/miss counters and current cache usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "persistent": self.persistent
+            }
@@ -0,0 +1,100 @@
+# tts_loadtest.py
+import argparse
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from loadtest import _session, percentile
+
+# --- Load Test Defaults ---
+DEFAULT_URL = "http://127.0.0.1:5002"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DISTINCT = 10
+PHRASES = [
+    "Đèn phòng khách đã bật. Nhiệt độ hiện tại là {i} độ.",
+    "Cửa garage đang mở. Bạn có muốn đóng lại không? Mã {i}.",
+    "Máy giặt sẽ xong sau {i} phút nữa."
+]
+
+def make_texts(distinct):
+    """Returns distinct announcement texts, tagged with a run id so the service's audio cache starts cold."""
+    run_id = uuid.uuid4().hex[:6]
+    return [f"{PHRASES[i % len(PHRASES)].format(i=i)} {run_id}" for i in range(distinct)]
+
+def synthesize_once(url, text, token, concurrency):
+    """Streams one /synthesize response; returns (status, time to first byte, total time, bytes)."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    try:
+        with _session(concurrency).post(f"{url}/synthesize", json={"text": text}, headers=headers, stream=True, timeout=30) as response:
+            status = response.status_code
+            for block in response.iter_content(chunk_size=None):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(block)
+    except requests.exceptions.RequestException as e:
+        status = type(e).__name__
+    return status, first_byte, time.perf_counter() - started, size
+
+def run(url, total, concurrency, distinct, token):
+    """Fires total streamed requests cycling over distinct texts and summarizes the results."""
+    texts = make_texts(distinct)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    before = requests.get(f"{url}/status", headers=headers, timeout=5).json()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: synthesize_once(url, texts[i % distinct], token, concurrency), range(total)))
+    elapsed = time.perf_counter() - started
+    after = requests.get(f"{url}/status", headers=headers, timeout=5).json()
+    ok = [result for result in results if result[0] == 200 and result[1] is not None]
+    first_bytes = sorted(result[1] for result in ok)
+    totals = sorted(result[2] for result in ok)
+    return {
+        "url": url,
+        "requests": total,
+        "concurrency": concurrency,
+        "distinct_texts": distinct,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "ok": len(ok),
+        "status_counts": {str(k): v for k, v in Counter(result[0] for result in results).items()},
+        "ttfb_p50_ms": round(percentile(first_bytes, 0.50) * 1000, 2) if ok else None,
+        "ttfb_p99_ms": round(percentile(first_bytes, 0.99) * 1000, 2) if ok else None,
+        "total_p50_ms": round(percentile(totals, 0.50) * 1000, 2) if ok else None,
+        "total_p99_ms": round(percentile(totals, 0.99) * 1000, 2) if ok else None,
+        "mean_bytes": round(statistics.fmean(result[3] for result in ok)) if ok else None,
+        "backend_calls": after["backend"]["calls"] - before["backend"]["calls"],
+        "collapsed": after["collapsed"] - before["collapsed"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the TTS service's streaming /synthesize endpoint.")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Base URL of tts_service.py")
+    parser.add_argument("-n", "--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--distinct", type=int, default=DEFAULT_DISTINCT, help="Number of different texts requested")
+    parser.add_argument("--token", default=None, help="Bearer token if the service requires one")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = run(args.url.rstrip("/"), args.requests, args.concurrency, max(1, args.distinct), args.token)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['requests']} requests over {summary['distinct_texts']} texts, concurrency {summary['concurrency']}, {summary['elapsed_s']} s")
+    print(f"  throughput: {summary['rps']} req/s")
+    print(f"  first byte p50: {summary['ttfb_p50_ms']} ms, p99: {summary['ttfb_p99_ms']} ms")
+    print(f"  complete   p50: {summary['total_p50_ms']} ms, p99: {summary['total_p99_ms']} ms")
+    print(f"  backend calls: {summary['backend_calls']}, collapsed in flight: {summary['collapsed']}")
+    print(f"  status codes: {summary['status_counts']}")
+
+if __name__ == "__main__":
+    main()
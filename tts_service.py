@@ -0,0 +1,307 @@
+# tts_service.py
+import argparse
+import hmac
+import io
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# --- Service Configuration ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5002
+MAX_TEXT_CHARS = 5000
+MAX_BACKEND_CALLS = 8  # Chunk syntheses running at once across all callers
+CONTENT_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".ogg": "audio/ogg"}
+PRIORITIES = {"alert": 0, "normal": 1, "low": 2}
+WAV_STREAM_SIZE = 0xFFFFFFFF  # RIFF/data size for a stream whose length isn't known up front
+
+def wav_stream_header(channels, sample_width, sample_rate):
+    """Returns a PCM WAV header with unknown length; players read samples until the stream ends."""
+    block_align = channels * sample_width
+    return (b"RIFF" + struct.pack("<I", WAV_STREAM_SIZE) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8)
+            + b"data" + struct.pack("<I", WAV_STREAM_SIZE))
+
+def wav_pcm(audio_data):
+    """Returns ((channels, sample width, sample rate), raw PCM frames) of one WAV file."""
+    with wave.open(io.BytesIO(audio_data), "rb") as wav:
+        return (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()), wav.readframes(wav.getnframes())
+
+def parse_effects(data, slow_speed):
+    """Returns AudioProcessor.process options from a request body; raises ValueError if out of range."""
+    from audio_effects import FORMATS, MAX_SPEED, MIN_SPEED
+    effects = {}
+    speed = float(data.get("speed", 1.0))
+    if data.get("slow") and "speed" not in data:
+        speed = slow_speed
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"speed must be between {MIN_SPEED} and {MAX_SPEED}")
+    if speed != 1.0:
+        effects["speed"] = speed
+    if data.get("gain_db"):
+        effects["gain_db"] = max(-30.0, min(30.0, float(data["gain_db"])))
+    if data.get("normalize"):
+        effects["normalize"] = True
+    if data.get("sample_rate"):
+        sample_rate = int(data["sample_rate"])
+        if not 8000 <= sample_rate <= 48000:
+            raise ValueError("sample_rate must be between 8000 and 48000")
+        effects["sample_rate"] = sample_rate
+    if data.get("format"):
+        if data["format"] not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        if data["format"] == "ogg":
+            try:
+                import soundfile  # noqa: F401
+            except ImportError:
+                raise ValueError("OGG output needs the soundfile package on the server")
+        effects["fmt"] = data["format"]
+    return effects
+
+class TTSServiceHandler(BaseHTTPRequestHandler):
+    """Headless speech API for home-automation hubs.
+
+    POST /synthesize  {"text", "lang", "slow"} streams the audio back with
+                      chunked transfer encoding, one HTTP chunk per sentence
+                      chunk as soon as it is ready. WAV is sent as a single
+                      header of unknown length followed by each chunk's raw
+                      PCM; MP3 frames and Ogg streams concatenate into one
+                      playable stream as they are. Optional "speed", "gain_db",
+                      "normalize", "sample_rate" and "format" ("wav"/"ogg")
+                      are applied locally after synthesis.
+    POST /speak       {"text", "lang", "priority"} queues the text for
+                      playback on this machine's speakers (same effects).
+    POST /stop        cancels queued speech and stops playback.
+    GET  /status      license, queue, backend and cache figures.
+    GET  /health      liveness only; the one route that needs no token, so
+                      probes can run without it and it reveals nothing.
+    """
+    server_version = "SmartHomeTTS/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        """Checks the bearer token (if the service has one); replies 401 and returns False otherwise."""
+        token = self.server.service.token
+        authorization = self.headers.get("Authorization", "").encode("utf-8", "replace")
+        if token and not hmac.compare_digest(authorization, f"Bearer {token}".encode("utf-8")):
+            self._send_json(401, {"error": "Unauthorized"})
+            return False
+        return True
+
+    def _read_request(self):
+        """Returns the JSON body after auth and license checks, or None after replying with an error."""
+        service = self.server.service
+        if not self._authorized():
+            return None
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return None
+        if not service.license_active():
+            self._send_json(403, {"error": "License expired or missing"})
+            return None
+        if self.path in ("/synthesize", "/speak"):
+            text = data.get("text")
+            if not isinstance(text, str) or not text.strip() or len(text) > MAX_TEXT_CHARS:
+                self._send_json(400, {"error": f"text must be 1-{MAX_TEXT_CHARS} characters"})
+                return None
+            try:
+                data["effects"] = parse_effects(data, service.client.SLOW_SPEED)
+            except (TypeError, ValueError) as e:
+                self._send_json(400, {"error": str(e)})
+                return None
+        return data
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/status":
+            # License expiry and usage figures are for the hub that holds the token
+            if self._authorized():
+                self._send_json(200, self.server.service.status())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path not in ("/synthesize", "/speak", "/stop"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        data = self._read_request()
+        if data is None:
+            return
+        service = self.server.service
+        if self.path == "/synthesize":
+            self._stream(data["text"], data.get("lang", "vi"), data["effects"])
+        elif self.path == "/speak":
+            status, payload = service.speak(data["text"], data.get("lang", "vi"), PRIORITIES.get(data.get("priority"), 1), data["effects"])
+            self._send_json(status, payload)
+        else:
+            self._send_json(200, {"cancelled": service.stop()})
+
+    def _stream(self, text, lang, effects):
+        service = self.server.service
+        started = time.perf_counter()
+        extension = f".{effects.get('fmt', 'wav')}" if effects else service.client.tts_backend.extension
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES.get(extension, "application/octet-stream"))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = 0
+        wav_params = None
+        try:
+            for audio_data in service.synthesize_stream(text, lang, effects):
+                if chunks == 0:
+                    service.client.telemetry.observe("service_first_chunk_ms", (time.perf_counter() - started) * 1000)
+                if extension == ".wav":
+                    # Complete WAV files back to back aren't one stream; send the header once, then samples only
+                    params, audio_data = wav_pcm(audio_data)
+                    if wav_params is None:
+                        wav_params = params
+                        audio_data = wav_stream_header(*params) + audio_data
+                    elif params != wav_params:
+                        raise ValueError(f"Chunk format {params} differs from stream format {wav_params}")
+                self.wfile.write(f"{len(audio_data):X}\r\n".encode("ascii") + audio_data + b"\r\n")
+                self.wfile.flush()
+                chunks += 1
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected during stream")
+        except Exception as e:
+            # Headers are already sent; ending without the terminating chunk signals the failure
+            logger.error(f"Error streaming synthesis: {e}")
+            self.close_connection = True
+        logger.info(f"Streamed {chunks} chunks for {len(text)} chars in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+class TTSService:
+    """Synthesis and playback shared by all HTTP callers, behind the client's license check.
+
+    client is the client_core module (or anything with the same helpers).
+    """
+
+    def __init__(self, client, token=None, play=True):
+        self.client = client
+        self.token = token
+        self.license_state = client.LicenseState()
+        self.backend_slots = threading.BoundedSemaphore(MAX_BACKEND_CALLS)
+        self.scheduler = client.JobScheduler(self._run_job, max_workers=client.TTS_JOB_WORKERS, max_pending=client.TTS_JOB_QUEUE_SIZE)
+        self.playback = None
+        if play:
+            client.mixer_manager.init()
+            self.playback = client.PlaybackEngine(client.mixer_manager)
+            self.playback.start()
+
+    def license_active(self):
+        try:
+            self.license_state.load()
+        except Exception as e:
+            logger.error(f"Error loading license: {e}")
+            return False
+        return self.license_state.is_active()
+
+    def _synthesize(self, text, lang, effects):
+        with self.backend_slots:
+            return self.client.synthesize_chunk(text, lang, effects=effects)
+
+    def synthesize_stream(self, text, lang, effects):
+        """Yields encoded audio per sentence chunk, in order, as each becomes ready."""
+        chunks = self.client.split_sentences(text)
+        audio_chunks = self.client.synthesize_chunks(chunks, lambda chunk: self._synthesize(chunk, lang, effects))
+        try:
+            yield from audio_chunks
+        finally:
+            audio_chunks.close()
+
+    def _run_job(self, job):
+        self.client.speak_job(job, self.scheduler, self.playback)
+
+    def speak(self, text, lang, priority, effects=None):
+        """Queues text for local playback; returns (HTTP status, payload)."""
+        if self.playback is None or not self.client.mixer_manager.initialized:
+            return 503, {"error": "Audio playback is not available"}
+        # The mixer plays WAV; OGG and resampling only matter for /synthesize callers
+        effects = {name: value for name, value in (effects or {}).items() if name not in ("fmt", "sample_rate")}
+        job = self.scheduler.submit(text, lang, priority, effects)
+        if job is None:
+            return 429, {"error": "Speech queue is full"}
+        return 202, {"job_id": job.id, "state": job.state, "coalesced": job.coalesced}
+
+    def stop(self):
+        cancelled = self.scheduler.cancel_all()
+        if self.playback is not None:
+            self.playback.stop()
+        return cancelled
+
+    def status(self):
+        client = self.client
+        expiry = self.license_state.expiry
+        return {
+            "license_active": self.license_active(),
+            "license_expires_at": expiry,
+            "backend": client.tts_backend.stats(),
+            "queue": self.scheduler.stats(),
+            "inflight": client._inflight.in_flight(),
+            "collapsed": client._inflight.collapsed,
+            "cache": client.get_audio_cache().stats()
+        }
+
+    def close(self):
+        self.scheduler.close()
+        if self.playback is not None:
+            self.playback.close()
+        self.client.close_phrase_renderer()
+        self.client.mixer_manager.cleanup()
+        self.client.telemetry.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless text-to-speech service for home-automation integrations.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", default=None, help="TTS backend (gtts, offline, mock); defaults to TTS_BACKEND")
+    parser.add_argument("--token", default=os.getenv("TTS_SERVICE_TOKEN"),
+                        help="Require 'Authorization: Bearer <token>' (default: TTS_SERVICE_TOKEN)")
+    parser.add_argument("--no-play", action="store_true", help="Disable /speak (no audio device needed)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    if args.backend:
+        # client_core.py picks its backend at import time
+        os.environ["TTS_BACKEND"] = args.backend
+    import client_core as client
+
+    service = TTSService(client, token=args.token, play=not args.no_play)
+    client.telemetry.start()
+    server = ThreadingHTTPServer((args.host, args.port), TTSServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    logger.info(f"TTS service listening on http://{args.host}:{args.port} (backend: {client.tts_backend.name})")
+    if not service.license_active():
+        logger.warning(f"No active license in {client.LICENSE_FILE}; requests will be refused until one is installed")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()